@@ -1,33 +1,60 @@
+import logging
+import os
 
+from flask import Flask, request, jsonify, render_template, Response
 
-import requests
-from flask import Flask, request, jsonify, render_template
-
+from services.github.client import github_client
+from services.github.delivery_dedup import DeliveryDeduplicator
 from services.github.github_actions import get_installations
-from services.github.github_auth import get_or_create_installation_token, is_valid_signature
-from services.github.github_events import handle_github_event
-from config import CLIENT_ID, CLIENT_SECRET, db_handler, BASE_URL
+from services.github.github_auth import is_valid_signature
+from services.github.github_events import handle_queued_delivery, router
+from services.jobs.queue import JobQueue, WorkerPool
+from services.log import setup_logging
+from services.metrics import REGISTRY, CONTENT_TYPE, CallbackGauge, WEBHOOK_DELIVERIES_IGNORED
+from config import CLIENT_ID, CLIENT_SECRET, db_handler, BASE_URL, QUEUE_DB_PATH, QUEUE_WORKERS, QUEUE_MAX_ATTEMPTS, \
+    QUEUE_MAX_DEFERRALS, DELIVERY_DEDUP_SIZE, DELIVERY_DEDUP_TTL, DELIVERY_DEDUP_SHARED, LOG_LEVEL
+
+setup_logging(LOG_LEVEL)
+logger = logging.getLogger(__name__)
 
 callback_uri = f"{BASE_URL}/github/callback"
 
 app = Flask(__name__)
 
+# Cola de entregas de webhook y workers que las procesan fuera del request
+job_queue = JobQueue(QUEUE_DB_PATH, max_attempts=QUEUE_MAX_ATTEMPTS, max_deferrals=QUEUE_MAX_DEFERRALS)
+worker_pool = WorkerPool(job_queue, handle_queued_delivery, concurrency=QUEUE_WORKERS)
+
+# Entregas ya aceptadas (GitHub reenvía con el mismo X-GitHub-Delivery)
+delivery_dedup = DeliveryDeduplicator(
+    max_entries=DELIVERY_DEDUP_SIZE,
+    ttl=DELIVERY_DEDUP_TTL,
+    store=db_handler if DELIVERY_DEDUP_SHARED else None
+)
+
+REGISTRY.register(CallbackGauge("botmanager_job_queue_depth", "Trabajos pendientes o en ejecución.", job_queue.depth))
+REGISTRY.register(CallbackGauge(
+    "botmanager_webhook_duplicates_dropped", "Entregas de webhook descartadas por repetidas.",
+    lambda: delivery_dedup.stats()["duplicates_dropped"]
+))
+
+
+# Los workers arrancan al crear la app, así los trabajos que quedaron en SQLite antes de un
+# reinicio se procesan sin esperar al próximo webhook. Con gunicorn --preload la app se importa
+# antes del fork y los hilos no pasan al hijo: se arrancan de nuevo en cada worker.
+worker_pool.start()
+os.register_at_fork(after_in_child=worker_pool.start)
+
 
 def verificar_token(token):
-    url = "https://api.github.com/user"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/vnd.github+json"
-    }
-    response = requests.get(url, headers=headers)
+    response = github_client.get("/user", token=token)
 
     if response.status_code == 200:
-        print("El token es válido.")
-        print("Información del usuario:", response.json())
+        logger.info("El token es válido.")
+        logger.debug("Información del usuario: %s", response.text)
     else:
-        print("El token no es válido o ha expirado.")
-        print("Código de estado:", response.status_code)
-        print("Respuesta:", response.json())
+        logger.warning("El token no es válido o ha expirado. Código de estado: %s", response.status_code)
+        logger.debug("Respuesta: %s", response.text)
 
 
 @app.route('/')
@@ -44,7 +71,12 @@ def setup():
 @app.route('/webhook', methods=['POST'])
 def webhook():
     event = request.headers.get("X-GitHub-Event", "ping")
-    payload = request.json
+
+    # Eventos sin handler: se responden sin leer ni validar el cuerpo
+    if not router.handles_event(event):
+        WEBHOOK_DELIVERIES_IGNORED.inc(event=event)
+        return jsonify({"message": f"Event ignored: {event}"}), 200
+
     signature = request.headers.get("X-Hub-Signature-256")
     payload_raw = request.get_data()  # Obtén el payload en su forma cruda
 
@@ -55,9 +87,15 @@ def webhook():
     if not is_valid_signature(payload_raw, signature):
         return jsonify({"error": "Invalid signature"}), 403
 
+    payload = request.get_json(silent=True)
     if not payload:
         return jsonify({"error": "No payload provided"}), 400
 
+    # Acciones sin handler (p. ej. issues/labeled, pull_request/synchronize)
+    if router.match(event, payload.get("action")) is None:
+        WEBHOOK_DELIVERIES_IGNORED.inc(event=event)
+        return jsonify({"message": f"Action ignored: {event}/{payload.get('action')}"}), 200
+
     # Configura tu App ID desde las variables de entorno
     # app_id = config.GITHUB_APP_ID
     # if not app_id:
@@ -70,14 +108,28 @@ def webhook():
     if not installation_id:
         return jsonify({"error": "No installation ID found in payload"}), 400
 
-    # Genera el token de instalación
-    token = get_or_create_installation_token(installation_id)
-    if not token:
-        return jsonify({"error": "Failed to generate installation token"}), 500
+    # Descarta reenvíos de entregas ya aceptadas antes de hacer cualquier otro trabajo
+    delivery_id = request.headers.get("X-GitHub-Delivery")
+    if delivery_id and not delivery_dedup.register(delivery_id):
+        return jsonify({"message": f"Duplicate delivery ignored: {delivery_id}"}), 200
+
+    # Encola la entrega; el token y el manejo del evento se hacen en los workers
+    try:
+        job_id = job_queue.enqueue(event, payload, installation_id, delivery_id)
+    except Exception:
+        if delivery_id:
+            delivery_dedup.forget(delivery_id)
+        raise
+    worker_pool.notify()
+    return jsonify({"message": f"Webhook queued for event: {event}", "job_id": job_id}), 202
+
 
-    # Maneja el evento específico
-    handle_github_event(event, payload, token)
-    return jsonify({"message": f"Webhook received for event: {event}"}), 200
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Métricas del proceso en el formato de texto de Prometheus.
+    """
+    return Response(REGISTRY.render(), mimetype=CONTENT_TYPE)
 
 
 @app.route('/installations', methods=['GET'])
@@ -114,19 +166,14 @@ def github_callback():
         "client_secret": CLIENT_SECRET,
         "code": code
     }
-    response = requests.post(token_url, headers=headers, data=data)
+    response = github_client.post(token_url, headers=headers, data=data)
 
     if response.status_code == 200:
         token_data = response.json()
         access_token = token_data.get("access_token")
         if access_token:
             # Obtener información del usuario con el token
-            user_info_url = "https://api.github.com/user"
-            user_headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Accept": "application/json"
-            }
-            user_response = requests.get(user_info_url, headers=user_headers)
+            user_response = github_client.get("/user", token=access_token)
 
             if user_response.status_code == 200:
                 user_info = user_response.json()
@@ -0,0 +1,188 @@
+"""
+Punto de entrada ASGI alternativo para el webhook.
+
+Las entregas se procesan como tareas de asyncio con httpx y el cliente asíncrono de OpenAI,
+de modo que un solo proceso atiende cientos de entregas concurrentes mientras espera I/O.
+Las entregas que fallan pasan a la cola persistente (JobQueue), que este proceso también
+atiende con un WorkerPool y los handlers síncronos, igual que la app Flask.
+Se ejecuta con:  uvicorn asgi:app
+Las demás rutas (home, setup, callback de OAuth, installations) siguen en la app Flask (app.py).
+"""
+import asyncio
+import json
+import logging
+
+from config import db_handler, ASGI_MAX_CONCURRENCY, DELIVERY_DEDUP_SIZE, DELIVERY_DEDUP_TTL, DELIVERY_DEDUP_SHARED, \
+    LOG_LEVEL, QUEUE_DB_PATH, QUEUE_WORKERS, QUEUE_MAX_ATTEMPTS, QUEUE_MAX_DEFERRALS
+from services.github.async_client import async_github_client
+from services.github.delivery_dedup import DeliveryDeduplicator
+from services.github.github_auth import is_valid_signature
+from services.github.github_events import handle_queued_delivery
+from services.github.github_events_async import handle_delivery, router
+from services.jobs.queue import JobQueue, WorkerPool
+from services.log import setup_logging
+from services.metrics import REGISTRY, CONTENT_TYPE, CallbackGauge, WEBHOOK_DELIVERIES_IGNORED
+from services.openaiAPI.requests_async import async_client as async_openai_client
+
+setup_logging(LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+delivery_dedup = DeliveryDeduplicator(
+    max_entries=DELIVERY_DEDUP_SIZE,
+    ttl=DELIVERY_DEDUP_TTL,
+    store=db_handler if DELIVERY_DEDUP_SHARED else None
+)
+
+# Entregas que fallaron en una tarea; se reintentan con backoff (o después del reset del rate limit)
+job_queue = JobQueue(QUEUE_DB_PATH, max_attempts=QUEUE_MAX_ATTEMPTS, max_deferrals=QUEUE_MAX_DEFERRALS)
+worker_pool = WorkerPool(job_queue, handle_queued_delivery, concurrency=QUEUE_WORKERS)
+
+REGISTRY.register(CallbackGauge(
+    "botmanager_webhook_duplicates_dropped", "Entregas de webhook descartadas por repetidas.",
+    lambda: delivery_dedup.stats()["duplicates_dropped"]
+))
+
+# Tareas en curso; se guarda la referencia para que el recolector no las elimine
+_tasks = set()
+_semaphore = None
+
+REGISTRY.register(CallbackGauge("botmanager_asgi_tasks_in_flight", "Entregas en proceso en el modo ASGI.", lambda: len(_tasks)))
+
+
+async def _send_json(send, status, data):
+    body = json.dumps(data).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+def _defer(event, payload, delivery_id, error):
+    """
+    Pasa una entrega que falló a la cola persistente. Cuenta como el primer intento fallido: un
+    RateLimitExceeded se reprograma para 'retry_after' segundos después y el resto sigue el
+    backoff de la cola. Si no se puede encolar, se olvida el delivery_id para aceptar el reenvío.
+    """
+    installation_id = payload.get("installation", {}).get("id")
+    try:
+        job_id = job_queue.enqueue(event, payload, installation_id, delivery_id)
+    except Exception:
+        logger.error("No se pudo encolar la entrega %s del evento %s", delivery_id, event, exc_info=True)
+        if delivery_id:
+            delivery_dedup.forget(delivery_id)
+        return
+
+    try:
+        job_queue.fail({"id": job_id, "attempts": 0}, error)
+    except Exception:
+        # El trabajo queda pendiente y se procesa enseguida
+        logger.error("No se pudo reprogramar el trabajo %s", job_id, exc_info=True)
+    worker_pool.notify()
+
+
+async def _process(event, payload, delivery_id):
+    async with _semaphore:
+        try:
+            await handle_delivery(event, payload, delivery_id)
+        except Exception as e:
+            logger.error("Error al procesar la entrega del evento %s: %s", event, e, exc_info=True)
+            await asyncio.to_thread(_defer, event, payload, delivery_id, e)
+
+
+async def webhook(scope, receive, send):
+    headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+    event = headers.get("x-github-event", "ping")
+
+    # Eventos sin handler: se responden sin leer ni validar el cuerpo
+    if not router.handles_event(event):
+        WEBHOOK_DELIVERIES_IGNORED.inc(event=event)
+        return await _send_json(send, 200, {"message": f"Event ignored: {event}"})
+
+    signature = headers.get("x-hub-signature-256")
+    payload_raw = await _read_body(receive)
+
+    if not signature:
+        return await _send_json(send, 403, {"error": "Missing signature header"})
+
+    if not is_valid_signature(payload_raw, signature):
+        return await _send_json(send, 403, {"error": "Invalid signature"})
+
+    try:
+        payload = json.loads(payload_raw)
+    except ValueError:
+        payload = None
+    if not payload:
+        return await _send_json(send, 400, {"error": "No payload provided"})
+
+    if router.match(event, payload.get("action")) is None:
+        WEBHOOK_DELIVERIES_IGNORED.inc(event=event)
+        return await _send_json(send, 200, {"message": f"Action ignored: {event}/{payload.get('action')}"})
+
+    installation_id = payload.get("installation", {}).get("id")
+    if not installation_id:
+        return await _send_json(send, 400, {"error": "No installation ID found in payload"})
+
+    delivery_id = headers.get("x-github-delivery")
+    if delivery_id and not await asyncio.to_thread(delivery_dedup.register, delivery_id):
+        return await _send_json(send, 200, {"message": f"Duplicate delivery ignored: {delivery_id}"})
+
+    task = asyncio.create_task(_process(event, payload, delivery_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return await _send_json(send, 202, {"message": f"Webhook accepted for event: {event}"})
+
+
+async def lifespan(receive, send):
+    global _semaphore
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            _semaphore = asyncio.Semaphore(ASGI_MAX_CONCURRENCY)
+            worker_pool.start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            # Espera las entregas en curso antes de cerrar los clientes
+            if _tasks:
+                await asyncio.gather(*_tasks, return_exceptions=True)
+            await asyncio.to_thread(worker_pool.stop)
+            await async_github_client.aclose()
+            if async_openai_client.initialized:
+                await async_openai_client.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    global _semaphore
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    if _semaphore is None:
+        # Servidor sin eventos lifespan
+        _semaphore = asyncio.Semaphore(ASGI_MAX_CONCURRENCY)
+        worker_pool.start()
+
+    if scope["path"] == "/webhook" and scope["method"] == "POST":
+        return await webhook(scope, receive, send)
+    if scope["path"] == "/metrics" and scope["method"] == "GET":
+        body = REGISTRY.render().encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", CONTENT_TYPE.encode()), (b"content-length", str(len(body)).encode())],
+        })
+        return await send({"type": "http.response.body", "body": body})
+    return await _send_json(send, 404, {"error": "Not found. This route is served by the Flask app (gunicorn app:app)."})
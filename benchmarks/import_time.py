@@ -0,0 +1,79 @@
+"""
+Tiempo de importación de la aplicación, medido con `python -X importtime -c "import app"` en un
+proceso nuevo (lo que paga cada worker de gunicorn al arrancar).
+
+Reporta el tiempo acumulado de importar el módulo, los módulos más lentos y si se importó
+alguno de los que deben cargarse recién al primer uso (pymongo, openai, tiktoken). Termina con
+código 1 si el tiempo supera --threshold-ms o si se importó un módulo diferido, para poder
+usarlo como control de regresiones.
+
+Uso:
+    python -m benchmarks.import_time [--module app] [--threshold-ms 1500] [--repeat 3] [--top 15]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Módulos que solo se importan cuando se usa el servicio (services.lazy.LazyService)
+DEFERRED_MODULES = ("pymongo", "openai", "tiktoken")
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def measure(module):
+    """
+    Importa 'module' en un intérprete nuevo con -X importtime.
+    :return: (acumulado del módulo en µs, lista de (acumulado µs, nombre) de todos los módulos importados)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {module}:\n{result.stderr[-2000:]}")
+
+    imported = []
+    total = None
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        cumulative, name = int(match.group(2)), match.group(4)
+        imported.append((cumulative, name))
+        if name == module:
+            total = cumulative
+    if total is None:
+        raise RuntimeError(f"-X importtime no reportó el módulo {module}")
+    return total, imported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide el tiempo de importación de la aplicación.")
+    parser.add_argument("--module", default="app", help="Módulo a importar.")
+    parser.add_argument("--threshold-ms", type=float, default=1500.0, help="Tiempo máximo aceptado (ms).")
+    parser.add_argument("--repeat", type=int, default=3, help="Procesos medidos; se toma el mejor.")
+    parser.add_argument("--top", type=int, default=15, help="Módulos más lentos a mostrar.")
+    args = parser.parse_args(argv)
+
+    runs = [measure(args.module) for _ in range(args.repeat)]
+    best_total, imported = min(runs, key=lambda run: run[0])
+    best_ms = best_total / 1000
+
+    print(f"import {args.module}: {best_ms:.1f} ms (mejor de {args.repeat}, umbral {args.threshold_ms:.0f} ms)")
+    for cumulative, name in sorted(imported, reverse=True)[:args.top]:
+        print(f"{cumulative / 1000:10.1f} ms  {name}")
+
+    names = {name for _, name in imported}
+    deferred = [module for module in DEFERRED_MODULES if module in names]
+    if deferred:
+        print(f"ERROR: se importaron módulos que deberían cargarse al primer uso: {', '.join(deferred)}")
+    if best_ms > args.threshold_ms:
+        print(f"ERROR: la importación tardó {best_ms:.1f} ms, más que el umbral de {args.threshold_ms:.0f} ms")
+    return 1 if deferred or best_ms > args.threshold_ms else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
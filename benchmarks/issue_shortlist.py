@@ -0,0 +1,101 @@
+"""
+Precisión y latencia del shortlist de issues (services.github.issue_index) con un conjunto
+local de PRs cuyo issue enlazado se conoce (benchmarks/fixtures/issue_links.json).
+
+Reporta recall@1, recall@3 y recall@k (el issue enlazado está entre los primeros k del
+shortlist) y la latencia de shortlist(). Con --extra-issues se agregan issues sintéticos de
+los mismos autores para medir la latencia con un backlog grande.
+
+Uso:
+    python -m benchmarks.issue_shortlist [--k 10] [--repeat 200] [--extra-issues 5000]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+
+from services.github.issue_index import IssueIndex
+
+DEFAULT_FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "issue_links.json")
+
+_FILLER_WORDS = (
+    "button", "modal", "spinner", "upload", "avatar", "tooltip", "sidebar", "footer", "export", "import",
+    "csv", "calendar", "timezone", "invoice", "search", "filter", "sort", "notification", "email", "profile",
+)
+
+
+def _synthetic_issues(authors, count, first_number, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            "number": first_number + position,
+            "title": " ".join(rng.choice(_FILLER_WORDS) for _ in range(5)),
+            "body": " ".join(rng.choice(_FILLER_WORDS) for _ in range(40)),
+            "user": {"login": authors[position % len(authors)]},
+        }
+        for position in range(count)
+    ]
+
+
+def run(fixture, k=10, repeat=200, extra_issues=0):
+    """
+    :return: Diccionario con los recalls y la latencia (ms) de shortlist.
+    """
+    repo = fixture["repo"]
+    issues = list(fixture["issues"])
+    pull_requests = fixture["pull_requests"]
+    if extra_issues:
+        authors = sorted({pr["author"] for pr in pull_requests})
+        first_number = max(issue["number"] for issue in issues) + 1
+        issues.extend(_synthetic_issues(authors, extra_issues, first_number))
+
+    index = IssueIndex()
+    start = time.perf_counter()
+    index.load(repo, issues)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    hits = {1: 0, 3: 0, k: 0}
+    latencies = []
+    for pr in pull_requests:
+        text = f"{pr['title']}\n{pr['body']}"
+        shortlist = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            shortlist = index.shortlist(repo, pr["author"], text, pr["paths"], k=k)
+            latencies.append((time.perf_counter() - start) * 1000)
+        numbers = [int(entry.split(":", 1)[0].lstrip("#")) for entry in shortlist]
+        for cutoff in hits:
+            hits[cutoff] += pr["linked_issue"] in numbers[:cutoff]
+
+    latencies.sort()
+    total = len(pull_requests)
+    return {
+        "issues": len(issues),
+        "pull_requests": total,
+        **{f"recall@{cutoff}": hits[cutoff] / total for cutoff in sorted(hits)},
+        "load_ms": load_ms,
+        "shortlist_ms_mean": statistics.fmean(latencies),
+        "shortlist_ms_p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide recall y latencia del shortlist de issues.")
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE, help="Archivo JSON con issues y PRs enlazados.")
+    parser.add_argument("--k", type=int, default=10, help="Tamaño del shortlist (ISSUE_SHORTLIST_SIZE).")
+    parser.add_argument("--repeat", type=int, default=200, help="Repeticiones de cada consulta para medir latencia.")
+    parser.add_argument("--extra-issues", type=int, default=0, help="Issues sintéticos agregados al índice.")
+    args = parser.parse_args(argv)
+
+    with open(args.fixture, encoding="utf-8") as f:
+        fixture = json.load(f)
+    report = run(fixture, k=args.k, repeat=args.repeat, extra_issues=args.extra_issues)
+    for name, value in report.items():
+        print(f"{name:>20}: {value:.4g}" if isinstance(value, float) else f"{name:>20}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
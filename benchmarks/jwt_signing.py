@@ -0,0 +1,72 @@
+"""
+Costo de firmar el JWT de la app por llamada: la versión anterior (parsear la clave PEM y firmar
+con RS256 en cada llamada), la clave parseada una vez pero firmando siempre, y generate_jwt con
+el JWT en cache.
+
+Si GITHUB_APP_ID y PRIVATE_KEY no están definidas se usa una clave RSA de 2048 bits generada
+para la medición, así el script no necesita las credenciales de la app.
+
+Uso:
+    python -m benchmarks.jwt_signing [--iterations 500] [--calls-per-delivery 2]
+"""
+import argparse
+import os
+import time
+
+
+def _ensure_credentials():
+    if os.getenv("GITHUB_APP_ID") and os.getenv("PRIVATE_KEY"):
+        return
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    os.environ["GITHUB_APP_ID"] = "12345"
+    os.environ["PRIVATE_KEY"] = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+
+
+def _time_per_call(function, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide el costo de firmar el JWT de la GitHub App.")
+    parser.add_argument("--iterations", type=int, default=500, help="Llamadas por variante.")
+    parser.add_argument("--calls-per-delivery", type=int, default=2,
+                        help="Llamadas a generate_jwt por entrega (token de instalación y listados).")
+    args = parser.parse_args(argv)
+
+    _ensure_credentials()
+    # Se importan después de definir las credenciales: config las lee al importarse
+    import jwt
+    from services.github import github_auth
+
+    def payload():
+        now = int(time.time())
+        return {"iat": now, "exp": now + github_auth.JWT_LIFETIME, "iss": github_auth.GITHUB_APP_ID}
+
+    def uncached():
+        return jwt.encode(payload(), github_auth.PRIVATE_KEY, algorithm="RS256")
+
+    def parsed_key():
+        return jwt.encode(payload(), github_auth._get_private_key(), algorithm="RS256")
+
+    github_auth.generate_jwt()
+    results = {
+        "PEM parseado y firma por llamada (antes)": _time_per_call(uncached, args.iterations),
+        "clave parseada una vez, firma por llamada": _time_per_call(parsed_key, args.iterations),
+        "generate_jwt con JWT en cache (ahora)": _time_per_call(github_auth.generate_jwt, args.iterations),
+    }
+    for name, per_call in results.items():
+        print(f"{name:>45}: {per_call:10.1f} µs/llamada, "
+              f"{per_call * args.calls_per_delivery / 1000:8.3f} ms/entrega")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,65 @@
+"""
+Reproduce el corpus de respuestas crudas del modelo (benchmarks/fixtures/model_responses.jsonl)
+contra los parsers de response_parsing y compara el resultado con el esperado.
+
+Cada línea del corpus tiene 'name', 'parser' (labels, batch_labels o pr_review), 'content',
+'expected' y, para labels, 'existing_labels'. Las respuestas nuevas que rompan un parser en
+producción se agregan al corpus con el resultado correcto.
+
+Uso:
+    python -m benchmarks.replay_responses [corpus.jsonl]
+"""
+import json
+import os
+import sys
+import time
+
+from services.openaiAPI.response_parsing import parse_labels, parse_batch_labels, parse_pr_review
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "fixtures", "model_responses.jsonl")
+
+
+def _parse(case):
+    parser = case["parser"]
+    if parser == "labels":
+        return parse_labels(case["content"], existing_labels=case.get("existing_labels"))
+    if parser == "batch_labels":
+        # JSON solo admite claves string
+        return {str(number): labels for number, labels in parse_batch_labels(case["content"]).items()}
+    if parser == "pr_review":
+        return list(parse_pr_review(case["content"]))
+    raise ValueError(f"Parser desconocido: {parser}")
+
+
+def replay(path):
+    """
+    :return: Tupla (casos, fallas, segundos de parseo).
+    """
+    with open(path, encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+
+    failures = 0
+    elapsed = 0.0
+    for case in cases:
+        start = time.perf_counter()
+        try:
+            result = _parse(case)
+        except Exception as e:
+            result = f"{type(e).__name__}: {e}"
+        elapsed += time.perf_counter() - start
+        if result != case["expected"]:
+            failures += 1
+            print(f"FAIL {case['name']}: esperado {case['expected']!r}, obtenido {result!r}")
+    return len(cases), failures, elapsed
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    total, failures, elapsed = replay(argv[0] if argv else DEFAULT_CORPUS)
+    print(f"{total - failures}/{total} respuestas parseadas como se esperaba "
+          f"({elapsed / max(total, 1) * 1e6:.1f} µs por respuesta)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import time
+
+import httpx
+
+from config import GITHUB_POOL_SIZE, GITHUB_TIMEOUT, GITHUB_MAX_RETRIES
+from services.github.client import GITHUB_API_URL, RATE_LIMIT_RETRIES, GitHubAPIError, _auth_headers, github_client, \
+    request_scope
+from services.github.http_cache import CachedResponse
+from services.github.rate_limit import priority_for, is_rate_limited
+from services.github.token_cache import invalidate_token
+from services.metrics import GITHUB_REQUEST_SECONDS, github_endpoint
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncGitHubClient:
+    def __init__(self, pool_size=100, timeout=10.0, max_retries=3, cache=None, scheduler=None):
+        """
+        Versión asíncrona de GitHubClient basada en httpx.AsyncClient, para el modo ASGI.
+        Comparte el cache condicional y el planificador de rate limit del cliente síncrono.
+
+        :param pool_size: Conexiones máximas abiertas.
+        :param timeout: Timeout (segundos) por defecto de cada solicitud.
+        :param max_retries: Reintentos ante errores de conexión.
+        :param cache: ConditionalCache opcional para lecturas condicionales con get(..., cache=True).
+        :param scheduler: RateLimitScheduler opcional que regula las solicitudes por token.
+        """
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.cache = cache
+        self.scheduler = scheduler
+        self._client = None
+
+    def _get_client(self):
+        # Se crea en el primer uso, dentro del event loop que lo va a usar
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers={
+                    "Accept": "application/vnd.github+json",
+                    "X-GitHub-Api-Version": "2022-11-28",
+                },
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                timeout=self.timeout,
+                transport=httpx.AsyncHTTPTransport(retries=self.max_retries),
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(self, method, url, token=None, headers=None, installation_id=None, **kwargs):
+        """
+        Realiza una solicitud a GitHub.
+        :param url: URL absoluta o ruta relativa a https://api.github.com.
+        :param token: Token de instalación, de usuario o JWT de la app.
+        :return: httpx.Response
+        :raises RateLimitExceeded: Si la instalación no tiene presupuesto para la solicitud.
+        """
+        if url.startswith("/"):
+            url = f"{GITHUB_API_URL}{url}"
+
+        request_headers = dict(_auth_headers(token)) if token else {}
+        if headers:
+            request_headers.update(headers)
+
+        if self.scheduler is None or not token:
+            response = await self._send(method, url, request_headers, kwargs)
+        else:
+            priority = priority_for(method)
+            scope = request_scope(token, installation_id)
+            for attempt in range(RATE_LIMIT_RETRIES + 1):
+                delay = self.scheduler.acquire(scope, priority)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                response = await self._send(method, url, request_headers, kwargs)
+                self.scheduler.update(scope, response)
+                if not is_rate_limited(response):
+                    break
+                logger.warning(
+                    "GitHub rate limit alcanzado (%s) en %s %s, intento %s",
+                    response.status_code, method, url, attempt + 1
+                )
+
+        if response.status_code == 401 and token:
+            # Token revocado o instalación suspendida: la siguiente solicitud genera uno nuevo
+            invalidate_token(token)
+        return response
+
+    async def _send(self, method, url, headers, kwargs):
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = await self._get_client().request(method, url, headers=headers, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            GITHUB_REQUEST_SECONDS.observe(
+                time.perf_counter() - start, method=method, endpoint=github_endpoint(url), status=status
+            )
+
+    async def get(self, url, token=None, cache=False, installation_id=None, **kwargs):
+        """
+        GET a GitHub; con cache=True usa solicitudes condicionales igual que GitHubClient.get.
+        """
+        if not cache or self.cache is None:
+            return await self.request("GET", url, token=token, installation_id=installation_id, **kwargs)
+
+        key = self.cache.make_key(url, kwargs.get("params"), request_scope(token, installation_id))
+        entry = self.cache.get(key)
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry is not None:
+            headers.update(self.cache.conditional_headers(entry))
+
+        response = await self.request(
+            "GET", url, token=token, headers=headers, installation_id=installation_id, **kwargs
+        )
+
+        if response.status_code == 304 and entry is not None:
+            self.cache.refresh(key, entry)
+            self.cache.record(hit=True)
+            return CachedResponse(entry)
+
+        self.cache.record(hit=False)
+        self.cache.store(key, response)
+        return response
+
+    async def paginate(self, url, token=None, params=None, per_page=100, limit=None, cache=False,
+                       installation_id=None):
+        """
+        Recorre un endpoint de lista siguiendo el encabezado Link y produce los elementos uno a uno.
+        :raises GitHubAPIError: Si alguna página responde con un código distinto de 200.
+        """
+        params = dict(params or {})
+        params["per_page"] = per_page
+        response = await self.get(url, token=token, cache=cache, installation_id=installation_id, params=params)
+        yielded = 0
+
+        while True:
+            if response.status_code != 200:
+                raise GitHubAPIError(response)
+
+            for item in response.json():
+                yield item
+                yielded += 1
+                if limit is not None and yielded >= limit:
+                    return
+
+            next_link = response.links.get("next", {}).get("url")
+            if not next_link:
+                return
+            response = await self.get(next_link, token=token, cache=cache, installation_id=installation_id)
+
+    async def post(self, url, token=None, **kwargs):
+        return await self.request("POST", url, token=token, **kwargs)
+
+    async def patch(self, url, token=None, **kwargs):
+        return await self.request("PATCH", url, token=token, **kwargs)
+
+    async def put(self, url, token=None, **kwargs):
+        return await self.request("PUT", url, token=token, **kwargs)
+
+
+# Cliente compartido por las acciones asíncronas del proceso
+async_github_client = AsyncGitHubClient(
+    pool_size=max(GITHUB_POOL_SIZE, 100),
+    timeout=GITHUB_TIMEOUT,
+    max_retries=GITHUB_MAX_RETRIES,
+    cache=github_client.cache,
+    scheduler=github_client.scheduler
+)
@@ -0,0 +1,253 @@
+import hashlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import GITHUB_POOL_SIZE, GITHUB_TIMEOUT, GITHUB_MAX_RETRIES, GITHUB_CACHE_SIZE, GITHUB_CACHE_TTL, \
+    GITHUB_CACHE_DIR, GITHUB_CACHE_DISK_MAX_ENTRIES, GITHUB_RATE_LIMIT_RESERVE, GITHUB_RATE_LIMIT_MAX_WAIT, \
+    LOG_SAMPLE_RATE
+from services.github.http_cache import ConditionalCache, CachedResponse
+from services.github.rate_limit import RateLimitScheduler, priority_for, is_rate_limited
+from services.github.token_cache import installation_for_token, invalidate_token
+from services.log import submit_with_context
+from services.metrics import GITHUB_REQUEST_SECONDS, github_endpoint, register_cache
+
+logger = logging.getLogger(__name__)
+
+GITHUB_API_URL = "https://api.github.com"
+# Reintentos de una solicitud rechazada por límite de tasa
+RATE_LIMIT_RETRIES = 2
+
+
+class GitHubAPIError(Exception):
+    def __init__(self, response):
+        """
+        Error de una respuesta de GitHub con código inesperado.
+        """
+        self.response = response
+        self.status_code = response.status_code
+        super().__init__(f"GitHub API error {response.status_code} for {getattr(response, 'url', '')}")
+
+
+@lru_cache(maxsize=256)
+def _auth_headers(token):
+    """
+    Encabezado de autorización por token; se construye una vez por instalación/usuario.
+    """
+    return {"Authorization": f"Bearer {token}"}
+
+
+def request_scope(token, installation_id=None):
+    """
+    Scope de una solicitud para el cache condicional y el scheduler de rate limit: la
+    instalación, explícita o la del token de instalación, porque los tokens rotan cada hora y
+    el presupuesto es de la instalación. El JWT de la app y los tokens de usuario
+    no pertenecen a una instalación y se agrupan por un hash del token.
+    """
+    if installation_id is None and token:
+        installation_id = installation_for_token(token)
+    if installation_id is not None:
+        return f"installation:{installation_id}"
+    return f"token:{hashlib.sha256(token.encode()).hexdigest()}" if token else ""
+
+
+class GitHubClient:
+    def __init__(self, pool_size=20, timeout=10.0, max_retries=3, backoff_factor=0.5, cache=None, scheduler=None):
+        """
+        Cliente HTTP compartido para la API de GitHub.
+
+        Usa una requests.Session con conexiones keep-alive, de modo que todas las llamadas de
+        una entrega reutilizan la misma conexión TLS a api.github.com.
+
+        :param pool_size: Conexiones máximas por host en el pool.
+        :param timeout: Timeout (segundos) por defecto de cada solicitud.
+        :param max_retries: Reintentos ante errores de conexión y 5xx (solo métodos idempotentes).
+        :param backoff_factor: Factor de backoff entre reintentos.
+        :param cache: ConditionalCache opcional para lecturas condicionales con get(..., cache=True).
+        :param scheduler: RateLimitScheduler opcional que regula las solicitudes por token.
+        """
+        self.timeout = timeout
+        self.cache = cache
+        self.scheduler = scheduler
+        self._prefetch_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="github-prefetch")
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Accept": "application/vnd.github+json",
+            "X-GitHub-Api-Version": "2022-11-28",
+        })
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(["GET", "HEAD", "PUT", "DELETE"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+
+    def request(self, method, url, token=None, headers=None, installation_id=None, **kwargs):
+        """
+        Realiza una solicitud a GitHub.
+        :param method: Método HTTP.
+        :param url: URL absoluta o ruta relativa a https://api.github.com.
+        :param token: Token de instalación, de usuario o JWT de la app.
+        :param headers: Encabezados adicionales para esta solicitud.
+        :param installation_id: Instalación del token, si el llamador la conoce (request_scope).
+        :return: requests.Response
+        :raises RateLimitExceeded: Si la instalación no tiene presupuesto para la solicitud.
+        """
+        if url.startswith("/"):
+            url = f"{GITHUB_API_URL}{url}"
+
+        request_headers = dict(_auth_headers(token)) if token else {}
+        if headers:
+            request_headers.update(headers)
+
+        kwargs.setdefault("timeout", self.timeout)
+        if self.scheduler is None or not token:
+            response = self._send(method, url, request_headers, kwargs)
+        else:
+            # Espera su turno según el presupuesto de la instalación y reintenta si GitHub limita
+            priority = priority_for(method)
+            scope = request_scope(token, installation_id)
+            for attempt in range(RATE_LIMIT_RETRIES + 1):
+                delay = self.scheduler.acquire(scope, priority)
+                if delay > 0:
+                    time.sleep(delay)
+                response = self._send(method, url, request_headers, kwargs)
+                self.scheduler.update(scope, response)
+                if not is_rate_limited(response):
+                    break
+                logger.warning(
+                    "GitHub rate limit alcanzado (%s) en %s %s, intento %s",
+                    response.status_code, method, url, attempt + 1
+                )
+
+        if response.status_code == 401 and token:
+            # Token revocado o instalación suspendida: la siguiente solicitud genera uno nuevo
+            invalidate_token(token)
+        return response
+
+    def _send(self, method, url, headers, kwargs):
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = self.session.request(method, url, headers=headers, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            GITHUB_REQUEST_SECONDS.observe(elapsed, method=method, endpoint=github_endpoint(url), status=status)
+            # Una línea por llamada a GitHub es mucho volumen: solo se registra una muestra
+            logger.debug("%s %s -> %s (%.3fs)", method, github_endpoint(url), status, elapsed,
+                         extra={"sample_rate": LOG_SAMPLE_RATE})
+
+    def get(self, url, token=None, cache=False, installation_id=None, **kwargs):
+        """
+        GET a GitHub. Con cache=True envía If-None-Match / If-Modified-Since si hay una copia
+        y, ante un 304, devuelve el cuerpo guardado sin volver a descargarlo (los 304 no
+        consumen rate limit).
+        :param installation_id: Instalación del token, si el llamador la conoce; si no, se
+                                obtiene del cache de tokens.
+        """
+        if not cache or self.cache is None:
+            return self.request("GET", url, token=token, installation_id=installation_id, **kwargs)
+
+        key = self.cache.make_key(url, kwargs.get("params"), request_scope(token, installation_id))
+        entry = self.cache.get(key)
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry is not None:
+            headers.update(self.cache.conditional_headers(entry))
+
+        response = self.request(
+            "GET", url, token=token, headers=headers, installation_id=installation_id, **kwargs
+        )
+
+        if response.status_code == 304 and entry is not None:
+            self.cache.refresh(key, entry)
+            self.cache.record(hit=True)
+            return CachedResponse(entry)
+
+        self.cache.record(hit=False)
+        self.cache.store(key, response)
+        return response
+
+    def paginate(self, url, token=None, params=None, per_page=100, limit=None, prefetch=False, cache=False,
+                 installation_id=None):
+        """
+        Recorre un endpoint de lista siguiendo el encabezado Link (rel="next") y produce los
+        elementos uno a uno, sin cargar todas las páginas en memoria.
+
+        :param token: Token o función sin argumentos que lo devuelve; con una función, el token
+                      se pide para cada página (recorridos que duran más que un token).
+        :param params: Parámetros de la primera solicitud; las siguientes usan la URL de Link.
+        :param per_page: Elementos por página (GitHub permite hasta 100).
+        :param limit: Número máximo de elementos; se deja de paginar al alcanzarlo.
+        :param prefetch: Si es True, la página siguiente se solicita mientras se consume la actual.
+        :param cache: Usar solicitudes condicionales (ETag) para cada página.
+        :param installation_id: Instalación del token para el scope del cache (ver get).
+        :raises GitHubAPIError: Si alguna página responde con un código distinto de 200.
+        """
+        token_for_page = token if callable(token) else (lambda: token)
+        params = dict(params or {})
+        params["per_page"] = per_page
+        response = self.get(url, token=token_for_page(), cache=cache, installation_id=installation_id, params=params)
+        yielded = 0
+
+        while True:
+            if response.status_code != 200:
+                raise GitHubAPIError(response)
+
+            next_link = response.links.get("next", {}).get("url")
+            next_page = None
+            if next_link and prefetch and (limit is None or yielded + len(response.json()) < limit):
+                next_page = submit_with_context(
+                    self._prefetch_executor, self.get, next_link,
+                    token=token_for_page(), cache=cache, installation_id=installation_id
+                )
+
+            for item in response.json():
+                yield item
+                yielded += 1
+                if limit is not None and yielded >= limit:
+                    if next_page is not None:
+                        next_page.cancel()
+                    return
+
+            if not next_link:
+                return
+            if next_page is not None:
+                response = next_page.result()
+            else:
+                response = self.get(next_link, token=token_for_page(), cache=cache, installation_id=installation_id)
+
+    def post(self, url, token=None, **kwargs):
+        return self.request("POST", url, token=token, **kwargs)
+
+    def patch(self, url, token=None, **kwargs):
+        return self.request("PATCH", url, token=token, **kwargs)
+
+    def put(self, url, token=None, **kwargs):
+        return self.request("PUT", url, token=token, **kwargs)
+
+    def delete(self, url, token=None, **kwargs):
+        return self.request("DELETE", url, token=token, **kwargs)
+
+
+# Cliente compartido por todas las acciones del proceso
+github_client = GitHubClient(
+    pool_size=GITHUB_POOL_SIZE,
+    timeout=GITHUB_TIMEOUT,
+    max_retries=GITHUB_MAX_RETRIES,
+    cache=ConditionalCache(
+        max_entries=GITHUB_CACHE_SIZE, ttl=GITHUB_CACHE_TTL, disk_path=GITHUB_CACHE_DIR,
+        disk_max_entries=GITHUB_CACHE_DISK_MAX_ENTRIES
+    ),
+    scheduler=RateLimitScheduler(reserve_for_writes=GITHUB_RATE_LIMIT_RESERVE, max_wait=GITHUB_RATE_LIMIT_MAX_WAIT)
+)
+register_cache("github_http", github_client.cache.stats)
@@ -0,0 +1,74 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryDeduplicator:
+    def __init__(self, max_entries=10000, ttl=3 * 24 * 3600, store=None):
+        """
+        Registro de entregas de webhook ya aceptadas, indexado por X-GitHub-Delivery.
+
+        :param max_entries: IDs máximos recordados en memoria.
+        :param ttl: Segundos que se recuerda una entrega.
+        :param store: Almacén compartido opcional con el método register_delivery(delivery_id,
+                      expires_at), que devuelve False si el ID ya estaba registrado, y
+                      forget_delivery(delivery_id).
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self.accepted = 0
+        self.duplicates = 0
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, delivery_id):
+        """
+        Registra una entrega.
+        :return: True si es nueva, False si ya se había recibido (y debe descartarse).
+        """
+        now = time.time()
+        with self._lock:
+            expires_at = self._seen.get(delivery_id)
+            if expires_at is not None and expires_at > now:
+                self.duplicates += 1
+                return False
+            self._seen[delivery_id] = now + self.ttl
+            self._seen.move_to_end(delivery_id)
+            while len(self._seen) > self.max_entries:
+                self._seen.popitem(last=False)
+
+        if self.store is not None:
+            try:
+                is_new = self.store.register_delivery(delivery_id, now + self.ttl)
+            except Exception as e:
+                # Si el almacén no responde se confía en el registro en memoria
+                logger.error("Error al registrar la entrega %s: %s", delivery_id, e)
+                is_new = True
+            if not is_new:
+                with self._lock:
+                    self.duplicates += 1
+                return False
+
+        with self._lock:
+            self.accepted += 1
+        return True
+
+    def forget(self, delivery_id):
+        """
+        Olvida una entrega (por ejemplo, si no se pudo encolar) para aceptar su reenvío.
+        """
+        with self._lock:
+            self._seen.pop(delivery_id, None)
+        if self.store is not None:
+            try:
+                self.store.forget_delivery(delivery_id)
+            except Exception as e:
+                logger.error("Error al olvidar la entrega %s: %s", delivery_id, e)
+
+    def stats(self):
+        with self._lock:
+            return {"accepted": self.accepted, "duplicates_dropped": self.duplicates}
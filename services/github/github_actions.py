@@ -1,10 +1,46 @@
 import json
+import logging
+import time
 from base64 import b64decode
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from config import PERMISSIONS_CACHE_MAX_AGE, PERMISSIONS_CACHE_SIZE, LABEL_COMMENT_MODE, ISSUE_INDEX_MAX_AGE, \
+    ISSUE_INDEX_MAX_REPOS
+from services.github.client import github_client, GitHubAPIError
+from services.github.github_auth import generate_jwt
+from services.github.issue_index import IssueIndex
+from services.github.permissions_cache import PermissionsCache, PermissionsPolicy
+from services.labels.classifier import label_classifier
+from services.log import submit_with_context
+from services.openaiAPI.requests import get_suggested_labels
 
-import requests
+logger = logging.getLogger(__name__)
 
-from services.github.github_auth import get_or_create_installation_token, generate_jwt
-from services.openaiAPI.requests import get_suggested_labels
+
+permissions_cache = PermissionsCache(max_age=PERMISSIONS_CACHE_MAX_AGE, max_entries=PERMISSIONS_CACHE_SIZE)
+
+# Issues abiertos por repositorio para elegir los candidatos a enlazar con un PR
+issue_index = IssueIndex(max_repos=ISSUE_INDEX_MAX_REPOS, max_age=ISSUE_INDEX_MAX_AGE)
+
+# Color de las etiquetas que crea la app y concurrencia al crearlas
+DEFAULT_LABEL_COLOR = "ededed"
+LABEL_CREATE_WORKERS = 4
+
+# Cambios en GitHub para aplicar las etiquetas sugeridas a un issue (ver plan_label_update)
+LabelPlan = namedtuple("LabelPlan", ["labels", "create", "comment"])
+
+
+def get_repo_installation_id(repo_owner, repo_name):
+    """
+    Obtiene el ID de la instalación de la GitHub App en un repositorio.
+    :return: installation_id o None si la app no está instalada.
+    """
+    response = github_client.get(f"/repos/{repo_owner}/{repo_name}/installation", token=generate_jwt())
+    if response.status_code == 200:
+        return response.json().get("id")
+    logger.error("Error al obtener la instalación de %s/%s: %s", repo_owner, repo_name, response.status_code)
+    return None
 
 
 def get_installations():
@@ -19,80 +55,124 @@ def get_installations():
 
         jwt_token = generate_jwt()
 
-        # Realiza la solicitud para obtener las instalaciones
-        url = "https://api.github.com/app/installations"
-        headers = {
-            "Authorization": f"Bearer {jwt_token}",
-            "Accept": "application/vnd.github+json",
-        }
-
-        response = requests.get(url, headers=headers)
-
-        if response.status_code == 200:
-            installations = response.json()
-            return installations
-        else:
-            print(f"Error al obtener las instalaciones: {response.status_code}, {response.json()}")
-            return []
+        # Recorre todas las páginas de instalaciones
+        return list(github_client.paginate("/app/installations", token=jwt_token, prefetch=True))
 
+    except GitHubAPIError as e:
+        logger.error("Error al obtener las instalaciones: %s", e.status_code)
+        return []
     except Exception as e:
-        print(f"Error en la función get_installations: {e}")
+        logger.error("Error en la función get_installations: %s", e)
         return []
 
 def comment_on(comments_url, message, token):
-    headers = {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github+json"
-    }
+    """
+    Publica un comentario.
+    :return: URL de API del comentario creado (para editarlo), o None si falla.
+    """
     data = {
         "body": message
     }
-    response = requests.post(comments_url, json=data, headers=headers)
+    response = github_client.post(comments_url, token=token, json=data)
     if response.status_code == 201:
-        print(f"Comentario publicado exitosamente en: {comments_url}")
+        logger.info("Comentario publicado exitosamente en: %s", comments_url)
+        return response.json().get("url")
     else:
-        print(f"Error al publicar el comentario: {response.status_code}, {response.json()}")
+        logger.error("Error al publicar el comentario: %s", response.status_code)
+        return None
 
 
-def get_existing_labels_with_app(repo_owner, repo_name, installation_id):
+def update_comment(comment_url, message, token):
+    """
+    Reemplaza el texto de un comentario existente.
+    :return: True si se actualizó.
+    """
+    response = github_client.patch(comment_url, token=token, json={"body": message})
+    if response.status_code == 200:
+        return True
+    logger.error("Error al actualizar el comentario: %s", response.status_code)
+    return False
+
+
+class StreamingComment:
+    """
+    Comentario que se publica en cuanto hay texto y se edita en su lugar mientras el texto crece.
+    Las ediciones se hacen en segundo plano, una a la vez y como mucho cada 'min_interval'
+    segundos; las actualizaciones intermedias que llegan mientras tanto se omiten.
+    """
+
+    IN_PROGRESS_NOTE = "\n\n---\n_Review in progress..._"
+    FAILED_NOTE = "The automated review could not be completed."
+
+    def __init__(self, comments_url, token, executor, min_interval=3.0):
+        self.comments_url = comments_url
+        self.token = token
+        self.executor = executor
+        self.min_interval = min_interval
+        self.comment_url = None
+        self._pending = None
+        self._last_publish = 0.0
+
+    def update(self, text):
+        """
+        Publica el texto parcial si no hay una edición en curso y pasó el intervalo mínimo.
+        """
+        if self._pending is not None and not self._pending.done():
+            return
+        now = time.monotonic()
+        if now - self._last_publish < self.min_interval:
+            return
+        self._last_publish = now
+        self._pending = submit_with_context(self.executor, self._publish, text + self.IN_PROGRESS_NOTE)
+
+    def finish(self, text):
+        """
+        Espera la edición en curso y publica el texto final. Si no hay texto final y ya se
+        publicó un comentario parcial, lo reemplaza por un aviso de error.
+        """
+        if self._pending is not None:
+            try:
+                self._pending.result()
+            except Exception as e:
+                logger.error("Error al publicar el comentario parcial: %s", e)
+        if text:
+            self._publish(text)
+        elif self.comment_url:
+            self._publish(self.FAILED_NOTE)
+
+    def _publish(self, body):
+        if self.comment_url is None:
+            self.comment_url = comment_on(self.comments_url, body, self.token)
+        else:
+            update_comment(self.comment_url, body, self.token)
+
+
+def get_existing_labels_with_app(repo_owner, repo_name, token):
     """
     Obtiene las etiquetas existentes en un repositorio de GitHub usando una GitHub App.
 
     Args:
         repo_owner (str): Nombre del propietario del repositorio (usuario u organización).
         repo_name (str): Nombre del repositorio.
-        app_id (str): ID de la GitHub App.
-        installation_id (str): ID de instalación de la GitHub App.
-        private_key (str): Clave privada de la GitHub App.
+        token (str): Token de instalación de la GitHub App.
 
     Returns:
         list: Lista de etiquetas existentes en el repositorio.
     """
-    # Obtén el token de instalación
-    token = get_or_create_installation_token(installation_id)
-
     if not token:
-        print("Error: No se pudo obtener el token de instalación.")
+        logger.error("Error: No se pudo obtener el token de instalación.")
         return []
 
-    url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/labels"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/vnd.github+json"
-    }
+    url = f"/repos/{repo_owner}/{repo_name}/labels"
 
     try:
-        response = requests.get(url, headers=headers)
-
-        if response.status_code == 200:
-            labels = response.json()
-            # Extrae solo los nombres de las etiquetas
-            return [label["name"] for label in labels]
-        else:
-            print(f"Error fetching labels: {response.status_code}, {response.json()}")
-            return []
+        # Extrae solo los nombres de las etiquetas de todas las páginas
+        return [label["name"] for label in github_client.paginate(url, token=token, cache=True)]
+    except GitHubAPIError as e:
+        logger.error("Error fetching labels: %s", e.status_code)
+        return []
     except Exception as e:
-        print(f"Error while fetching labels: {e}")
+        logger.error("Error while fetching labels: %s", e)
         return []
 
 def set_labels(labels, url, token):
@@ -104,26 +184,108 @@ def set_labels(labels, url, token):
         url (str): URL para agregar etiquetas al issue.
         token (str): Token de instalación para autenticación.
     """
-    headers = {
-        "Authorization": f"token {token}",
-        "Accept": "application/vnd.github+json"
-    }
     data = {"labels": labels}
-    response = requests.post(url, json=data, headers=headers)
+    response = github_client.post(url, token=token, json=data)
 
     if response.status_code == 200 or response.status_code == 201:
-        print(f"Labels successfully added to the issue: {labels}")
+        logger.info("Labels successfully added to the issue: %s", labels)
     else:
-        print(f"Error adding labels: {response.status_code}, {response.json()}")
+        logger.error("Error adding labels: %s", response.status_code)
 
 
-def set_issue_labels(payload, token):
+def reconcile_labels(suggested_labels, existing_labels):
+    """
+    Compara las etiquetas sugeridas con las existentes del repositorio (sin distinguir
+    mayúsculas, como GitHub) y elimina duplicados.
+
+    Args:
+        suggested_labels (list): Etiquetas sugeridas.
+        existing_labels (list): Etiquetas existentes en el repositorio.
+
+    Returns:
+        tuple: (etiquetas finales con el nombre existente cuando aplica, etiquetas que hay que crear).
+    """
+    existing_by_name = {label.lower(): label for label in existing_labels}
+    final_labels = []
+    missing_labels = []
+    seen = set()
+
+    for label in suggested_labels:
+        if not isinstance(label, str) or not label.strip():
+            continue
+        label = label.strip()
+        key = label.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        if key in existing_by_name:
+            final_labels.append(existing_by_name[key])
+        else:
+            final_labels.append(label)
+            missing_labels.append(label)
+
+    return final_labels, missing_labels
+
+
+def plan_label_update(suggested_labels, existing_labels, comment_mode=LABEL_COMMENT_MODE):
+    """
+    Decide, sin llamar a GitHub, cómo aplicar las etiquetas sugeridas a un issue. Lo usan la
+    versión síncrona y la asíncrona, que solo se encargan de ejecutar el plan.
+
+    Returns:
+        LabelPlan: etiquetas finales a aplicar (vacía si no hay ninguna), etiquetas que hay que
+        crear antes y comentario a publicar (None si comment_mode no es "comment").
+    """
+    final_labels, missing_labels = reconcile_labels(suggested_labels, existing_labels)
+    comment = None
+    if comment_mode == "comment":
+        if final_labels:
+            comment = f"Suggested labels for this issue: {', '.join(final_labels)}"
+        else:
+            comment = "No suggested labels were generated for this issue."
+    return LabelPlan(final_labels, missing_labels, comment)
+
+
+def label_created(response):
+    """
+    Indica si la respuesta a la creación de una etiqueta deja la etiqueta en el repositorio:
+    un 201, o un 422 cuyo error es "already_exists" (otra entrega la creó antes). Los demás
+    422, como un nombre o color inválido, son errores.
+    """
+    if response.status_code == 201:
+        return True
+    if response.status_code != 422:
+        return False
+    try:
+        body = response.json()
+    except ValueError:
+        return False
+    errors = body.get("errors") if isinstance(body, dict) else None
+    return any(isinstance(error, dict) and error.get("code") == "already_exists" for error in errors or [])
+
+
+def create_label(repo_owner, repo_name, label, token):
+    """
+    Crea una etiqueta en el repositorio. Si ya existe se considera creada.
+    """
+    url = f"/repos/{repo_owner}/{repo_name}/labels"
+    response = github_client.post(url, token=token, json={"name": label, "color": DEFAULT_LABEL_COLOR})
+    if label_created(response):
+        return True
+    logger.error("Error creating label '%s': %s", label, response.status_code)
+    return False
+
+
+def set_issue_labels(payload, token, existing_labels=None):
     """
         Maneja el evento de creación de un issue y realiza las acciones necesarias.
 
+        Las etiquetas sugeridas se aplican con apply_suggested_labels.
+
         Args:
             payload (dict): Payload recibido del webhook.
             token (str): Token de instalación para autenticación.
+            existing_labels (list): Etiquetas del repositorio, si el llamador ya las tiene.
         """
     repo_owner = payload["repository"]["owner"]["login"]
     repo_name = payload["repository"]["name"]
@@ -133,42 +295,57 @@ def set_issue_labels(payload, token):
     comments_url = payload["issue"]["comments_url"]
 
     # Obtén las etiquetas existentes del repositorio
-    existing_labels = get_existing_labels_with_app(repo_owner, repo_name, token)
+    if existing_labels is None:
+        existing_labels = get_existing_labels_with_app(repo_owner, repo_name, token)
 
-    # Obtén las etiquetas sugeridas de ChatGPT
-    suggested_labels = get_suggested_labels(issue_title, issue_body, existing_labels)
+    # Los casos seguros los responde el clasificador local; el resto se consulta a ChatGPT
+    suggested_labels = label_classifier.suggest(payload["repository"]["full_name"], issue_title, issue_body)
+    if suggested_labels is None:
+        suggested_labels = get_suggested_labels(issue_title, issue_body, existing_labels)
+    apply_suggested_labels(repo_owner, repo_name, issue_number, comments_url, suggested_labels, existing_labels, token)
 
-    if not suggested_labels:
-        message = "No suggested labels were generated for this issue."
-        comment_on(comments_url, message, token)
-        return
 
-    # Agregar comentario en el issue con las etiquetas sugeridas
-    labels_message = f"Suggested labels for this issue: {', '.join(suggested_labels)}"
-    comment_on(comments_url, labels_message, token)
+def apply_suggested_labels(repo_owner, repo_name, issue_number, comments_url, suggested_labels, existing_labels,
+                           token, comment_mode=LABEL_COMMENT_MODE):
+    """
+    Reconcilia las etiquetas sugeridas con las del repositorio, crea las que faltan en una sola
+    pasada concurrente (junto con el comentario, si comment_mode es "comment") y aplica el
+    conjunto final con una única llamada.
+    :return: Lista de etiquetas aplicadas (vacía si no hubo ninguna).
+    """
+    plan = plan_label_update(suggested_labels, existing_labels, comment_mode)
 
-    # Envía las etiquetas al nuevo endpoint para establecerlas
-    set_labels_endpoint = f"https://api.github.com/repos/{repo_owner}/{repo_name}/issues/{issue_number}/labels"
-    set_labels(suggested_labels, set_labels_endpoint, token)
+    # Crea las etiquetas que faltan y publica el comentario en una sola pasada
+    with ThreadPoolExecutor(max_workers=LABEL_CREATE_WORKERS) as executor:
+        futures = [
+            submit_with_context(executor, create_label, repo_owner, repo_name, label, token)
+            for label in plan.create
+        ]
+        if plan.comment:
+            futures.append(submit_with_context(executor, comment_on, comments_url, plan.comment, token))
+        for future in futures:
+            future.result()
 
+    if not plan.labels:
+        return []
 
+    # Aplica el conjunto final de etiquetas con una sola llamada
+    set_labels_endpoint = f"/repos/{repo_owner}/{repo_name}/issues/{issue_number}/labels"
+    set_labels(plan.labels, set_labels_endpoint, token)
+    return plan.labels
 
 
 def get_pull_request_details(repo_owner, repo_name, pull_number, token):
     """
     Obtiene los detalles de un Pull Request específico.
     """
-    url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/pulls/{pull_number}"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/vnd.github+json",
-    }
-    response = requests.get(url, headers=headers)
+    url = f"/repos/{repo_owner}/{repo_name}/pulls/{pull_number}"
+    response = github_client.get(url, token=token, cache=True)
 
     if response.status_code == 200:
         return response.json()
     else:
-        print(f"Error fetching PR details: {response.status_code}")
+        logger.error("Error fetching PR details: %s", response.status_code)
         return None
 
 
@@ -177,21 +354,29 @@ def get_pull_request_files(repo_owner, repo_name, pull_number, token):
     """
     Obtiene los archivos modificados en un Pull Request y su diff.
     """
-    url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/pulls/{pull_number}/files"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/vnd.github+json",
-    }
-    response = requests.get(url, headers=headers)
+    url = f"/repos/{repo_owner}/{repo_name}/pulls/{pull_number}/files"
 
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print(f"Error fetching PR files: {response.status_code}")
+    try:
+        return list(github_client.paginate(url, token=token, prefetch=True))
+    except GitHubAPIError as e:
+        logger.error("Error fetching PR files: %s", e.status_code)
         return None
 
 
 
+def pr_body_with_issue_link(current_body, issue_number):
+    """
+    Descripción del PR con la referencia "Closes #N" al final, o None si ya la incluye.
+    GitHub envía "body": null en los PR sin descripción, que se trata como vacía. Lo usan la
+    versión síncrona y la asíncrona de link_issue_to_pr.
+    """
+    current_body = current_body or ""
+    issue_reference = f"Closes #{issue_number}"
+    if issue_reference in current_body:
+        return None
+    return f"{current_body}\n\n{issue_reference}"
+
+
 def link_issue_to_pr(repo_owner, repo_name, pull_number, issue_number, token):
     """
     Enlaza un Issue a un Pull Request mencionándolo en la descripción del PR.
@@ -206,67 +391,74 @@ def link_issue_to_pr(repo_owner, repo_name, pull_number, issue_number, token):
     Returns:
         bool: True si la operación fue exitosa, False en caso contrario.
     """
-    url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/pulls/{pull_number}"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/vnd.github+json",
-    }
+    url = f"/repos/{repo_owner}/{repo_name}/pulls/{pull_number}"
 
     # Obtener la descripción actual del PR
-    response = requests.get(url, headers=headers)
+    response = github_client.get(url, token=token)
     if response.status_code != 200:
-        print(f"Error al obtener el PR: {response.status_code}")
+        logger.error("Error al obtener el PR: %s", response.status_code)
         return False
 
     pr_data = response.json()
-    current_body = pr_data.get("body", "")
 
     # Añadir la referencia al Issue si no está ya presente
-    issue_reference = f"Closes #{issue_number}"
-    if issue_reference not in current_body:
-        new_body = f"{current_body}\n\n{issue_reference}"
+    new_body = pr_body_with_issue_link(pr_data.get("body"), issue_number)
+    if new_body is not None:
         data = {"body": new_body}
 
         # Actualizar el cuerpo del PR
-        response = requests.patch(url, headers=headers, json=data)
+        response = github_client.patch(url, token=token, json=data)
         if response.status_code == 200:
-            print(f"Issue #{issue_number} enlazado al PR #{pull_number} exitosamente.")
+            logger.info("Issue #%s enlazado al PR #%s exitosamente.", issue_number, pull_number)
             return True
         else:
-            print(f"Error al actualizar el PR: {response.status_code}")
+            logger.error("Error al actualizar el PR: %s", response.status_code)
             return False
     else:
-        print("El Issue ya está referenciado en el PR.")
+        logger.info("El Issue ya está referenciado en el PR.")
         return True
 
 
 
-def get_open_issues_by_author(repo_owner, repo_name, author, token):
+def get_open_issues(repo_owner, repo_name, token):
+    """
+    Obtiene los issues abiertos del repositorio (sin Pull Requests) para el índice local.
+    :return: Lista de issues de la API o None si falla.
+    """
+    url = f"/repos/{repo_owner}/{repo_name}/issues"
+    params = {"state": "open"}
+    try:
+        return [
+            issue for issue in github_client.paginate(url, token=token, params=params, prefetch=True, cache=True)
+            if "pull_request" not in issue
+        ]
+    except GitHubAPIError as e:
+        logger.error("Error fetching open issues: %s", e.status_code)
+        return None
+
+
+def get_open_issues_by_author(repo_owner, repo_name, author, token, limit=None):
     """
     Obtiene los títulos y números de los Issues abiertos creados por el autor del Pull Request,
     excluyendo los Pull Requests.
+    :param limit: Número máximo de issues a devolver (None para todos).
     """
-    url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/issues"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/vnd.github+json",
-    }
+    url = f"/repos/{repo_owner}/{repo_name}/issues"
     params = {"state": "open", "creator": author}
 
-    response = requests.get(url, headers=headers, params=params)
-
-    if response.status_code == 200:
-        issues = response.json()
-        # Filtrar para excluir los Pull Requests (que tienen el campo "pull_request")
-        filtered_issues = [
-            f"#{issue['number']}: {issue['title']}"
-            for issue in issues
-            if "pull_request" not in issue
-        ]
-        return filtered_issues
-    else:
-        print(f"Error fetching open issues: {response.status_code}")
+    filtered_issues = []
+    try:
+        for issue in github_client.paginate(url, token=token, params=params, cache=True):
+            # Filtrar para excluir los Pull Requests (que tienen el campo "pull_request")
+            if "pull_request" in issue:
+                continue
+            filtered_issues.append(f"#{issue['number']}: {issue['title']}")
+            if limit is not None and len(filtered_issues) >= limit:
+                break
+    except GitHubAPIError as e:
+        logger.error("Error fetching open issues: %s", e.status_code)
         return []
+    return filtered_issues
 
 
 def get_permissions_file(repo_owner, repo_name, token, file_path="permissions.json"):
@@ -278,45 +470,53 @@ def get_permissions_file(repo_owner, repo_name, token, file_path="permissions.js
     :param file_path: Ruta del archivo JSON dentro del repositorio.
     :return: Diccionario con los permisos o None si el archivo no existe.
     """
-    url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/contents/{file_path}"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/vnd.github+json"
-    }
+    url = f"/repos/{repo_owner}/{repo_name}/contents/{file_path}"
 
-    response = requests.get(url, headers=headers)
+    response = github_client.get(url, token=token, cache=True)
     # print(f"Response Content: {response.text}")  # Verifica el contenido.
     if response.status_code == 200:
         content = response.json()
         if "content" in content:
             # Decodificar el contenido base64
-            import base64
-            decoded_content = base64.b64decode(content["content"]).decode("utf-8")
+            decoded_content = b64decode(content["content"]).decode("utf-8")
             # print(json.loads(decoded_content))
             return json.loads(decoded_content)
         else:
-            print("El archivo no tiene contenido.")
+            logger.warning("El archivo no tiene contenido.")
             return None
     elif response.status_code == 404:
-        print("Archivo de permisos no encontrado en el repositorio.")
+        logger.warning("Archivo de permisos no encontrado en el repositorio.")
         return None
     else:
-        print(f"Error al obtener el archivo: {response.status_code}")
+        logger.error("Error al obtener el archivo: %s", response.status_code)
         return None
 
 
+def get_permissions_policy(repo_owner, repo_name, token):
+    """
+    Obtiene la política de permisos del repositorio desde el cache, descargando
+    permissions.json solo si no está en memoria o ya venció.
+    :return: PermissionsPolicy o None si el archivo no existe o no se pudo leer.
+    """
+    return permissions_cache.get(
+        repo_owner, repo_name, lambda: get_permissions_file(repo_owner, repo_name, token)
+    )
+
+
 def has_permission(username, permissions):
     """
     Verifica si un usuario tiene permisos para cerrar/reabrir issues.
     :param username: Nombre del usuario a verificar.
-    :param permissions: Diccionario con los permisos obtenidos del archivo JSON.
+    :param permissions: PermissionsPolicy o diccionario con los permisos obtenidos del archivo JSON.
     :return: True si el usuario tiene permisos, False en caso contrario.
     """
+    if isinstance(permissions, PermissionsPolicy):
+        return permissions.allows(username)
     if permissions:
         allowed_users = permissions.get("users_allowed_to_close_issues", [])
         return username in allowed_users
     else:
-        print("No se pudo cargar el archivo de permisos.")
+        logger.warning("No se pudo cargar el archivo de permisos.")
         return False
 
 
@@ -328,20 +528,16 @@ def reopen_issue(repo_owner, repo_name, issue_number, token):
     :param issue_number: Número del issue.
     :param token: Token de autenticación para la GitHub App.
     """
-    url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/issues/{issue_number}"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/vnd.github+json"
-    }
+    url = f"/repos/{repo_owner}/{repo_name}/issues/{issue_number}"
     data = {"state": "open"}
-    response = requests.patch(url, headers=headers, json=data)
+    response = github_client.patch(url, token=token, json=data)
     if response.status_code == 200:
-        print(f"Issue #{issue_number} reabierto exitosamente.")
-        comment_url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/issues/{issue_number}/comments"
+        logger.info("Issue #%s reabierto exitosamente.", issue_number)
+        comment_url = f"/repos/{repo_owner}/{repo_name}/issues/{issue_number}/comments"
         message = f"You do not have permission to close issues."
         comment_on(comments_url=comment_url, message=message, token=token)
     else:
-        print(f"Error al reabrir el issue #{issue_number}: {response.status_code}")
+        logger.error("Error al reabrir el issue #%s: %s", issue_number, response.status_code)
 
 
 def close_issue(repo_owner, repo_name, issue_number, token):
@@ -352,17 +548,13 @@ def close_issue(repo_owner, repo_name, issue_number, token):
     :param issue_number: Número del issue.
     :param token: Token de autenticación para la GitHub App.
     """
-    url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/issues/{issue_number}"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/vnd.github+json"
-    }
+    url = f"/repos/{repo_owner}/{repo_name}/issues/{issue_number}"
     data = {"state": "closed"}
-    response = requests.patch(url, headers=headers, json=data)
+    response = github_client.patch(url, token=token, json=data)
     if response.status_code == 200:
-        print(f"Issue #{issue_number} cerrado exitosamente.")
-        comment_url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/issues/{issue_number}/comments"
+        logger.info("Issue #%s cerrado exitosamente.", issue_number)
+        comment_url = f"/repos/{repo_owner}/{repo_name}/issues/{issue_number}/comments"
         message = f"You do not have permission to reopen issues."
         comment_on(comments_url=comment_url, message=message, token=token)
     else:
-        print(f"Error al cerrar el issue #{issue_number}: {response.status_code}")
\ No newline at end of file
+        logger.error("Error al cerrar el issue #%s: %s", issue_number, response.status_code)
\ No newline at end of file
@@ -0,0 +1,266 @@
+import asyncio
+import json
+import logging
+from base64 import b64decode
+
+from config import LABEL_COMMENT_MODE
+from services.github.async_client import async_github_client
+from services.github.client import GitHubAPIError
+from services.github.github_actions import permissions_cache, plan_label_update, label_created, \
+    pr_body_with_issue_link, DEFAULT_LABEL_COLOR
+from services.labels.classifier import label_classifier
+from services.openaiAPI.requests_async import get_suggested_labels
+
+logger = logging.getLogger(__name__)
+
+
+async def comment_on(comments_url, message, token):
+    data = {
+        "body": message
+    }
+    response = await async_github_client.post(comments_url, token=token, json=data)
+    if response.status_code == 201:
+        logger.info("Comentario publicado exitosamente en: %s", comments_url)
+    else:
+        logger.error("Error al publicar el comentario: %s", response.status_code)
+
+
+async def get_existing_labels_with_app(repo_owner, repo_name, token):
+    """
+    Versión asíncrona de github_actions.get_existing_labels_with_app.
+    """
+    if not token:
+        logger.error("Error: No se pudo obtener el token de instalación.")
+        return []
+
+    url = f"/repos/{repo_owner}/{repo_name}/labels"
+
+    try:
+        return [label["name"] async for label in async_github_client.paginate(url, token=token, cache=True)]
+    except GitHubAPIError as e:
+        logger.error("Error fetching labels: %s", e.status_code)
+        return []
+    except Exception as e:
+        logger.error("Error while fetching labels: %s", e)
+        return []
+
+
+async def set_labels(labels, url, token):
+    """
+    Versión asíncrona de github_actions.set_labels.
+    """
+    data = {"labels": labels}
+    response = await async_github_client.post(url, token=token, json=data)
+
+    if response.status_code == 200 or response.status_code == 201:
+        logger.info("Labels successfully added to the issue: %s", labels)
+    else:
+        logger.error("Error adding labels: %s", response.status_code)
+
+
+async def create_label(repo_owner, repo_name, label, token):
+    """
+    Versión asíncrona de github_actions.create_label.
+    """
+    url = f"/repos/{repo_owner}/{repo_name}/labels"
+    response = await async_github_client.post(url, token=token, json={"name": label, "color": DEFAULT_LABEL_COLOR})
+    if label_created(response):
+        return True
+    logger.error("Error creating label '%s': %s", label, response.status_code)
+    return False
+
+
+async def set_issue_labels(payload, token):
+    """
+    Versión asíncrona de github_actions.set_issue_labels.
+    """
+    repo_owner = payload["repository"]["owner"]["login"]
+    repo_name = payload["repository"]["name"]
+    issue_title = payload["issue"]["title"]
+    issue_body = payload["issue"]["body"]
+    issue_number = payload["issue"]["number"]
+    comments_url = payload["issue"]["comments_url"]
+
+    existing_labels = await get_existing_labels_with_app(repo_owner, repo_name, token)
+    # La primera consulta de un repositorio lee el modelo del disco, por eso se hace en un hilo
+    suggested_labels = await asyncio.to_thread(
+        label_classifier.suggest, payload["repository"]["full_name"], issue_title, issue_body
+    )
+    if suggested_labels is None:
+        suggested_labels = await get_suggested_labels(issue_title, issue_body, existing_labels)
+    await apply_suggested_labels(
+        repo_owner, repo_name, issue_number, comments_url, suggested_labels, existing_labels, token
+    )
+
+
+async def apply_suggested_labels(repo_owner, repo_name, issue_number, comments_url, suggested_labels, existing_labels,
+                                 token, comment_mode=LABEL_COMMENT_MODE):
+    """
+    Versión asíncrona de github_actions.apply_suggested_labels; el plan lo arma la misma
+    función (plan_label_update).
+    """
+    plan = plan_label_update(suggested_labels, existing_labels, comment_mode)
+
+    tasks = [create_label(repo_owner, repo_name, label, token) for label in plan.create]
+    if plan.comment:
+        tasks.append(comment_on(comments_url, plan.comment, token))
+    await asyncio.gather(*tasks)
+
+    if not plan.labels:
+        return []
+
+    set_labels_endpoint = f"/repos/{repo_owner}/{repo_name}/issues/{issue_number}/labels"
+    await set_labels(plan.labels, set_labels_endpoint, token)
+    return plan.labels
+
+
+async def get_pull_request_details(repo_owner, repo_name, pull_number, token):
+    """
+    Obtiene los detalles de un Pull Request específico.
+    """
+    url = f"/repos/{repo_owner}/{repo_name}/pulls/{pull_number}"
+    response = await async_github_client.get(url, token=token, cache=True)
+
+    if response.status_code == 200:
+        return response.json()
+    else:
+        logger.error("Error fetching PR details: %s", response.status_code)
+        return None
+
+
+async def get_pull_request_files(repo_owner, repo_name, pull_number, token):
+    """
+    Obtiene los archivos modificados en un Pull Request y su diff.
+    """
+    url = f"/repos/{repo_owner}/{repo_name}/pulls/{pull_number}/files"
+
+    try:
+        return [file async for file in async_github_client.paginate(url, token=token)]
+    except GitHubAPIError as e:
+        logger.error("Error fetching PR files: %s", e.status_code)
+        return None
+
+
+async def link_issue_to_pr(repo_owner, repo_name, pull_number, issue_number, token):
+    """
+    Versión asíncrona de github_actions.link_issue_to_pr.
+    """
+    url = f"/repos/{repo_owner}/{repo_name}/pulls/{pull_number}"
+
+    response = await async_github_client.get(url, token=token)
+    if response.status_code != 200:
+        logger.error("Error al obtener el PR: %s", response.status_code)
+        return False
+
+    pr_data = response.json()
+
+    new_body = pr_body_with_issue_link(pr_data.get("body"), issue_number)
+    if new_body is not None:
+        response = await async_github_client.patch(url, token=token, json={"body": new_body})
+        if response.status_code == 200:
+            logger.info("Issue #%s enlazado al PR #%s exitosamente.", issue_number, pull_number)
+            return True
+        else:
+            logger.error("Error al actualizar el PR: %s", response.status_code)
+            return False
+    else:
+        logger.info("El Issue ya está referenciado en el PR.")
+        return True
+
+
+async def get_open_issues(repo_owner, repo_name, token):
+    """
+    Versión asíncrona de github_actions.get_open_issues.
+    """
+    url = f"/repos/{repo_owner}/{repo_name}/issues"
+    params = {"state": "open"}
+    try:
+        return [
+            issue async for issue in async_github_client.paginate(url, token=token, params=params, cache=True)
+            if "pull_request" not in issue
+        ]
+    except GitHubAPIError as e:
+        logger.error("Error fetching open issues: %s", e.status_code)
+        return None
+
+
+async def get_open_issues_by_author(repo_owner, repo_name, author, token, limit=None):
+    """
+    Versión asíncrona de github_actions.get_open_issues_by_author.
+    """
+    url = f"/repos/{repo_owner}/{repo_name}/issues"
+    params = {"state": "open", "creator": author}
+
+    filtered_issues = []
+    try:
+        async for issue in async_github_client.paginate(url, token=token, params=params, cache=True):
+            if "pull_request" in issue:
+                continue
+            filtered_issues.append(f"#{issue['number']}: {issue['title']}")
+            if limit is not None and len(filtered_issues) >= limit:
+                break
+    except GitHubAPIError as e:
+        logger.error("Error fetching open issues: %s", e.status_code)
+        return []
+    return filtered_issues
+
+
+async def get_permissions_file(repo_owner, repo_name, token, file_path="permissions.json"):
+    """
+    Versión asíncrona de github_actions.get_permissions_file.
+    """
+    url = f"/repos/{repo_owner}/{repo_name}/contents/{file_path}"
+
+    response = await async_github_client.get(url, token=token, cache=True)
+    if response.status_code == 200:
+        content = response.json()
+        if "content" in content:
+            decoded_content = b64decode(content["content"]).decode("utf-8")
+            return json.loads(decoded_content)
+        else:
+            logger.warning("El archivo no tiene contenido.")
+            return None
+    elif response.status_code == 404:
+        logger.warning("Archivo de permisos no encontrado en el repositorio.")
+        return None
+    else:
+        logger.error("Error al obtener el archivo: %s", response.status_code)
+        return None
+
+
+async def get_permissions_policy(repo_owner, repo_name, token):
+    """
+    Obtiene la política de permisos del repositorio desde el cache compartido con el modo síncrono.
+    """
+    policy = permissions_cache.lookup(repo_owner, repo_name)
+    if policy is not None:
+        return policy
+    permissions = await get_permissions_file(repo_owner, repo_name, token)
+    return permissions_cache.store(repo_owner, repo_name, permissions)
+
+
+async def _set_issue_state(repo_owner, repo_name, issue_number, token, state, message):
+    url = f"/repos/{repo_owner}/{repo_name}/issues/{issue_number}"
+    response = await async_github_client.patch(url, token=token, json={"state": state})
+    if response.status_code == 200:
+        logger.info("Issue #%s actualizado a '%s' exitosamente.", issue_number, state)
+        comment_url = f"/repos/{repo_owner}/{repo_name}/issues/{issue_number}/comments"
+        await comment_on(comments_url=comment_url, message=message, token=token)
+    else:
+        logger.error("Error al actualizar el issue #%s: %s", issue_number, response.status_code)
+
+
+async def reopen_issue(repo_owner, repo_name, issue_number, token):
+    """
+    Reabre un issue usando la API de GitHub.
+    """
+    await _set_issue_state(repo_owner, repo_name, issue_number, token, "open",
+                           "You do not have permission to close issues.")
+
+
+async def close_issue(repo_owner, repo_name, issue_number, token):
+    """
+    Cierra un issue usando la API de GitHub.
+    """
+    await _set_issue_state(repo_owner, repo_name, issue_number, token, "closed",
+                           "You do not have permission to reopen issues.")
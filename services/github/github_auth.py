@@ -1,45 +1,103 @@
 import jwt
+import logging
+import threading
 import time
-import requests
-from config import GITHUB_APP_ID, PRIVATE_KEY, WEBHOOK_SECRET
+from datetime import datetime, timezone
+
+from cryptography.hazmat.primitives.serialization import load_pem_private_key
+
+from config import GITHUB_APP_ID, PRIVATE_KEY, WEBHOOK_SECRET, TOKEN_CACHE_SIZE, TOKEN_CACHE_SHARED, db_handler, \
+    require_settings
 import hmac
 import hashlib
 
-installation_token = None
-token_expiration = 0
+from services.github.client import github_client
+from services.github.token_cache import InstallationTokenCache
+from services.metrics import TOKEN_MINT_SECONDS, timed
+
+logger = logging.getLogger(__name__)
+
+# Tokens de instalación por installation_id; opcionalmente compartidos en Mongo entre workers
+token_cache = InstallationTokenCache(
+    max_size=TOKEN_CACHE_SIZE,
+    shared_store=db_handler if TOKEN_CACHE_SHARED else None
+)
+
+# Duración del JWT de la app y margen antes de 'exp' en el que se firma uno nuevo
+JWT_LIFETIME = 10 * 60
+JWT_REFRESH_MARGIN = 60
+
+_private_key = None
+_cached_jwt = None
+_cached_jwt_exp = 0
+_jwt_lock = threading.Lock()
+
+
+def _get_private_key():
+    """
+    Parsea la clave PEM de la app una sola vez y reutiliza el objeto de clave.
+    """
+    global _private_key
+    if _private_key is None:
+        require_settings("GITHUB_APP_ID", "PRIVATE_KEY")
+        _private_key = load_pem_private_key(PRIVATE_KEY.encode(), password=None)
+    return _private_key
+
 
 def generate_jwt():
-    payload = {
-        "iat": int(time.time()),
-        "exp": int(time.time()) + (10 * 60),
-        "iss": GITHUB_APP_ID,
-    }
-    return jwt.encode(payload, PRIVATE_KEY, algorithm="RS256")
+    """
+    Devuelve el JWT de la GitHub App, reutilizando el último firmado hasta poco antes de su 'exp'.
+    """
+    global _cached_jwt, _cached_jwt_exp
+
+    with _jwt_lock:
+        now = int(time.time())
+        if _cached_jwt and now < _cached_jwt_exp - JWT_REFRESH_MARGIN:
+            return _cached_jwt
+
+        payload = {
+            "iat": now,
+            "exp": now + JWT_LIFETIME,
+            "iss": GITHUB_APP_ID,
+        }
+        _cached_jwt = jwt.encode(payload, _get_private_key(), algorithm="RS256")
+        _cached_jwt_exp = payload["exp"]
+        return _cached_jwt
 
 def get_or_create_installation_token(installation_id):
-    global installation_token, token_expiration
+    """
+    Devuelve el token de la instalación indicada, reutilizándolo mientras no esté por expirar.
+    """
+    return token_cache.get(installation_id, create_installation_token)
 
-    if installation_token and time.time() < token_expiration:
-        print("Token de instalacion aun no a expirado.")
-        return installation_token
 
-    jwt_token = generate_jwt()
+def _parse_expires_at(expires_at):
+    """
+    Convierte el campo 'expires_at' de GitHub (ISO 8601 en UTC) a epoch.
+    """
+    parsed = datetime.strptime(expires_at, "%Y-%m-%dT%H:%M:%SZ")
+    return parsed.replace(tzinfo=timezone.utc).timestamp()
+
 
-    url = f"https://api.github.com/app/installations/{installation_id}/access_tokens"
-    headers = {
-        "Authorization": f"Bearer {jwt_token}",
-        "Accept": "application/vnd.github+json",
-    }
+@timed(TOKEN_MINT_SECONDS)
+def create_installation_token(installation_id):
+    """
+    Genera un token de instalación nuevo.
+    :return: Tupla (token, expires_at) o None si falla.
+    """
+    jwt_token = generate_jwt()
 
-    response = requests.post(url, headers=headers)
+    url = f"/app/installations/{installation_id}/access_tokens"
+    response = github_client.post(url, token=jwt_token)
 
     if response.status_code == 201:
-        installation_token = response.json().get("token")
-        token_expiration = time.time() + 3600
-        print("Se genero un nuevo token de instalacion")
-        return installation_token
+        data = response.json()
+        expires_at = data.get("expires_at")
+        expiration = _parse_expires_at(expires_at) if expires_at else time.time() + 3600
+        logger.info("Se genero un nuevo token de instalacion para %s", installation_id)
+        return data.get("token"), expiration
     else:
-        print(f"Error obteniendo el token: {response.status_code}, {response.json()}")
+        logger.error("Error obteniendo el token: %s", response.status_code)
         return None
 
 
@@ -54,7 +112,7 @@ def is_valid_signature(payload, signature):
     """
     try:
         if not signature or not signature.startswith("sha256="):
-            print("Firma ausente o formato inválido.")
+            logger.warning("Firma ausente o formato inválido.")
             return False
 
         received_signature = signature.split("=")[1]
@@ -71,9 +129,9 @@ def is_valid_signature(payload, signature):
         is_valid = hmac.compare_digest(computed_signature, received_signature)
 
         if not is_valid:
-            print("Firma no válida.")
+            logger.warning("Firma no válida.")
         return is_valid
 
     except Exception as e:
-        print(f"Error al validar la firma: {e}")
+        logger.error("Error al validar la firma: %s", e)
         return False
\ No newline at end of file
@@ -1,22 +1,99 @@
-from config import db_handler
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from config import db_handler, GITHUB_FANOUT_WORKERS, REVIEW_STREAMING, REVIEW_STREAM_UPDATE_INTERVAL, \
+    ISSUE_SHORTLIST_SIZE
+from services.github.github_auth import get_or_create_installation_token
 from services.github.github_actions import comment_on, set_issue_labels, get_pull_request_details, \
-    get_pull_request_files, get_open_issues_by_author, link_issue_to_pr, get_permissions_file, has_permission, \
-    reopen_issue, close_issue
-from services.openaiAPI.requests import generate_pr_prompt, get_pr_review_and_issue
+    get_pull_request_files, get_open_issues_by_author, link_issue_to_pr, get_permissions_policy, has_permission, \
+    reopen_issue, close_issue, permissions_cache, StreamingComment, get_open_issues, issue_index
+from services.github.permissions_cache import push_touches_permissions
+from services.github.rate_limit import delivery_budget
+from services.github.routing import EventRouter
+from services.log import log_context, submit_with_context
+from services.metrics import WEBHOOK_HANDLING_SECONDS
+from services.openaiAPI.requests import generate_pr_prompt, get_pr_review_and_issue, stream_pr_review_and_issue
+
+logger = logging.getLogger(__name__)
+
+# Hilos para las llamadas independientes a GitHub dentro de un mismo handler
+fanout_executor = ThreadPoolExecutor(max_workers=GITHUB_FANOUT_WORKERS, thread_name_prefix="github-fanout")
+
+# Eventos y acciones que maneja la app; el resto se descarta en el webhook
+router = EventRouter()
+
+
+def handle_queued_delivery(event, payload, delivery_id=None):
+    """
+    Procesa una entrega de webhook tomada de la cola de trabajos.
+    Genera el token de instalación en el worker y lanza una excepción si falla para que el
+    trabajo se reintente.
+    :param event: Nombre del evento (encabezado X-GitHub-Event).
+    :param payload: Datos del evento.
+    :param delivery_id: Encabezado X-GitHub-Delivery, para los logs.
+    """
+    route = router.match(event, payload.get("action"))
+    if route is None:
+        # Trabajos encolados antes de que la ruta se quitara de la tabla
+        return
+
+    installation_id = payload.get("installation", {}).get("id")
+    repo = payload.get("repository", {}).get("full_name")
+    # Con delivery_budget la entrega solo se reprograma por rate limit antes de su primera escritura
+    with log_context(delivery_id=delivery_id, event=event, installation_id=installation_id, repo=repo), \
+            WEBHOOK_HANDLING_SECONDS.time(event=event, action=payload.get("action", "")), delivery_budget():
+        token = None
+        if route.needs_token:
+            token = get_or_create_installation_token(installation_id)
+            if not token:
+                raise RuntimeError(f"No se pudo generar el token de instalación para {installation_id}")
+
+        handle_github_event(event, payload, token)
 
 
 def handle_github_event(event, payload, token):
-    if event == "issues":
-        handle_issue_event(payload, token)
-    elif event == "pull_request":
-        handle_pull_request_opened_event(payload, token)
+    """
+    Llama al handler registrado en el router para el evento y la acción de la entrega.
+    """
+    route = router.match(event, payload.get("action"))
+    if route is None:
+        return
+    if route.needs_token:
+        route.handler(payload, token)
+    else:
+        route.handler(payload)
+
+
+@router.route("push", needs_token=False)
+def handle_push_event(payload):
+    """
+    Invalida la política de permisos en cache si el push modificó permissions.json
+    en la rama por defecto.
+    """
+    repo_owner = payload.get("repository", {}).get("owner", {}).get("login")
+    repo_name = payload.get("repository", {}).get("name")
 
+    if repo_owner and repo_name and push_touches_permissions(payload):
+        permissions_cache.invalidate(repo_owner, repo_name)
+        logger.info("Permisos en cache invalidados para %s/%s.", repo_owner, repo_name)
+
+@router.route("issues", actions=("edited", "deleted", "transferred"), needs_token=False)
+def handle_issue_index_event(payload):
+    """
+    Mantiene al día el índice local de issues con los cambios que no requieren otra acción.
+    """
+    issue_index.apply_event(payload)
+
+
+@router.route("issues", actions=("opened", "closed", "reopened"))
 def handle_issue_event(payload, token):
     """
     Maneja eventos relacionados con issues.
     :param payload: Datos del evento.
     :param token: Token de autenticación para la GitHub App.
     """
+    issue_index.apply_event(payload)
+
     action = payload.get("action")
     issue_number = payload.get("issue", {}).get("number")
     repo_owner = payload.get("repository", {}).get("owner", {}).get("login")
@@ -24,12 +101,12 @@ def handle_issue_event(payload, token):
     username = payload.get("sender", {}).get("login")
 
     if not all([action, issue_number, repo_owner, repo_name, username]):
-        print("Faltan datos en el payload para manejar el evento de issue.")
+        logger.warning("Faltan datos en el payload para manejar el evento de issue.")
         return
 
     if action in ["closed", "reopened"]:
         # Manejar permisos para cerrar/reabrir issues
-        print(f"Evento detectado: {action} issue #{issue_number} por {username}")
+        logger.info("Evento detectado: %s issue #%s por %s", action, issue_number, username)
 
         handle_issue_permissions(repo_owner, repo_name, action, username, issue_number, token)
 
@@ -43,42 +120,49 @@ def handle_issue_permissions(repo_owner, repo_name, action, username, issue_numb
     Verifica los permisos de un usuario para cerrar o reabrir un issue y utiliza un usuario autorizado para hacerlo si es necesario.
     """
     # Cargar permisos desde el archivo o configuración
-    permissions = get_permissions_file(repo_owner, repo_name, token)
+    permissions = get_permissions_policy(repo_owner, repo_name, token)
 
     comment_url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/issues/{issue_number}/comments"
 
     if not permissions:
-        print("No se pudo cargar el archivo de permisos. Abortando operación.")
+        logger.warning("No se pudo cargar el archivo de permisos. Abortando operación.")
         return
 
     # Obtener usuarios autorizados para cerrar o reabrir issues
-    allowed_users = permissions.get("users_allowed_to_close_issues", [])
-
-    if username not in allowed_users:
-        print(f"Usuario {username} no tiene permisos para realizar la acción '{action}' en el issue #{issue_number}.")
-
-        # Buscar un token válido de un usuario autorizado
-        for allowed_user in allowed_users:
-            user_data = db_handler.get_user_token(allowed_user)
-            if user_data and "token" in user_data:
-                allowed_user_token = user_data["token"]
-                if action == "closed":
-                    print(f"Usando el token del usuario autorizado '{allowed_user}' para cerrar el issue #{issue_number}.")
-                    comment_on(comment_url, f"{username}, you do not have permission to perform this action.", allowed_user_token)
-                    reopen_issue(repo_owner, repo_name, issue_number, allowed_user_token)
-                elif action == "reopened":
-                    print(f"Usando el token del usuario autorizado '{allowed_user}' para reabrir el issue #{issue_number}.")
-                    comment_on(comment_url, f"{username}, you do not have permission to perform this action.", allowed_user_token)
-                    close_issue(repo_owner, repo_name, issue_number, allowed_user_token)
-                return  # Salir después de encontrar y usar un token válido
-
-        print(f"No se encontró un usuario autorizado con un token válido para realizar la acción '{action}'.")
+    allowed_users = permissions.allowed_users
+
+    if not has_permission(username, permissions):
+        logger.info("Usuario %s no tiene permisos para realizar la acción '%s' en el issue #%s.", username, action, issue_number)
+
+        # Buscar un token válido de un usuario autorizado (una sola consulta para toda la lista)
+        user_data = db_handler.get_first_available_token(allowed_users)
+        if user_data:
+            allowed_user = user_data["username"]
+            allowed_user_token = user_data["token"]
+            if action == "closed":
+                logger.info("Usando el token del usuario autorizado '%s' para cerrar el issue #%s.", allowed_user, issue_number)
+                comment_on(comment_url, f"{username}, you do not have permission to perform this action.", allowed_user_token)
+                reopen_issue(repo_owner, repo_name, issue_number, allowed_user_token)
+            elif action == "reopened":
+                logger.info("Usando el token del usuario autorizado '%s' para reabrir el issue #%s.", allowed_user, issue_number)
+                comment_on(comment_url, f"{username}, you do not have permission to perform this action.", allowed_user_token)
+                close_issue(repo_owner, repo_name, issue_number, allowed_user_token)
+            return  # Salir después de encontrar y usar un token válido
+
+        logger.warning("No se encontró un usuario autorizado con un token válido para realizar la acción '%s'.", action)
     else:
-        print(f"El usuario {username} tiene permisos para realizar la acción '{action}' en el issue #{issue_number}.")
+        logger.info("El usuario %s tiene permisos para realizar la acción '%s' en el issue #%s.", username, action, issue_number)
 
+@router.route("pull_request", actions=("opened",))
 def handle_pull_request_opened_event(payload, token):
     """
     Maneja el evento de creación de un Pull Request.
+
+    Las lecturas independientes (detalles, archivos e índice de issues) se hacen en paralelo
+    y se unen antes de construir el prompt, que solo incluye los issues del autor más
+    parecidos al PR; luego el enlace del issue y el comentario de
+    revisión también se publican en paralelo (con REVIEW_STREAMING, mientras el modelo
+    todavía genera la revisión).
     """
     action = payload.get("action")
     if action != "opened":
@@ -89,24 +173,87 @@ def handle_pull_request_opened_event(payload, token):
     pull_number = payload["pull_request"]["number"]
     author = payload["pull_request"]["user"]["login"]
 
-    # Obtener detalles y archivos del Pull Request
-    pr_details = get_pull_request_details(repo_owner, repo_name, pull_number, token)
-    pr_files = get_pull_request_files(repo_owner, repo_name, pull_number, token)
+    # Obtener detalles, archivos del Pull Request y el índice de issues en paralelo
+    details_future = submit_with_context(fanout_executor, get_pull_request_details, repo_owner, repo_name, pull_number, token)
+    files_future = submit_with_context(fanout_executor, get_pull_request_files, repo_owner, repo_name, pull_number, token)
+    index_future = submit_with_context(
+        fanout_executor, issue_index.ensure, payload["repository"]["full_name"],
+        lambda: get_open_issues(repo_owner, repo_name, token)
+    )
+
+    pr_details = details_future.result()
+    pr_files = files_future.result()
+    index_ready = index_future.result()
     if not pr_details or not pr_files:
-        print("Failed to fetch PR details or files.")
+        logger.warning("Failed to fetch PR details or files.")
         return
 
-    # Obtener títulos de Issues abiertos creados por el autor del PR
-    issue_titles = get_open_issues_by_author(repo_owner, repo_name, author, token)
+    # Solo los issues del autor más parecidos al PR van al prompt
+    if index_ready:
+        issue_titles = issue_index.shortlist(
+            payload["repository"]["full_name"], author, f"{pr_details['title']}\n{pr_details.get('body') or ''}",
+            [file["filename"] for file in pr_files], k=ISSUE_SHORTLIST_SIZE
+        )
+    else:
+        issue_titles = get_open_issues_by_author(repo_owner, repo_name, author, token, limit=ISSUE_SHORTLIST_SIZE)
 
     # Generar prompt para ChatGPT
     prompt = generate_pr_prompt(pr_details, pr_files, issue_titles)
 
+    comment_url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/issues/{pull_number}/comments"
+
+    if REVIEW_STREAMING:
+        stream_pull_request_review(repo_owner, repo_name, pull_number, prompt, comment_url, token)
+        return
+
     # Obtener el número del Issue relacionado y el análisis del PR
     related_issue, review_analysis = get_pr_review_and_issue(prompt)
 
-    comment_url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/issues/{pull_number}/comments"
+    # El enlace del issue y el comentario de revisión no dependen entre sí
+    futures = [
+        submit_with_context(
+            fanout_executor, link_related_issue, repo_owner, repo_name, pull_number, related_issue, comment_url, token
+        )
+    ]
+    if review_analysis:
+        # Añadir análisis como comentario
+        futures.append(submit_with_context(fanout_executor, comment_on, comment_url, review_analysis, token))
+
+    for future in futures:
+        future.result()
 
+
+def stream_pull_request_review(repo_owner, repo_name, pull_number, prompt, comment_url, token):
+    """
+    Revisión en streaming: el enlace del issue empieza en cuanto el modelo emite
+    'related_issue', y el comentario de revisión se publica con el texto parcial y se
+    edita en su lugar hasta tener el análisis completo.
+    """
+    review_comment = StreamingComment(comment_url, token, fanout_executor, min_interval=REVIEW_STREAM_UPDATE_INTERVAL)
+    link_futures = []
+
+    def on_related_issue(issue_number):
+        link_futures.append(submit_with_context(
+            fanout_executor, link_related_issue, repo_owner, repo_name, pull_number, issue_number, comment_url, token
+        ))
+
+    related_issue, review_analysis = stream_pr_review_and_issue(
+        prompt, on_related_issue=on_related_issue, on_review=review_comment.update
+    )
+
+    # Respuesta en cache o sin 'related_issue' reconocible durante el stream
+    if not link_futures:
+        on_related_issue(related_issue)
+
+    review_comment.finish(review_analysis)
+    for future in link_futures:
+        future.result()
+
+
+def link_related_issue(repo_owner, repo_name, pull_number, related_issue, comment_url, token):
+    """
+    Enlaza el issue identificado al Pull Request y comenta el resultado.
+    """
     if related_issue:
         # Enlazar el Issue al Pull Request
         success = link_issue_to_pr(repo_owner, repo_name, pull_number, related_issue, token)
@@ -119,15 +266,11 @@ def handle_pull_request_opened_event(payload, token):
             )
             comment_on(comment_url, issue_linked_warning, token)
         else:
-            print(f"Failed to link issue #{related_issue} to PR #{pull_number}.")
+            logger.warning("Failed to link issue #%s to PR #%s.", related_issue, pull_number)
     else:
-        print("No related issue identified.")
+        logger.info("No related issue identified.")
         not_issue_linked_warning = (
             f"Please check if you have any **issues assigned** related to this pull request.\n\n"
             "I looked through all of your open issue titles and it seems that either **I couldn't identify** any that relate to this pull request or **you don't have any issues assigned to you**."
         )
         comment_on(comment_url, not_issue_linked_warning, token)
-
-    if review_analysis:
-        # Añadir análisis como comentario
-        comment_on(comment_url, review_analysis, token)
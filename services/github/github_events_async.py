@@ -0,0 +1,205 @@
+import asyncio
+import inspect
+import logging
+
+from config import db_handler, ISSUE_SHORTLIST_SIZE
+from services.github.github_auth import get_or_create_installation_token
+from services.github.github_actions_async import comment_on, set_issue_labels, get_pull_request_details, \
+    get_pull_request_files, get_open_issues, get_open_issues_by_author, link_issue_to_pr, get_permissions_policy, \
+    reopen_issue, close_issue
+from services.github.github_actions import has_permission, issue_index
+from services.github.github_events import handle_push_event, handle_issue_index_event
+from services.github.rate_limit import delivery_budget
+from services.github.routing import EventRouter
+from services.log import log_context
+from services.metrics import WEBHOOK_HANDLING_SECONDS
+from services.openaiAPI.requests import generate_pr_prompt
+from services.openaiAPI.requests_async import get_pr_review_and_issue
+
+logger = logging.getLogger(__name__)
+
+# Misma tabla de eventos que github_events.router, con los handlers asíncronos
+router = EventRouter()
+router.add("push", handle_push_event, needs_token=False)
+router.add("issues", handle_issue_index_event, actions=("edited", "deleted", "transferred"), needs_token=False)
+
+
+async def handle_delivery(event, payload, delivery_id=None):
+    """
+    Procesa una entrega de webhook en el modo ASGI.
+    El token se genera en un hilo porque el cache de tokens es síncrono. Lanza una excepción si
+    la entrega falla (incluido RateLimitExceeded) para que asgi la pase a la cola persistente.
+    """
+    route = router.match(event, payload.get("action"))
+    if route is None:
+        return
+
+    installation_id = payload.get("installation", {}).get("id")
+    repo = payload.get("repository", {}).get("full_name")
+    with log_context(delivery_id=delivery_id, event=event, installation_id=installation_id, repo=repo), \
+            WEBHOOK_HANDLING_SECONDS.time(event=event, action=payload.get("action", "")), delivery_budget():
+        token = None
+        if route.needs_token:
+            token = await asyncio.to_thread(get_or_create_installation_token, installation_id)
+            if not token:
+                # Se lanza para que la entrega pase a la cola persistente y se reintente
+                raise RuntimeError(f"No se pudo generar el token de instalación para {installation_id}")
+
+        await handle_github_event(event, payload, token)
+
+
+async def handle_github_event(event, payload, token):
+    """
+    Llama al handler registrado en el router; los handlers síncronos (push) se llaman directamente.
+    """
+    route = router.match(event, payload.get("action"))
+    if route is None:
+        return
+    result = route.handler(payload, token) if route.needs_token else route.handler(payload)
+    if inspect.isawaitable(result):
+        await result
+
+
+@router.route("issues", actions=("opened", "closed", "reopened"))
+async def handle_issue_event(payload, token):
+    """
+    Versión asíncrona de github_events.handle_issue_event.
+    """
+    issue_index.apply_event(payload)
+
+    action = payload.get("action")
+    issue_number = payload.get("issue", {}).get("number")
+    repo_owner = payload.get("repository", {}).get("owner", {}).get("login")
+    repo_name = payload.get("repository", {}).get("name")
+    username = payload.get("sender", {}).get("login")
+
+    if not all([action, issue_number, repo_owner, repo_name, username]):
+        logger.warning("Faltan datos en el payload para manejar el evento de issue.")
+        return
+
+    if action in ["closed", "reopened"]:
+        logger.info("Evento detectado: %s issue #%s por %s", action, issue_number, username)
+        await handle_issue_permissions(repo_owner, repo_name, action, username, issue_number, token)
+
+    elif action == "opened":
+        await set_issue_labels(payload, token)
+
+
+async def handle_issue_permissions(repo_owner, repo_name, action, username, issue_number, token):
+    """
+    Versión asíncrona de github_events.handle_issue_permissions.
+    """
+    permissions = await get_permissions_policy(repo_owner, repo_name, token)
+
+    comment_url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/issues/{issue_number}/comments"
+
+    if not permissions:
+        logger.warning("No se pudo cargar el archivo de permisos. Abortando operación.")
+        return
+
+    if has_permission(username, permissions):
+        logger.info("El usuario %s tiene permisos para realizar la acción '%s' en el issue #%s.", username, action, issue_number)
+        return
+
+    logger.info("Usuario %s no tiene permisos para realizar la acción '%s' en el issue #%s.", username, action, issue_number)
+
+    user_data = await asyncio.to_thread(db_handler.get_first_available_token, permissions.allowed_users)
+    if not user_data:
+        logger.warning("No se encontró un usuario autorizado con un token válido para realizar la acción '%s'.", action)
+        return
+
+    allowed_user = user_data["username"]
+    allowed_user_token = user_data["token"]
+    message = f"{username}, you do not have permission to perform this action."
+    if action == "closed":
+        logger.info("Usando el token del usuario autorizado '%s' para cerrar el issue #%s.", allowed_user, issue_number)
+        await comment_on(comment_url, message, allowed_user_token)
+        await reopen_issue(repo_owner, repo_name, issue_number, allowed_user_token)
+    elif action == "reopened":
+        logger.info("Usando el token del usuario autorizado '%s' para reabrir el issue #%s.", allowed_user, issue_number)
+        await comment_on(comment_url, message, allowed_user_token)
+        await close_issue(repo_owner, repo_name, issue_number, allowed_user_token)
+
+
+@router.route("pull_request", actions=("opened",))
+async def handle_pull_request_opened_event(payload, token):
+    """
+    Versión asíncrona de github_events.handle_pull_request_opened_event.
+    """
+    action = payload.get("action")
+    if action != "opened":
+        return
+
+    repo_owner = payload["repository"]["owner"]["login"]
+    repo_name = payload["repository"]["name"]
+    pull_number = payload["pull_request"]["number"]
+    author = payload["pull_request"]["user"]["login"]
+
+    repo = payload["repository"]["full_name"]
+
+    pr_details, pr_files, index_ready = await asyncio.gather(
+        get_pull_request_details(repo_owner, repo_name, pull_number, token),
+        get_pull_request_files(repo_owner, repo_name, pull_number, token),
+        load_issue_index(repo, repo_owner, repo_name, token),
+    )
+    if not pr_details or not pr_files:
+        logger.warning("Failed to fetch PR details or files.")
+        return
+
+    if index_ready:
+        issue_titles = issue_index.shortlist(
+            repo, author, f"{pr_details['title']}\n{pr_details.get('body') or ''}",
+            [file["filename"] for file in pr_files], k=ISSUE_SHORTLIST_SIZE
+        )
+    else:
+        issue_titles = await get_open_issues_by_author(repo_owner, repo_name, author, token, limit=ISSUE_SHORTLIST_SIZE)
+
+    prompt = generate_pr_prompt(pr_details, pr_files, issue_titles)
+    related_issue, review_analysis = await get_pr_review_and_issue(prompt)
+
+    comment_url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/issues/{pull_number}/comments"
+
+    tasks = [link_related_issue(repo_owner, repo_name, pull_number, related_issue, comment_url, token)]
+    if review_analysis:
+        tasks.append(comment_on(comment_url, review_analysis, token))
+    await asyncio.gather(*tasks)
+
+
+async def load_issue_index(repo, repo_owner, repo_name, token):
+    """
+    Carga el índice local de issues del repositorio si no está al día.
+    :return: True si el índice está disponible.
+    """
+    if issue_index.is_fresh(repo):
+        return True
+    issues = await get_open_issues(repo_owner, repo_name, token)
+    if issues is None:
+        return issue_index.is_loaded(repo)
+    # Tokenizar miles de issues bloquearía el event loop
+    await asyncio.to_thread(issue_index.load, repo, issues)
+    return True
+
+
+async def link_related_issue(repo_owner, repo_name, pull_number, related_issue, comment_url, token):
+    """
+    Versión asíncrona de github_events.link_related_issue.
+    """
+    if related_issue:
+        success = await link_issue_to_pr(repo_owner, repo_name, pull_number, related_issue, token)
+        if success:
+            issue_linked_warning = (
+                f"An issue has been linked to this Pull Request: **closes #{related_issue}**.\n\n"
+                "Please verify that this is the correct issue. If it is not, you can:\n"
+                "1. Modify the line `closes #{related_issue}` in the Pull Request description to the correct issue number.\n"
+                "2. Remove the line entirely and manually link the issue using the menu on the right."
+            )
+            await comment_on(comment_url, issue_linked_warning, token)
+        else:
+            logger.warning("Failed to link issue #%s to PR #%s.", related_issue, pull_number)
+    else:
+        logger.info("No related issue identified.")
+        not_issue_linked_warning = (
+            "Please check if you have any **issues assigned** related to this pull request.\n\n"
+            "I looked through all of your open issue titles and it seems that either **I couldn't identify** any that relate to this pull request or **you don't have any issues assigned to you**."
+        )
+        await comment_on(comment_url, not_issue_linked_warning, token)
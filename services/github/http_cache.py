@@ -0,0 +1,233 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from requests.utils import parse_header_links
+
+logger = logging.getLogger(__name__)
+
+# Encabezados de la respuesta original que se conservan (Link se usa para paginar)
+_STORED_HEADERS = ("ETag", "Last-Modified", "Link", "Content-Type")
+
+
+class CachedResponse:
+    """
+    Respuesta reconstruida desde el cache cuando GitHub contesta 304 Not Modified.
+    Expone la misma interfaz que usan las acciones de requests.Response.
+    """
+
+    def __init__(self, entry):
+        self.status_code = entry["status_code"]
+        self.headers = entry["headers"]
+        self._body = entry["body"]
+        self.from_cache = True
+
+    def json(self):
+        return self._body
+
+    @property
+    def links(self):
+        """
+        Encabezado Link parseado, igual que requests.Response.links.
+        """
+        header = self.headers.get("Link")
+        if not header:
+            return {}
+        return {link.get("rel") or link.get("url"): link for link in parse_header_links(header)}
+
+    @property
+    def text(self):
+        return json.dumps(self._body)
+
+
+class ConditionalCache:
+    # Escrituras en disco entre dos limpiezas del directorio
+    DISK_PRUNE_INTERVAL = 256
+
+    def __init__(self, max_entries=1024, ttl=3600, disk_path=None, disk_max_entries=10000):
+        """
+        Cache de respuestas GET de GitHub para solicitudes condicionales (ETag / Last-Modified).
+
+        Las entradas se indexan por URL, parámetros y scope (la instalación; GitHub varía las
+        respuestas según Authorization), de modo que nunca se comparten entre instalaciones y
+        sobreviven a la rotación horaria de los tokens.
+
+        :param max_entries: Entradas máximas en memoria (se expulsa la menos usada).
+        :param ttl: Segundos que una entrada puede reutilizarse antes de descartarse.
+        :param disk_path: Directorio opcional para persistir las entradas entre reinicios.
+        :param disk_max_entries: Archivos máximos en disco; se borran los vencidos y, si sobran,
+                                 los modificados hace más tiempo.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_path = disk_path
+        self.disk_max_entries = disk_max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        if disk_path:
+            os.makedirs(disk_path, exist_ok=True)
+            self._prune_disk()
+
+    @staticmethod
+    def make_key(url, params, scope):
+        """
+        :param scope: Scope de la solicitud (client.request_scope): la instalación o, para el
+                      JWT de la app y tokens de usuario, un hash del token.
+        """
+        raw = json.dumps([scope or "", url, sorted((params or {}).items())], default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _disk_file(self, key):
+        return os.path.join(self.disk_path, f"{key}.json")
+
+    def get(self, key):
+        """
+        Devuelve la entrada vigente para la clave o None.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry["stored_at"] <= self.ttl:
+                    self._entries.move_to_end(key)
+                    return entry
+                del self._entries[key]
+
+        if not self.disk_path:
+            return None
+        try:
+            with open(self._disk_file(key), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if now - entry["stored_at"] > self.ttl:
+            self._remove_disk(key)
+            return None
+        self._set_memory(key, entry)
+        return entry
+
+    def _set_memory(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def store(self, key, response):
+        """
+        Guarda una respuesta 200 si trae validadores (ETag o Last-Modified).
+        """
+        if response.status_code != 200:
+            return
+        if "ETag" not in response.headers and "Last-Modified" not in response.headers:
+            return
+        try:
+            body = response.json()
+        except ValueError:
+            return
+
+        entry = {
+            "status_code": 200,
+            "headers": {name: response.headers[name] for name in _STORED_HEADERS if name in response.headers},
+            "body": body,
+            "stored_at": time.time(),
+        }
+        self._set_memory(key, entry)
+        self._write_disk(key, entry)
+
+    def refresh(self, key, entry):
+        """
+        Renueva la marca de tiempo de una entrada revalidada con un 304.
+        """
+        entry["stored_at"] = time.time()
+        self._set_memory(key, entry)
+        self._write_disk(key, entry)
+
+    def _write_disk(self, key, entry):
+        if not self.disk_path:
+            return
+        tmp_file = f"{self._disk_file(key)}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_file, self._disk_file(key))
+        except OSError as e:
+            logger.error("Error al escribir el cache en disco: %s", e)
+            return
+
+        with self._lock:
+            self._disk_writes += 1
+            prune = self._disk_writes % self.DISK_PRUNE_INTERVAL == 0
+        if prune:
+            self._prune_disk()
+
+    def _remove_disk(self, key):
+        try:
+            os.remove(self._disk_file(key))
+        except OSError:
+            pass
+
+    def _prune_disk(self):
+        """
+        Borra del directorio las entradas vencidas y, si quedan más de 'disk_max_entries',
+        las modificadas hace más tiempo.
+        """
+        now = time.time()
+        files = []
+        try:
+            with os.scandir(self.disk_path) as entries:
+                for dir_entry in entries:
+                    if not dir_entry.name.endswith(".json"):
+                        continue
+                    try:
+                        files.append((dir_entry.stat().st_mtime, dir_entry.path))
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.error("Error al limpiar el cache en disco: %s", e)
+            return
+
+        files.sort()
+        expired = [path for mtime, path in files if now - mtime > self.ttl]
+        excess = max(0, len(files) - len(expired) - self.disk_max_entries)
+        for path in expired + [path for _, path in files[len(expired):len(expired) + excess]]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if "ETag" in entry["headers"]:
+            headers["If-None-Match"] = entry["headers"]["ETag"]
+        if "Last-Modified" in entry["headers"]:
+            headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+        return headers
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        """
+        Contadores de aciertos (304 servidos desde cache) y fallos.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._entries),
+            }
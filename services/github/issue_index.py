@@ -0,0 +1,211 @@
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+
+_CAMEL = re.compile(r"([a-z0-9])([A-Z])")
+_TOKEN = re.compile(r"[a-z0-9]+")
+_ISSUE_REFERENCE = re.compile(r"#(\d+)")
+
+STOPWORDS = frozenset((
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "in", "is", "it", "of", "on",
+    "or", "that", "the", "this", "to", "was", "with", "de", "del", "el", "en", "es", "la", "las", "los",
+    "para", "por", "que", "se", "un", "una", "y", "py", "js", "ts", "md", "json", "txt",
+))
+
+# Parámetros de BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+# El título pesa más que la descripción: sus términos se cuentan dos veces
+TITLE_WEIGHT = 2
+BODY_CHARS = 2000
+
+
+def tokenize(text):
+    """
+    Divide un texto (o una ruta de archivo) en términos: separa camelCase, snake_case y rutas,
+    pasa a minúsculas y descarta palabras vacías.
+    """
+    text = _CAMEL.sub(r"\1 \2", text or "").lower()
+    return [term for term in _TOKEN.findall(text) if len(term) > 1 and term not in STOPWORDS]
+
+
+class _RepoIndex:
+    """
+    Índice invertido BM25 de los issues abiertos de un repositorio.
+    """
+
+    def __init__(self):
+        self.docs = {}
+        self.postings = defaultdict(dict)
+        self.total_length = 0
+        self.loaded_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add(self, number, title, body, author):
+        self.remove(number)
+        terms = tokenize(title) * TITLE_WEIGHT + tokenize((body or "")[:BODY_CHARS])
+        frequencies = Counter(terms)
+        for term, count in frequencies.items():
+            self.postings[term][number] = count
+        self.docs[number] = (title, author, frequencies, len(terms))
+        self.total_length += len(terms)
+
+    def remove(self, number):
+        doc = self.docs.pop(number, None)
+        if doc is None:
+            return
+        _, _, frequencies, length = doc
+        for term in frequencies:
+            postings = self.postings[term]
+            postings.pop(number, None)
+            if not postings:
+                del self.postings[term]
+        self.total_length -= length
+
+    def scores(self, terms, author):
+        """
+        Puntaje BM25 de los issues del autor que comparten algún término con la consulta.
+        """
+        count = len(self.docs)
+        if not count:
+            return {}
+        average_length = self.total_length / count or 1
+        scores = defaultdict(float)
+        for term, query_count in Counter(terms).items():
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for number, frequency in postings.items():
+                _, issue_author, _, length = self.docs[number]
+                if author is not None and issue_author != author:
+                    continue
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                scores[number] += query_count * idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return scores
+
+
+class IssueIndex:
+    def __init__(self, max_repos=64, max_age=3600):
+        """
+        Índice local de los issues abiertos por repositorio para elegir, sin llamar al modelo,
+        los issues candidatos a enlazar con un Pull Request.
+
+        Se carga una vez por repositorio desde la API y se mantiene al día con los webhooks de
+        issues. Como cada proceso tiene su propio índice y un webhook llega a un solo proceso,
+        el índice se vuelve a cargar cuando tiene más de 'max_age' segundos.
+        :param max_repos: Repositorios que se mantienen en memoria (LRU).
+        """
+        self.max_repos = max_repos
+        self.max_age = max_age
+        self._repos = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def _get(self, repo):
+        with self._lock:
+            index = self._repos.get(repo)
+            if index is not None:
+                self._repos.move_to_end(repo)
+            return index
+
+    def is_loaded(self, repo):
+        """
+        True si el repositorio tiene un índice, aunque esté vencido.
+        """
+        return self._get(repo) is not None
+
+    def is_fresh(self, repo):
+        """
+        True si el repositorio está cargado y no superó 'max_age'.
+        """
+        index = self._get(repo)
+        return index is not None and time.monotonic() - index.loaded_at < self.max_age
+
+    def load(self, repo, issues):
+        """
+        Reemplaza el índice del repositorio con la lista de issues de la API.
+        """
+        index = _RepoIndex()
+        for issue in issues:
+            if "pull_request" in issue:
+                continue
+            index.add(issue["number"], issue["title"], issue.get("body"), issue.get("user", {}).get("login"))
+        with self._lock:
+            self._repos[repo] = index
+            self._repos.move_to_end(repo)
+            while len(self._repos) > self.max_repos:
+                self._repos.popitem(last=False)
+
+    def ensure(self, repo, loader):
+        """
+        Carga el repositorio con loader() si no está cargado o está vencido. Un solo hilo
+        carga cada repositorio; los demás esperan y reutilizan el resultado.
+        :param loader: Función que devuelve la lista de issues abiertos, o None si falla.
+        :return: True si el índice está disponible.
+        """
+        if self.is_fresh(repo):
+            return True
+        with self._lock:
+            load_lock = self._load_locks.setdefault(repo, threading.Lock())
+        with load_lock:
+            if self.is_fresh(repo):
+                return True
+            issues = loader()
+            if issues is None:
+                return self.is_loaded(repo)
+            self.load(repo, issues)
+            return True
+
+    def apply_event(self, payload):
+        """
+        Actualiza el índice con un webhook de issues. Los repositorios que no están cargados
+        se ignoran: se cargan completos cuando se necesitan.
+        """
+        repo = payload.get("repository", {}).get("full_name")
+        issue = payload.get("issue") or {}
+        index = self._get(repo) if repo else None
+        if index is None or "number" not in issue:
+            return
+
+        with index.lock:
+            if payload.get("action") in ("opened", "edited", "reopened") and issue.get("state", "open") == "open":
+                author = issue.get("user", {}).get("login")
+                index.add(issue["number"], issue.get("title", ""), issue.get("body"), author)
+            elif payload.get("action") in ("closed", "deleted", "transferred"):
+                index.remove(issue["number"])
+
+    def shortlist(self, repo, author, text, paths=(), k=10):
+        """
+        Devuelve los 'k' issues abiertos del autor más parecidos a un Pull Request, en el
+        formato "#número: título". Los issues mencionados como #número en el texto van primero;
+        si hay menos de 'k' coincidencias se completa con los issues más recientes del autor.
+        :param text: Título y descripción del Pull Request.
+        :param paths: Rutas de los archivos modificados.
+        """
+        index = self._get(repo)
+        if index is None:
+            return []
+
+        terms = tokenize(text)
+        for path in paths:
+            terms.extend(tokenize(path))
+
+        with index.lock:
+            scores = index.scores(terms, author)
+            ranked = heapq.nlargest(k, scores, key=scores.get)
+            mentioned = [
+                int(number) for number in _ISSUE_REFERENCE.findall(text or "")
+                if int(number) in index.docs and index.docs[int(number)][1] == author
+            ]
+            selected = list(dict.fromkeys(mentioned + ranked))[:k]
+            if len(selected) < k:
+                recent = sorted(
+                    (number for number, doc in index.docs.items() if doc[1] == author and number not in selected),
+                    reverse=True
+                )
+                selected.extend(recent[:k - len(selected)])
+            return [f"#{number}: {index.docs[number][0]}" for number in selected]
@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import OrderedDict
+
+PERMISSIONS_FILE = "permissions.json"
+# Commits máximos que GitHub incluye en el payload de un push; el resto hay que pedirlo a la API
+PUSH_PAYLOAD_MAX_COMMITS = 2048
+
+
+class PermissionsPolicy:
+    def __init__(self, permissions):
+        """
+        Política de permisos compilada a partir de permissions.json.
+        Los usuarios autorizados se guardan como frozenset para verificar en O(1) y como
+        tupla para conservar el orden de preferencia al buscar tokens.
+        """
+        users = permissions.get("users_allowed_to_close_issues", []) or []
+        self.allowed_users = tuple(users)
+        self._allowed_set = frozenset(users)
+
+    def allows(self, username):
+        return username in self._allowed_set
+
+
+class PermissionsCache:
+    def __init__(self, max_age=300, max_entries=1024):
+        """
+        Cache por repositorio de la política de permisos.
+
+        Las entradas se invalidan al recibir un push que modifica permissions.json en la rama
+        por defecto; 'max_age' es el respaldo para los workers que no reciben ese push.
+
+        :param max_entries: Repositorios máximos en cache (se expulsa el menos usado).
+        """
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, repo_owner, repo_name, loader):
+        """
+        Devuelve la política del repositorio, llamando a loader() solo si no está en cache.
+        :param loader: Función sin argumentos que devuelve el dict de permissions.json o None.
+        :return: PermissionsPolicy o None si no se pudo cargar el archivo.
+        """
+        policy = self.lookup(repo_owner, repo_name)
+        if policy is not None:
+            return policy
+        return self.store(repo_owner, repo_name, loader())
+
+    def lookup(self, repo_owner, repo_name):
+        """
+        Devuelve la política en cache si no ha vencido, o None.
+        """
+        key = (repo_owner, repo_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[1] <= self.max_age:
+                self._entries.move_to_end(key)
+                return entry[0]
+            del self._entries[key]
+        return None
+
+    def store(self, repo_owner, repo_name, permissions):
+        """
+        Compila y guarda el dict de permissions.json.
+        :return: PermissionsPolicy o None si 'permissions' está vacío.
+        """
+        if not permissions:
+            return None
+
+        policy = PermissionsPolicy(permissions)
+        key = (repo_owner, repo_name)
+        with self._lock:
+            self._entries[key] = (policy, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return policy
+
+    def invalidate(self, repo_owner, repo_name):
+        with self._lock:
+            self._entries.pop((repo_owner, repo_name), None)
+
+
+def push_touches_permissions(payload):
+    """
+    Indica si un evento push a la rama por defecto modificó permissions.json.
+    """
+    repository = payload.get("repository", {})
+    default_branch = repository.get("default_branch")
+    if not default_branch or payload.get("ref") != f"refs/heads/{default_branch}":
+        return False
+
+    commits = payload.get("commits") or []
+    # El payload lista como máximo 2048 commits; si está lleno puede faltar el que tocó el archivo
+    if len(commits) >= PUSH_PAYLOAD_MAX_COMMITS:
+        return True
+
+    for commit in commits:
+        for field in ("added", "modified", "removed"):
+            if PERMISSIONS_FILE in commit.get(field, []):
+                return True
+    return False
@@ -0,0 +1,194 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Prioridades: las escrituras (comentarios, cerrar/reabrir) van antes que las lecturas opcionales
+WRITE = 0
+READ = 1
+
+# Entrega en curso (ver delivery_budget); None fuera de una entrega
+_delivery = ContextVar("github_delivery", default=None)
+
+
+class _DeliveryState:
+    def __init__(self):
+        self.wrote = False
+
+
+@contextmanager
+def delivery_budget():
+    """
+    Marca el bloque como el procesamiento de una entrega de webhook. Hasta su primera escritura
+    a GitHub, acquire puede rechazar solicitudes con RateLimitExceeded y la entrega se reprograma
+    entera sin haber hecho nada visible. Después ya no se rechazan: esperan como mucho
+    'max_wait' y se envían, porque repetir la entrega duplicaría comentarios y etiquetas.
+    El estado es compartido por los hilos (submit_with_context) y tareas de asyncio de la entrega.
+    """
+    token = _delivery.set(_DeliveryState())
+    try:
+        yield
+    finally:
+        _delivery.reset(token)
+
+
+def priority_for(method):
+    return READ if method in ("GET", "HEAD") else WRITE
+
+
+def is_rate_limited(response):
+    """
+    Indica si GitHub rechazó la solicitud por límite primario o secundario.
+    """
+    if response.status_code == 429:
+        return True
+    if response.status_code != 403:
+        return False
+    if response.headers.get("Retry-After") or response.headers.get("X-RateLimit-Remaining") == "0":
+        return True
+    try:
+        message = response.json().get("message", "")
+    except Exception:
+        return False
+    return "rate limit" in message.lower()
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, scope, retry_after):
+        """
+        La solicitud no se envió: la instalación no tiene presupuesto para ella antes de
+        'max_wait' segundos. Los trabajos de la cola que fallan con este error se reprograman
+        para 'retry_after' segundos después sin contar un intento.
+        """
+        self.scope = scope
+        self.retry_after = retry_after
+        super().__init__(f"GitHub rate limit: sin presupuesto para {scope} durante {retry_after:.0f}s")
+
+
+class _ScopeState:
+    def __init__(self, burst):
+        self.remaining = None
+        self.reset = 0.0
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self.blocked_until = 0.0
+
+
+class RateLimitScheduler:
+    def __init__(self, reserve_for_writes=100, burst=50, max_wait=60.0, max_scopes=1024):
+        """
+        Planificador de solicitudes a GitHub por instalación (client.request_scope).
+
+        Lleva la cuenta del presupuesto restante a partir de los encabezados X-RateLimit-* y
+        reparte las lecturas con un token bucket hasta el siguiente reset. Las escrituras no se
+        espacian y tienen reservadas 'reserve_for_writes' solicitudes: con menos presupuesto que
+        eso, las lecturas se rechazan hasta el reset. Retry-After y los 403/429 por límite
+        secundario bloquean el scope.
+
+        Una solicitud que tendría que esperar más de 'max_wait' segundos no se envía: acquire
+        lanza RateLimitExceeded y la cola de trabajos reprograma la entrega para después del
+        reset, en vez de bloquear un worker y gastar el presupuesto reservado.
+
+        :param reserve_for_writes: Solicitudes reservadas para escrituras.
+        :param burst: Capacidad del token bucket.
+        :param max_wait: Espera máxima (segundos) antes de rechazar una solicitud.
+        :param max_scopes: Scopes recordados (se descarta el menos usado).
+        """
+        self.reserve_for_writes = reserve_for_writes
+        self.burst = burst
+        self.max_wait = max_wait
+        self.max_scopes = max_scopes
+        self.throttled = 0
+        self.rejected = 0
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _state(self, scope):
+        state = self._states.get(scope)
+        if state is None:
+            state = self._states[scope] = _ScopeState(self.burst)
+            while len(self._states) > self.max_scopes:
+                self._states.popitem(last=False)
+        self._states.move_to_end(scope)
+        return state
+
+    def acquire(self, scope, priority):
+        """
+        Reserva un turno para una solicitud.
+        :return: Segundos que el llamador debe esperar antes de enviarla (0 si puede enviarla ya).
+        :raises RateLimitExceeded: Si la espera superaría 'max_wait' o es una lectura y el
+                                   presupuesto restante está dentro de la reserva de escrituras.
+                                   Nunca dentro de una entrega que ya escribió (delivery_budget).
+        """
+        delivery = _delivery.get()
+        committed = delivery is not None and delivery.wrote
+        now = time.time()
+        with self._lock:
+            state = self._state(scope)
+            delay = max(0.0, state.blocked_until - now)
+            tokens = state.tokens
+
+            if state.remaining is not None and state.reset > now:
+                if priority == WRITE or (committed and state.remaining <= self.reserve_for_writes):
+                    # Las escrituras, y las lecturas de una entrega que ya escribió, usan la
+                    # reserva sin pasar por el bucket; solo esperan si no queda presupuesto
+                    if state.remaining == 0:
+                        delay = max(delay, state.reset - now)
+                elif state.remaining <= self.reserve_for_writes:
+                    # Lo que queda hasta el reset es para escrituras
+                    self.rejected += 1
+                    raise RateLimitExceeded(scope, state.reset - now)
+                else:
+                    # Reparte el presupuesto restante entre las lecturas hasta el reset
+                    rate = (state.remaining - self.reserve_for_writes) / (state.reset - now)
+                    monotonic_now = time.monotonic()
+                    state.tokens = min(self.burst, state.tokens + (monotonic_now - state.last_refill) * rate)
+                    state.last_refill = monotonic_now
+                    # El turno se descuenta del bucket solo si la solicitud no se rechaza
+                    tokens = state.tokens - 1
+                    if tokens < 0:
+                        delay = max(delay, -tokens / rate)
+
+            if delay > self.max_wait:
+                if not committed:
+                    self.rejected += 1
+                    raise RateLimitExceeded(scope, delay)
+                delay = self.max_wait
+
+            state.tokens = tokens
+            if state.remaining is not None and state.reset > now:
+                state.remaining = max(state.remaining - 1, 0)
+            if delay > 0:
+                self.throttled += 1
+            if priority == WRITE and delivery is not None:
+                delivery.wrote = True
+            return delay
+
+    def update(self, scope, response):
+        """
+        Actualiza el presupuesto del scope con los encabezados de la respuesta.
+        """
+        headers = response.headers
+        now = time.time()
+        with self._lock:
+            state = self._state(scope)
+            remaining = headers.get("X-RateLimit-Remaining")
+            reset = headers.get("X-RateLimit-Reset")
+            if remaining is not None and reset is not None:
+                state.remaining = int(remaining)
+                state.reset = float(reset)
+
+            if is_rate_limited(response):
+                retry_after = headers.get("Retry-After")
+                if retry_after:
+                    state.blocked_until = now + float(retry_after)
+                elif state.remaining == 0 and state.reset > now:
+                    state.blocked_until = state.reset
+                else:
+                    # Límite secundario sin indicación: GitHub recomienda esperar al menos un minuto
+                    state.blocked_until = now + 60
+
+    def stats(self):
+        with self._lock:
+            return {"throttled": self.throttled, "rejected": self.rejected, "scopes": len(self._states)}
@@ -0,0 +1,50 @@
+from collections import namedtuple
+
+# Acción comodín: la ruta aplica a cualquier acción del evento (o a eventos sin acción, como push)
+ANY_ACTION = "*"
+
+Route = namedtuple("Route", ["handler", "needs_token"])
+
+
+class EventRouter:
+    """
+    Tabla declarativa (evento, acción) -> handler. Permite descartar una entrega solo con el
+    encabezado X-GitHub-Event y el campo 'action', antes de encolarla o de generar un token.
+    """
+
+    def __init__(self):
+        self._routes = {}
+        self._events = set()
+
+    def route(self, event, actions=None, needs_token=True):
+        """
+        Decorador que registra un handler para un evento y sus acciones.
+        :param event: Nombre del evento (encabezado X-GitHub-Event).
+        :param actions: Acciones que maneja; None registra la ruta para cualquier acción.
+        :param needs_token: False si el handler no llama a la API y no necesita token de instalación.
+                            Con True se llama como handler(payload, token); si no, handler(payload).
+        """
+        def decorator(handler):
+            self.add(event, handler, actions=actions, needs_token=needs_token)
+            return handler
+        return decorator
+
+    def add(self, event, handler, actions=None, needs_token=True):
+        """
+        Registra un handler definido en otro módulo. Mismos parámetros que route.
+        """
+        for action in actions or (ANY_ACTION,):
+            self._routes[(event, action)] = Route(handler, needs_token)
+        self._events.add(event)
+
+    def handles_event(self, event):
+        """
+        True si algún handler está registrado para el evento. Solo usa el encabezado.
+        """
+        return event in self._events
+
+    def match(self, event, action):
+        """
+        Devuelve la Route para el evento y la acción, o None si la entrega no se maneja.
+        """
+        return self._routes.get((event, action)) or self._routes.get((event, ANY_ACTION))
@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Instalación (y cache) a la que pertenece cada token emitido en el proceso. Los tokens rotan
+# cada hora, así que el cache HTTP y el scheduler de rate limit agrupan por instalación y no por token.
+_installations_by_token = OrderedDict()
+_installations_lock = threading.Lock()
+MAX_KNOWN_TOKENS = 4096
+# Locks para generar tokens; cada instalación usa uno fijo, así su número no crece con las instalaciones
+MINT_LOCK_STRIPES = 64
+
+
+def _remember_installation(token, installation_id, cache):
+    with _installations_lock:
+        _installations_by_token[token] = (installation_id, cache)
+        _installations_by_token.move_to_end(token)
+        while len(_installations_by_token) > MAX_KNOWN_TOKENS:
+            _installations_by_token.popitem(last=False)
+
+
+def installation_for_token(token):
+    """
+    :return: installation_id del token de instalación, o None si el token no salió de un
+             InstallationTokenCache de este proceso (JWT de la app, tokens de usuario).
+    """
+    with _installations_lock:
+        entry = _installations_by_token.get(token)
+    return entry[0] if entry else None
+
+
+def invalidate_token(token):
+    """
+    Descarta un token de instalación que GitHub rechazó con un 401 (revocado o con la
+    instalación suspendida), para que la siguiente solicitud genere uno nuevo. Los tokens que
+    no salieron de un InstallationTokenCache se ignoran.
+    """
+    with _installations_lock:
+        entry = _installations_by_token.pop(token, None)
+    if entry:
+        installation_id, cache = entry
+        cache.invalidate(installation_id, token)
+
+
+class InstallationTokenCache:
+    def __init__(self, max_size=256, refresh_margin=300, shared_store=None):
+        """
+        Cache de tokens de instalación indexado por installation_id.
+
+        :param max_size: Número máximo de instalaciones en memoria (se expulsa la menos usada).
+        :param refresh_margin: Segundos antes de 'expires_at' en los que el token se renueva.
+        :param shared_store: Almacén opcional compartido entre procesos con los métodos
+                             get_installation_token(installation_id) y
+                             save_installation_token(installation_id, token, expires_at).
+        """
+        self.max_size = max_size
+        self.refresh_margin = refresh_margin
+        self.shared_store = shared_store
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._mint_locks = [threading.Lock() for _ in range(MINT_LOCK_STRIPES)]
+        # Último token rechazado por instalación, para no volver a tomarlo del almacén compartido
+        self._rejected = OrderedDict()
+
+    def _is_fresh(self, expires_at):
+        return expires_at - self.refresh_margin > time.time()
+
+    def _get_local(self, installation_id):
+        with self._lock:
+            entry = self._entries.get(installation_id)
+            if entry and self._is_fresh(entry[1]):
+                self._entries.move_to_end(installation_id)
+                return entry[0]
+        return None
+
+    def _set_local(self, installation_id, token, expires_at):
+        _remember_installation(token, installation_id, self)
+        with self._lock:
+            self._rejected.pop(installation_id, None)
+            self._entries[installation_id] = (token, expires_at)
+            self._entries.move_to_end(installation_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _mint_lock(self, installation_id):
+        return self._mint_locks[hash(installation_id) % len(self._mint_locks)]
+
+    def _is_rejected(self, installation_id, token):
+        with self._lock:
+            return self._rejected.get(installation_id) == token
+
+    def get(self, installation_id, mint):
+        """
+        Devuelve un token vigente para la instalación. Si no hay uno en memoria ni en el
+        almacén compartido, llama a mint(installation_id) una sola vez aunque haya varias
+        entregas concurrentes para la misma instalación.
+        :param mint: Función que devuelve (token, expires_at) o None si falla.
+        :return: Token de instalación o None.
+        """
+        token = self._get_local(installation_id)
+        if token:
+            return token
+
+        with self._mint_lock(installation_id):
+            # Otro hilo pudo haber generado el token mientras esperábamos
+            token = self._get_local(installation_id)
+            if token:
+                return token
+
+            if self.shared_store is not None:
+                try:
+                    shared = self.shared_store.get_installation_token(installation_id)
+                except Exception as e:
+                    logger.error("Error al leer el token compartido de la instalación %s: %s", installation_id, e)
+                    shared = None
+                if shared and self._is_fresh(shared["expires_at"]) and \
+                        not self._is_rejected(installation_id, shared["token"]):
+                    self._set_local(installation_id, shared["token"], shared["expires_at"])
+                    return shared["token"]
+
+            minted = mint(installation_id)
+            if not minted:
+                return None
+            token, expires_at = minted
+            self._set_local(installation_id, token, expires_at)
+
+            if self.shared_store is not None:
+                try:
+                    self.shared_store.save_installation_token(installation_id, token, expires_at)
+                except Exception as e:
+                    logger.error("Error al guardar el token compartido de la instalación %s: %s", installation_id, e)
+            return token
+
+    def invalidate(self, installation_id, token=None):
+        """
+        Descarta el token en memoria de una instalación (por ejemplo, después de un 401).
+        :param token: Token rechazado; si se indica, solo se descarta si sigue siendo el
+                      vigente, y tampoco se vuelve a tomar del almacén compartido.
+        """
+        with self._lock:
+            entry = self._entries.get(installation_id)
+            if entry and (token is None or entry[0] == token):
+                del self._entries[installation_id]
+            if token is not None:
+                self._rejected[installation_id] = token
+                self._rejected.move_to_end(installation_id)
+                while len(self._rejected) > self.max_size:
+                    self._rejected.popitem(last=False)
@@ -0,0 +1,332 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    def __init__(self, db_path, max_attempts=5, backoff_base=2.0, backoff_max=300.0, visibility_timeout=600,
+                 max_deferrals=24):
+        """
+        Cola de trabajos persistente respaldada por SQLite.
+
+        Los webhooks validados se guardan aquí antes de responder a GitHub y un pool de
+        workers los procesa después. Los trabajos que fallan se reintentan con backoff
+        exponencial y, al agotar los intentos, se mueven a la tabla de dead letters.
+
+        :param max_deferrals: Veces que un trabajo puede reprogramarse por rate limit (sin
+                              contar intentos) antes de moverse a dead letters.
+        """
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.max_deferrals = max_deferrals
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.visibility_timeout = visibility_timeout
+        self._init_schema()
+
+    def _connect(self):
+        """
+        Abre una conexión nueva. SQLite no permite compartir conexiones entre hilos.
+        """
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _init_schema(self):
+        connection = self._connect()
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    event TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    installation_id INTEGER,
+                    delivery_id TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    deferrals INTEGER NOT NULL DEFAULT 0,
+                    run_at REAL NOT NULL,
+                    locked_at REAL,
+                    last_error TEXT,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            columns = {row["name"] for row in connection.execute("PRAGMA table_info(jobs)")}
+            if "delivery_id" not in columns:
+                # Colas creadas antes de guardar el X-GitHub-Delivery
+                connection.execute("ALTER TABLE jobs ADD COLUMN delivery_id TEXT")
+            if "deferrals" not in columns:
+                # Colas creadas antes de limitar las reprogramaciones por rate limit
+                connection.execute("ALTER TABLE jobs ADD COLUMN deferrals INTEGER NOT NULL DEFAULT 0")
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_run_at ON jobs (status, run_at)")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS dead_letters (
+                    id INTEGER PRIMARY KEY,
+                    event TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    installation_id INTEGER,
+                    attempts INTEGER NOT NULL,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    failed_at REAL NOT NULL
+                )
+                """
+            )
+        finally:
+            connection.close()
+
+    def enqueue(self, event, payload, installation_id, delivery_id=None):
+        """
+        Guarda una entrega de webhook para procesarla más tarde.
+        :return: ID del trabajo creado.
+        """
+        now = time.time()
+        connection = self._connect()
+        try:
+            cursor = connection.execute(
+                "INSERT INTO jobs (event, payload, installation_id, delivery_id, run_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (event, json.dumps(payload), installation_id, delivery_id, now, now)
+            )
+            return cursor.lastrowid
+        finally:
+            connection.close()
+
+    def claim(self):
+        """
+        Reserva el siguiente trabajo disponible. Los trabajos en estado 'running' cuyo worker
+        murió (locked_at vencido) vuelven a estar disponibles; cada recuperación cuenta como un
+        intento, así un trabajo que tumba el proceso termina en dead letters.
+        :return: Diccionario con el trabajo o None si la cola está vacía.
+        """
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            while True:
+                row = connection.execute(
+                    """
+                    SELECT * FROM jobs
+                    WHERE (status = 'pending' AND run_at <= ?) OR (status = 'running' AND locked_at <= ?)
+                    ORDER BY run_at, id
+                    LIMIT 1
+                    """,
+                    (now, now - self.visibility_timeout)
+                ).fetchone()
+                if row is None:
+                    connection.execute("COMMIT")
+                    return None
+
+                attempts = row["attempts"]
+                if row["status"] == "running":
+                    attempts += 1
+                    if attempts >= self.max_attempts:
+                        error = "El worker no terminó el trabajo antes del visibility timeout"
+                        self._move_to_dead_letters(connection, row["id"], attempts, error, now)
+                        logger.error("Trabajo %s (%s) movido a dead letters: %s", row["id"], row["event"], error)
+                        continue
+                connection.execute(
+                    "UPDATE jobs SET status = 'running', locked_at = ?, attempts = ? WHERE id = ?",
+                    (now, attempts, row["id"])
+                )
+                connection.execute("COMMIT")
+                break
+        except Exception:
+            # Si falló el propio BEGIN no hay transacción que deshacer y el ROLLBACK ocultaría el error
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+        job = dict(row)
+        job["attempts"] = attempts
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    @staticmethod
+    def _move_to_dead_letters(connection, job_id, attempts, error, now):
+        connection.execute(
+            """
+            INSERT OR REPLACE INTO dead_letters
+            (id, event, payload, installation_id, attempts, last_error, created_at, failed_at)
+            SELECT id, event, payload, installation_id, ?, ?, created_at, ? FROM jobs WHERE id = ?
+            """,
+            (attempts, str(error), now, job_id)
+        )
+        connection.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def complete(self, job_id):
+        """
+        Elimina un trabajo procesado correctamente.
+        """
+        connection = self._connect()
+        try:
+            connection.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        finally:
+            connection.close()
+
+    def fail(self, job, error):
+        """
+        Registra un fallo. Reprograma el trabajo con backoff exponencial o lo mueve a
+        dead letters si ya agotó sus intentos. Los errores con 'retry_after' (la instalación
+        se quedó sin presupuesto de GitHub) se reprograman para ese momento sin contar un
+        intento, hasta 'max_deferrals' veces.
+        :return: True si el trabajo se movió a dead letters.
+        """
+        retry_after = getattr(error, "retry_after", None)
+        attempts = job["attempts"] if retry_after is not None else job["attempts"] + 1
+        deferrals = job.get("deferrals", 0) + (1 if retry_after is not None else 0)
+        dead = attempts >= self.max_attempts or deferrals > self.max_deferrals
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            if dead:
+                self._move_to_dead_letters(connection, job["id"], attempts, error, now)
+            else:
+                if retry_after is not None:
+                    delay = retry_after
+                else:
+                    delay = min(self.backoff_base ** attempts, self.backoff_max)
+                connection.execute(
+                    "UPDATE jobs SET status = 'pending', attempts = ?, deferrals = ?, run_at = ?, locked_at = NULL, "
+                    "last_error = ? WHERE id = ?",
+                    (attempts, deferrals, now + delay, str(error), job["id"])
+                )
+            connection.execute("COMMIT")
+        except Exception:
+            # Si falló el propio BEGIN no hay transacción que deshacer y el ROLLBACK ocultaría el error
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+        return dead
+
+    def depth(self):
+        """
+        Número de trabajos pendientes o en ejecución.
+        """
+        connection = self._connect()
+        try:
+            return connection.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+        finally:
+            connection.close()
+
+    def dead_letters(self, limit=50):
+        """
+        Devuelve los últimos trabajos que agotaron sus reintentos.
+        """
+        connection = self._connect()
+        try:
+            rows = connection.execute(
+                "SELECT id, event, installation_id, attempts, last_error, created_at, failed_at "
+                "FROM dead_letters ORDER BY failed_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            connection.close()
+
+
+class WorkerPool:
+    def __init__(self, job_queue, handler, concurrency=4, poll_interval=1.0):
+        """
+        Pool de hilos que consume la cola de trabajos.
+        :param job_queue: Instancia de JobQueue.
+        :param handler: Función handler(event, payload, delivery_id) que procesa un trabajo. Si
+                        lanza una excepción el trabajo se reintenta.
+        :param concurrency: Número de hilos worker.
+        :param poll_interval: Segundos de espera cuando la cola está vacía.
+        """
+        self.job_queue = job_queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._threads = []
+        self._pid = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Arranca los hilos worker. Llamarlo varias veces no crea hilos adicionales; en un proceso
+        bifurcado (gunicorn --preload) los hilos del padre no existen y se arrancan de nuevo.
+        """
+        with self._lock:
+            if self._threads and self._pid == os.getpid():
+                return
+            self._threads = []
+            self._pid = os.getpid()
+            self._stopping.clear()
+            for i in range(self.concurrency):
+                thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """
+        Detiene los hilos worker después de que terminen el trabajo en curso.
+        """
+        with self._lock:
+            self._stopping.set()
+            self._wakeup.set()
+            for thread in self._threads:
+                thread.join(timeout)
+            self._threads = []
+
+    def notify(self):
+        """
+        Despierta a los workers cuando se encola un trabajo nuevo.
+        """
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                job = self.job_queue.claim()
+            except Exception:
+                logger.error("Error al reservar un trabajo de la cola", exc_info=True)
+                job = None
+
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            try:
+                self.handler(job["event"], job["payload"], job.get("delivery_id"))
+            except Exception as e:
+                self._record_failure(job, e)
+            else:
+                try:
+                    self.job_queue.complete(job["id"])
+                except Exception:
+                    # El trabajo queda 'running' y se vuelve a reservar al vencer el visibility timeout
+                    logger.error("Error al completar el trabajo %s (%s)", job["id"], job["event"], exc_info=True)
+
+    def _record_failure(self, job, error):
+        """
+        Registra el fallo de un trabajo sin dejar que un error de SQLite termine el hilo worker.
+        """
+        try:
+            dead = self.job_queue.fail(job, error)
+        except Exception:
+            logger.error("Error al registrar el fallo del trabajo %s (%s): %s", job["id"], job["event"], error,
+                         exc_info=True)
+            return
+        if dead:
+            logger.error("Trabajo %s (%s) movido a dead letters: %s", job['id'], job['event'], error)
+        else:
+            logger.warning("Trabajo %s (%s) falló, se reintentará: %s", job['id'], job['event'], error)
@@ -0,0 +1,299 @@
+"""
+Etiquetado en lote de los issues abiertos de un repositorio (p. ej. al instalar la app en un
+repositorio con un backlog grande).
+
+Uso:
+    python -m services.jobs.relabel owner/repo [--batch-size 10] [--concurrency 2] [--all] [--restart]
+"""
+import argparse
+import logging
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from config import QUEUE_DB_PATH, RELABEL_BATCH_SIZE, RELABEL_CONCURRENCY, LOG_LEVEL
+from services.github.client import github_client, GitHubAPIError
+from services.github.github_actions import get_existing_labels_with_app, apply_suggested_labels, \
+    get_repo_installation_id
+from services.github.github_auth import get_or_create_installation_token
+from services.github.rate_limit import RateLimitExceeded
+from services.labels.classifier import label_classifier
+from services.log import setup_logging, log_context, submit_with_context
+from services.openaiAPI.requests import get_suggested_labels, get_suggested_labels_batch
+
+logger = logging.getLogger(__name__)
+
+# Issues por página del listado; la posición guardada en el checkpoint se traduce a página con este valor
+ISSUES_PER_PAGE = 100
+
+
+class RelabelCheckpoint:
+    def __init__(self, db_path):
+        """
+        Progreso del etiquetado en lote por repositorio, en el mismo archivo SQLite que la cola
+        de trabajos. Guarda el número del último issue procesado y su posición en el listado;
+        los issues se recorren en orden de creación, así que al reanudar se empieza por la página
+        de esa posición y se omiten los que tienen un número menor o igual.
+        """
+        self.db_path = db_path
+        connection = self._connect()
+        try:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS relabel_checkpoints (
+                    repo TEXT PRIMARY KEY,
+                    last_issue INTEGER NOT NULL,
+                    position INTEGER NOT NULL DEFAULT 0,
+                    labeled INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(relabel_checkpoints)")}
+            if "position" not in columns:
+                # Checkpoints creados antes de guardar la posición: se reanudan desde la primera página
+                connection.execute("ALTER TABLE relabel_checkpoints ADD COLUMN position INTEGER NOT NULL DEFAULT 0")
+        finally:
+            connection.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def get(self, repo):
+        """
+        :return: (número del último issue procesado, su posición en el listado); (0, 0) si no hay progreso.
+        """
+        connection = self._connect()
+        try:
+            row = connection.execute(
+                "SELECT last_issue, position FROM relabel_checkpoints WHERE repo = ?", (repo,)
+            ).fetchone()
+            return (row[0], row[1]) if row else (0, 0)
+        finally:
+            connection.close()
+
+    def save(self, repo, last_issue, position, labeled):
+        """
+        Registra que todos los issues hasta 'last_issue' fueron procesados.
+        :param position: Posición de 'last_issue' en el listado de issues abiertos (desde 0).
+        :param labeled: Issues etiquetados en este avance (se suman al total).
+        """
+        connection = self._connect()
+        try:
+            connection.execute(
+                """
+                INSERT INTO relabel_checkpoints (repo, last_issue, position, labeled, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(repo) DO UPDATE SET last_issue = excluded.last_issue, position = excluded.position,
+                    labeled = labeled + excluded.labeled, updated_at = excluded.updated_at
+                """,
+                (repo, last_issue, position, labeled, time.time())
+            )
+        finally:
+            connection.close()
+
+    def reset(self, repo):
+        connection = self._connect()
+        try:
+            connection.execute("DELETE FROM relabel_checkpoints WHERE repo = ?", (repo,))
+        finally:
+            connection.close()
+
+
+def _start_page(url, params, installation_id, after_number, after_position):
+    """
+    Página desde la que reanudar el recorrido: la que contenía el último issue procesado. Si
+    desde entonces se cerraron issues anteriores, el listado se corre hacia atrás, así que se
+    retrocede mientras el primer issue de la página sea posterior al checkpoint.
+    """
+    page = after_position // ISSUES_PER_PAGE + 1
+    while page > 1:
+        response = github_client.get(
+            url, token=get_or_create_installation_token(installation_id), cache=True,
+            installation_id=installation_id, params={**params, "page": page, "per_page": ISSUES_PER_PAGE}
+        )
+        if response.status_code != 200:
+            raise GitHubAPIError(response)
+        items = response.json()
+        if items and items[0]["number"] <= after_number:
+            break
+        page -= 1
+    return page
+
+
+def iter_open_issues(repo_owner, repo_name, installation_id, after_number=0, after_position=0, only_unlabeled=True):
+    """
+    Recorre los issues abiertos del repositorio en orden de creación y produce tuplas
+    (posición en el listado, issue). Empieza por la página de 'after_position' y omite los pull
+    requests (la API de issues también los devuelve), los issues con número menor o igual a
+    'after_number' y, si 'only_unlabeled', los que ya tienen etiquetas.
+    Cada página pide el token al cache, porque el recorrido puede durar más que un token.
+    """
+    url = f"/repos/{repo_owner}/{repo_name}/issues"
+    params = {"state": "open", "sort": "created", "direction": "asc"}
+    page = _start_page(url, params, installation_id, after_number, after_position)
+    issues = github_client.paginate(
+        url, token=lambda: get_or_create_installation_token(installation_id), params={**params, "page": page},
+        per_page=ISSUES_PER_PAGE, cache=True, installation_id=installation_id
+    )
+    for position, issue in enumerate(issues, start=(page - 1) * ISSUES_PER_PAGE):
+        if "pull_request" in issue or issue["number"] <= after_number:
+            continue
+        if only_unlabeled and issue.get("labels"):
+            continue
+        yield position, issue
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def label_batch(repo_owner, repo_name, issues, existing_labels, installation_id):
+    """
+    Sugiere etiquetas para un grupo de issues con una sola solicitud al modelo y las aplica
+    con la misma lógica que los issues nuevos (sin comentar). Los issues que el clasificador
+    local resuelve no se envían al modelo, y los que el modelo omite se consultan uno a uno.
+    :return: Número de issues etiquetados.
+    """
+    repo = f"{repo_owner}/{repo_name}"
+    suggestions = {}
+    for issue in issues:
+        local = label_classifier.suggest(repo, issue["title"], issue.get("body"))
+        if local is not None:
+            suggestions[issue["number"]] = local
+    remaining = [issue for issue in issues if issue["number"] not in suggestions]
+    if remaining:
+        suggestions.update(get_suggested_labels_batch(remaining, existing_labels))
+    token = get_or_create_installation_token(installation_id)
+    labeled = 0
+    for issue in issues:
+        suggested = suggestions.get(issue["number"])
+        if suggested is None:
+            suggested = get_suggested_labels(issue["title"], issue.get("body"), existing_labels)
+        applied = apply_suggested_labels(
+            repo_owner, repo_name, issue["number"], issue["comments_url"], suggested, existing_labels, token,
+            comment_mode="skip"
+        )
+        if applied:
+            labeled += 1
+    return labeled
+
+
+def _wait_for_budget(repo, error):
+    logger.warning("%s: sin presupuesto de GitHub, se reanuda en %.0fs.", repo, error.retry_after)
+    time.sleep(error.retry_after)
+
+
+def relabel_repository(repo_owner, repo_name, installation_id, batch_size=RELABEL_BATCH_SIZE,
+                       concurrency=RELABEL_CONCURRENCY, only_unlabeled=True, checkpoint=None):
+    """
+    Etiqueta los issues abiertos de un repositorio en grupos de 'batch_size' issues por
+    solicitud al modelo, con como mucho 'concurrency' grupos en curso. Las llamadas a GitHub
+    pasan por el scheduler de rate limit del cliente compartido.
+
+    El progreso se guarda después de cada grupo terminado; los grupos se confirman en orden,
+    así el checkpoint nunca salta un grupo pendiente. Si la instalación se queda sin
+    presupuesto (RateLimitExceeded), se espera hasta 'retry_after' y se sigue: un grupo se
+    repite entero (aplicar etiquetas es idempotente) y el listado se retoma desde el último
+    grupo confirmado.
+    :return: Diccionario con los issues procesados y etiquetados.
+    """
+    repo = f"{repo_owner}/{repo_name}"
+    after_number, after_position = checkpoint.get(repo) if checkpoint else (0, 0)
+    if after_number:
+        logger.info("Reanudando el etiquetado de %s después del issue #%s.", repo, after_number)
+
+    token = get_or_create_installation_token(installation_id)
+    existing_labels = get_existing_labels_with_app(repo_owner, repo_name, token)
+    processed = labeled = 0
+    pending = deque()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="relabel") as executor:
+        def submit(batch):
+            return submit_with_context(
+                executor, label_batch, repo_owner, repo_name, [issue for _, issue in batch], existing_labels,
+                installation_id
+            )
+
+        def commit_oldest():
+            nonlocal processed, labeled, after_number, after_position
+            batch, future = pending.popleft()
+            while True:
+                try:
+                    batch_labeled = future.result()
+                    break
+                except RateLimitExceeded as e:
+                    _wait_for_budget(repo, e)
+                    future = submit(batch)
+            after_position, last_issue = batch[-1][0], batch[-1][1]["number"]
+            after_number = last_issue
+            processed += len(batch)
+            labeled += batch_labeled
+            if checkpoint:
+                checkpoint.save(repo, last_issue, after_position, batch_labeled)
+            logger.info("%s: %s issues procesados, %s etiquetados (hasta #%s).", repo, processed, labeled, last_issue)
+
+        while True:
+            issues = iter_open_issues(
+                repo_owner, repo_name, installation_id, after_number=after_number, after_position=after_position,
+                only_unlabeled=only_unlabeled
+            )
+            try:
+                for batch in _batches(issues, batch_size):
+                    pending.append((batch, submit(batch)))
+                    if len(pending) >= concurrency:
+                        commit_oldest()
+                break
+            except RateLimitExceeded as e:
+                # El listado se cortó: se confirman los grupos en curso y se retoma después del último
+                while pending:
+                    commit_oldest()
+                _wait_for_budget(repo, e)
+        while pending:
+            commit_oldest()
+
+    return {"processed": processed, "labeled": labeled}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Etiqueta en lote los issues abiertos de un repositorio.")
+    parser.add_argument("repo", help="Repositorio en formato owner/repo.")
+    parser.add_argument("--batch-size", type=int, default=RELABEL_BATCH_SIZE, help="Issues por solicitud al modelo.")
+    parser.add_argument("--concurrency", type=int, default=RELABEL_CONCURRENCY, help="Grupos en curso a la vez.")
+    parser.add_argument("--all", action="store_true", help="Incluir issues que ya tienen etiquetas.")
+    parser.add_argument("--restart", action="store_true", help="Ignorar el progreso guardado.")
+    args = parser.parse_args(argv)
+
+    setup_logging(LOG_LEVEL)
+    repo_owner, _, repo_name = args.repo.partition("/")
+    if not repo_owner or not repo_name:
+        parser.error("El repositorio debe tener el formato owner/repo.")
+
+    installation_id = get_repo_installation_id(repo_owner, repo_name)
+    if not installation_id or not get_or_create_installation_token(installation_id):
+        logger.error("No se pudo obtener un token de instalación para %s.", args.repo)
+        return 1
+
+    checkpoint = RelabelCheckpoint(QUEUE_DB_PATH)
+    if args.restart:
+        checkpoint.reset(args.repo)
+
+    with log_context(installation_id=installation_id, repo=args.repo):
+        result = relabel_repository(
+            repo_owner, repo_name, installation_id, batch_size=args.batch_size, concurrency=args.concurrency,
+            only_unlabeled=not args.all, checkpoint=checkpoint
+        )
+    logger.info("Etiquetado terminado: %s", result)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,313 @@
+"""
+Clasificador local de etiquetas por repositorio: regresión logística uno-contra-todos sobre
+n-gramas con hashing, entrenada con los issues ya etiquetados del repositorio. Responde en el
+proceso los casos de alta confianza; el resto se envía al modelo de OpenAI.
+
+Reentrenar un repositorio (guarda el modelo y muestra el reporte de precisión y latencia):
+    python -m services.labels.classifier owner/repo [--threshold 0.9] [--min-examples 10]
+
+Los procesos de la app vuelven a leer el modelo cuando el archivo cambia.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import statistics
+import threading
+import time
+import zlib
+from collections import Counter
+
+from config import LABEL_MODEL_DIR, LABEL_CLASSIFIER_THRESHOLD, LOG_LEVEL
+from services.github.issue_index import tokenize
+from services.metrics import LABEL_SUGGESTIONS
+
+logger = logging.getLogger(__name__)
+
+FEATURE_BITS = 18
+BODY_CHARS = 2000
+
+
+def _hash(feature):
+    # crc32 y no hash(): el índice debe ser igual en todos los procesos
+    return zlib.crc32(feature.encode()) & ((1 << FEATURE_BITS) - 1)
+
+
+def features(title, body):
+    """
+    Vector disperso {índice: valor} con unigramas y bigramas del título y la descripción.
+    Los términos del título también se cuentan aparte porque suelen decidir la etiqueta.
+    Normalizado a norma 1 (L2).
+    """
+    title_terms = tokenize(title)
+    terms = title_terms + tokenize((body or "")[:BODY_CHARS])
+    raw = [f"t:{term}" for term in title_terms]
+    raw.extend(terms)
+    raw.extend(f"{first} {second}" for first, second in zip(terms, terms[1:]))
+
+    counts = Counter(_hash(feature) for feature in raw)
+    norm = math.sqrt(sum(value * value for value in counts.values())) or 1.0
+    return {index: value / norm for index, value in counts.items()}
+
+
+def _sigmoid(value):
+    if value < -35:
+        return 0.0
+    return 1.0 / (1.0 + math.exp(-value))
+
+
+class LabelModel:
+    def __init__(self, weights, biases, threshold=0.9, report=None, trained_at=None):
+        """
+        Modelo entrenado de un repositorio.
+        :param weights: {etiqueta: {índice: peso}}.
+        :param biases: {etiqueta: sesgo}.
+        :param threshold: Probabilidad desde la que una etiqueta se considera segura (y hasta
+                          1 - threshold, que se considera segura su ausencia).
+        """
+        self.weights = weights
+        self.biases = biases
+        self.threshold = threshold
+        self.report = report or {}
+        self.trained_at = trained_at or time.time()
+
+    @property
+    def labels(self):
+        return list(self.weights)
+
+    def probabilities(self, vector):
+        return {
+            label: _sigmoid(self.biases[label] + sum(weights.get(index, 0.0) * value for index, value in vector.items()))
+            for label, weights in self.weights.items()
+        }
+
+    def predict(self, title, body):
+        """
+        :return: Lista de etiquetas si la predicción es segura, o None si hay que consultar al LLM.
+                 Es segura cuando al menos una etiqueta supera 'threshold' y ninguna queda en la
+                 zona dudosa entre 1 - threshold y threshold.
+        """
+        probabilities = self.probabilities(features(title, body))
+        selected = [label for label, probability in probabilities.items() if probability >= self.threshold]
+        doubtful = any(1 - self.threshold < probability < self.threshold for probability in probabilities.values())
+        if not selected or doubtful:
+            return None
+        return selected
+
+    def to_dict(self):
+        return {
+            "weights": {label: {str(index): weight for index, weight in weights.items()}
+                        for label, weights in self.weights.items()},
+            "biases": self.biases,
+            "threshold": self.threshold,
+            "report": self.report,
+            "trained_at": self.trained_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        weights = {label: {int(index): weight for index, weight in label_weights.items()}
+                   for label, label_weights in data["weights"].items()}
+        return cls(weights, data["biases"], data.get("threshold", 0.9), data.get("report"), data.get("trained_at"))
+
+
+def train(examples, threshold=0.9, min_examples=10, epochs=8, learning_rate=0.5, l2=1e-5, prune=1e-3, seed=0):
+    """
+    Entrena una regresión logística por etiqueta con SGD.
+    :param examples: Lista de tuplas (vector, etiquetas) con el vector de features().
+    :param min_examples: Ejemplos positivos mínimos para aprender una etiqueta; las demás
+                         quedan para el LLM.
+    :param prune: Los pesos con valor absoluto menor se descartan para que el modelo sea chico.
+    :return: LabelModel.
+    """
+    positives = Counter(label for _, labels in examples for label in labels)
+    learned = sorted(label for label, count in positives.items() if count >= min_examples)
+    rng = random.Random(seed)
+    order = list(range(len(examples)))
+
+    weights = {label: {} for label in learned}
+    biases = {label: math.log(positives[label] / max(len(examples) - positives[label], 1)) for label in learned}
+    for epoch in range(epochs):
+        rng.shuffle(order)
+        rate = learning_rate / (1 + epoch)
+        for position in order:
+            vector, labels = examples[position]
+            for label in learned:
+                label_weights = weights[label]
+                score = biases[label] + sum(label_weights.get(index, 0.0) * value for index, value in vector.items())
+                gradient = _sigmoid(score) - (1.0 if label in labels else 0.0)
+                biases[label] -= rate * gradient
+                for index, value in vector.items():
+                    weight = label_weights.get(index, 0.0)
+                    label_weights[index] = weight - rate * (gradient * value + l2 * weight)
+
+    pruned = {
+        label: {index: weight for index, weight in label_weights.items() if abs(weight) >= prune}
+        for label, label_weights in weights.items()
+    }
+    return LabelModel(pruned, biases, threshold=threshold)
+
+
+def evaluate(model, issues):
+    """
+    Mide el modelo con issues que no usó para entrenar.
+    :param issues: Lista de tuplas (title, body, etiquetas).
+    :return: Diccionario con cobertura (fracción respondida localmente), precisión de las
+             etiquetas respondidas, aciertos exactos y latencia de predict en milisegundos.
+    """
+    answered = correct_labels = predicted_labels = exact = 0
+    latencies = []
+    for title, body, labels in issues:
+        start = time.perf_counter()
+        prediction = model.predict(title, body)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if prediction is None:
+            continue
+        answered += 1
+        predicted_labels += len(prediction)
+        correct_labels += sum(1 for label in prediction if label in labels)
+        exact += set(prediction) == set(labels) & set(model.labels)
+
+    latencies.sort()
+    return {
+        "holdout": len(issues),
+        "coverage": answered / len(issues) if issues else 0.0,
+        "precision": correct_labels / predicted_labels if predicted_labels else None,
+        "exact_match": exact / answered if answered else None,
+        "latency_ms_mean": statistics.fmean(latencies) if latencies else None,
+        "latency_ms_p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else None,
+        "labels": len(model.labels),
+    }
+
+
+def train_repository(issues, threshold=0.9, min_examples=10, holdout_every=5):
+    """
+    Entrena con los issues etiquetados de un repositorio. Uno de cada 'holdout_every' issues se
+    aparta para el reporte; el modelo final se entrena con todos.
+    :param issues: Issues de la API de GitHub.
+    :return: LabelModel con el reporte en model.report.
+    """
+    rows = [
+        (issue["title"], issue.get("body"), {label["name"] for label in issue.get("labels", [])})
+        for issue in issues if issue.get("labels") and "pull_request" not in issue
+    ]
+    holdout = [row for position, row in enumerate(rows) if position % holdout_every == 0]
+    training = [row for position, row in enumerate(rows) if position % holdout_every != 0]
+
+    def examples(selected):
+        return [(features(title, body), labels) for title, body, labels in selected]
+
+    trial = train(examples(training), threshold=threshold, min_examples=min_examples)
+    report = evaluate(trial, holdout)
+    report["training"] = len(training)
+
+    model = train(examples(rows), threshold=threshold, min_examples=min_examples)
+    model.report = report
+    return model
+
+
+class LabelClassifierStore:
+    def __init__(self, directory):
+        """
+        Modelos por repositorio guardados como JSON en 'directory'. Cada proceso los carga en el
+        primer uso y los vuelve a leer si el archivo cambia (después de reentrenar).
+        :param directory: Directorio de los modelos; None desactiva el clasificador.
+        """
+        self.directory = directory
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _file(self, repo):
+        return os.path.join(self.directory, f"{repo.replace('/', '__')}.json")
+
+    def get(self, repo):
+        """
+        :return: LabelModel del repositorio o None si no hay uno entrenado.
+        """
+        if not self.directory:
+            return None
+        path = self._file(repo)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+
+        with self._lock:
+            cached = self._models.get(repo)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        try:
+            with open(path, encoding="utf-8") as f:
+                model = LabelModel.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError) as e:
+            logger.error("Error al cargar el clasificador de %s: %s", repo, e)
+            return None
+        with self._lock:
+            self._models[repo] = (mtime, model)
+        return model
+
+    def save(self, repo, model):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._file(repo)
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(model.to_dict(), f)
+        os.replace(tmp_file, path)
+
+    def suggest(self, repo, title, body):
+        """
+        Etiquetas del clasificador local si la predicción es segura; None si no hay modelo o
+        hay que consultar al LLM.
+        """
+        model = self.get(repo)
+        labels = model.predict(title, body) if model is not None else None
+        LABEL_SUGGESTIONS.inc(source="local" if labels is not None else "llm")
+        return labels
+
+
+# Modelos entrenados con el comando de este módulo; se consultan antes que el LLM
+label_classifier = LabelClassifierStore(LABEL_MODEL_DIR)
+
+
+def main(argv=None):
+    from services.github.client import github_client
+    from services.github.github_actions import get_repo_installation_id
+    from services.github.github_auth import get_or_create_installation_token
+    from services.log import setup_logging
+
+    parser = argparse.ArgumentParser(description="Entrena el clasificador local de etiquetas de un repositorio.")
+    parser.add_argument("repo", help="Repositorio en formato owner/repo.")
+    parser.add_argument("--threshold", type=float, default=LABEL_CLASSIFIER_THRESHOLD,
+                        help="Probabilidad mínima para responder sin LLM.")
+    parser.add_argument("--min-examples", type=int, default=10, help="Issues mínimos por etiqueta.")
+    args = parser.parse_args(argv)
+
+    setup_logging(LOG_LEVEL)
+    repo_owner, _, repo_name = args.repo.partition("/")
+    if not repo_owner or not repo_name:
+        parser.error("El repositorio debe tener el formato owner/repo.")
+    if not LABEL_MODEL_DIR:
+        parser.error("Configura LABEL_MODEL_DIR para guardar el modelo.")
+
+    installation_id = get_repo_installation_id(repo_owner, repo_name)
+    token = get_or_create_installation_token(installation_id) if installation_id else None
+    if not token:
+        logger.error("No se pudo obtener un token de instalación para %s.", args.repo)
+        return 1
+
+    url = f"/repos/{repo_owner}/{repo_name}/issues"
+    issues = [
+        issue for issue in github_client.paginate(url, token=token, params={"state": "all"}, prefetch=True)
+        if issue.get("labels") and "pull_request" not in issue
+    ]
+    model = train_repository(issues, threshold=args.threshold, min_examples=args.min_examples)
+    label_classifier.save(args.repo, model)
+    logger.info("Clasificador de %s entrenado con %s issues: %s", args.repo, len(issues), model.report)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,47 @@
+import threading
+
+
+class LazyService:
+    """
+    Proxy de un servicio (cliente de Mongo, OpenAI, ...) que se construye en el primer acceso
+    a uno de sus atributos. Importar el módulo que lo define no abre conexiones ni exige las
+    variables de entorno del servicio.
+    """
+
+    def __init__(self, factory, name=None):
+        """
+        :param factory: Función sin argumentos que crea el servicio.
+        :param name: Nombre del servicio, para repr y mensajes de error.
+        """
+        self._factory = factory
+        self._name = name or getattr(factory, "__name__", "service")
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def _resolve(self):
+        """
+        Devuelve el servicio, creándolo una sola vez aunque varios hilos lo pidan a la vez.
+        Es privado para no ocultar un método 'get' del servicio.
+        """
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+                instance = self._instance
+        return instance
+
+    @property
+    def initialized(self):
+        """
+        True si el servicio ya fue creado.
+        """
+        return self._instance is not None
+
+    def __getattr__(self, name):
+        # Solo se llama para atributos que no son del proxy
+        return getattr(self._resolve(), name)
+
+    def __repr__(self):
+        state = "initialized" if self.initialized else "pending"
+        return f"<LazyService {self._name} ({state})>"
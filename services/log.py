@@ -0,0 +1,127 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+
+# Contexto de la entrega que se está procesando; se agrega a cada registro de log
+_context = ContextVar("log_context", default={})
+
+_listener = None
+
+
+@contextmanager
+def log_context(**values):
+    """
+    Agrega campos (delivery_id, installation_id, repo, ...) a todos los logs emitidos dentro del bloque.
+    """
+    token = _context.set({**_context.get(), **{key: value for key, value in values.items() if value is not None}})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def submit_with_context(executor, fn, *args, **kwargs):
+    """
+    executor.submit que conserva el contexto de log del hilo que envía la tarea.
+    """
+    return executor.submit(copy_context().run, fn, *args, **kwargs)
+
+
+class ContextFilter(logging.Filter):
+    """
+    Copia el contexto de la entrega al registro en el hilo que lo emite.
+    """
+
+    def filter(self, record):
+        record.context = _context.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Descarta una fracción de los mensajes de alto volumen. Se activa por mensaje con
+    extra={"sample_rate": 0.01}.
+    """
+
+    def filter(self, record):
+        rate = getattr(record, "sample_rate", None)
+        return rate is None or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formatea cada registro como una línea JSON.
+    """
+
+    def format(self, record):
+        data = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        data.update(getattr(record, "context", {}))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        if record.stack_info:
+            data["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que no formatea el registro en el hilo que lo emite. El QueueHandler estándar
+    lo formatea con su propio formatter y deja la traza dentro de "message"; este solo resuelve
+    el mensaje (los argumentos podrían cambiar después) y guarda la traza en exc_text para que
+    JsonFormatter arme el campo "exception" en el hilo del listener.
+    """
+
+    _traceback_formatter = logging.Formatter()
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self._traceback_formatter.formatException(record.exc_info)
+            # La traza no viaja por la cola: mantiene vivos los frames del hilo que emitió
+            record.exc_info = None
+        return record
+
+
+def setup_logging(level="INFO"):
+    """
+    Configura el logging del proceso: los registros se encolan en memoria y un hilo aparte
+    los escribe en stdout como JSON, para que los workers no se bloqueen escribiendo.
+    Llamarla varias veces no agrega handlers adicionales.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = StructuredQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter())
+    queue_handler.addFilter(ContextFilter())
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
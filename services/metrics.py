@@ -0,0 +1,263 @@
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        lines = self.header()
+        for key, value in values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Mide la duración del bloque y la registra en el histograma.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        lines = self.header()
+        for key, (counts, total, count) in series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', bound))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class CallbackGauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, callback, labelnames=()):
+        """
+        Gauge cuyo valor se lee al exportar.
+        :param callback: Función que devuelve un número, o un dict {tupla de etiquetas: número}.
+        """
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def render(self):
+        try:
+            value = self.callback()
+        except Exception as e:
+            logger.error("Error al leer la métrica %s: %s", self.name, e)
+            return []
+        lines = self.header()
+        values = value if isinstance(value, dict) else {(): value}
+        for key, item in values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {item}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        """
+        Exporta todas las métricas en el formato de texto de Prometheus.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+WEBHOOK_HANDLING_SECONDS = REGISTRY.register(Histogram(
+    "botmanager_webhook_handling_seconds", "Tiempo de procesamiento de una entrega de webhook.", ("event", "action")
+))
+WEBHOOK_DELIVERIES_IGNORED = REGISTRY.register(Counter(
+    "botmanager_webhook_deliveries_ignored_total", "Entregas descartadas por no tener handler.", ("event",)
+))
+TOKEN_MINT_SECONDS = REGISTRY.register(Histogram(
+    "botmanager_installation_token_mint_seconds", "Tiempo para generar un token de instalación."
+))
+GITHUB_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "botmanager_github_request_seconds", "Duración de las solicitudes a la API de GitHub.", ("method", "endpoint", "status")
+))
+MONGO_OPERATION_SECONDS = REGISTRY.register(Histogram(
+    "botmanager_mongo_operation_seconds", "Duración de las operaciones de MongoDB.", ("operation",)
+))
+OPENAI_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "botmanager_openai_request_seconds", "Duración de las solicitudes a OpenAI.", ("model",),
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+))
+OPENAI_TOKENS = REGISTRY.register(Counter(
+    "botmanager_openai_tokens_total", "Tokens consumidos en OpenAI.", ("model", "type")
+))
+LABEL_SUGGESTIONS = REGISTRY.register(Counter(
+    "botmanager_label_suggestions_total", "Issues etiquetados según el origen de la sugerencia.", ("source",)
+))
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def github_endpoint(url):
+    """
+    Normaliza una URL de GitHub a una plantilla de ruta para usarla como etiqueta
+    (sin owner, repo ni números, para no crear una serie por recurso).
+    """
+    path = url.split("://", 1)[-1]
+    path = "/" + path.split("/", 1)[1] if "/" in path else "/"
+    path = path.split("?", 1)[0]
+    if path.startswith("/repos/"):
+        parts = path.split("/")
+        if len(parts) >= 4:
+            parts[2], parts[3] = ":owner", ":repo"
+        path = "/".join(parts)
+    path = _ID_SEGMENT.sub("/:id", path)
+    return re.sub(r"/contents/.*$", "/contents/:path", path)
+
+
+def timed(histogram, **labels):
+    """
+    Decorador que registra la duración de cada llamada en el histograma.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with histogram.time(**labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_openai_usage(model, usage):
+    """
+    Suma los tokens de una respuesta de OpenAI (campo 'usage') al contador.
+    """
+    if usage is None:
+        return
+    OPENAI_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, model=model, type="prompt")
+    OPENAI_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, model=model, type="completion")
+
+
+# Caches que exponen stats() con 'hits' y 'misses' (o 'hit_rate')
+_cache_providers = {}
+
+
+def register_cache(name, stats):
+    """
+    Registra la función stats() de un cache para exportar sus aciertos y fallos.
+    """
+    _cache_providers[name] = stats
+
+
+def _cache_values(field):
+    values = {}
+    for name, stats in list(_cache_providers.items()):
+        data = stats()
+        if field in data:
+            values[(name,)] = data[field]
+    return values
+
+
+def _cache_lookups():
+    values = {}
+    for name, stats in list(_cache_providers.items()):
+        data = stats()
+        hits = data.get("hits", data.get("memory_hits", 0) + data.get("store_hits", 0))
+        values[(name, "hit")] = hits
+        values[(name, "miss")] = data.get("misses", 0)
+    return values
+
+
+REGISTRY.register(CallbackGauge(
+    "botmanager_cache_hit_ratio", "Proporción de aciertos por cache.", lambda: _cache_values("hit_rate"), ("cache",)
+))
+REGISTRY.register(CallbackGauge(
+    "botmanager_cache_lookups", "Consultas a cada cache por resultado.", _cache_lookups, ("cache", "result")
+))
@@ -1,72 +1,233 @@
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+
 from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError
 from cryptography.fernet import Fernet
+
+from services.metrics import MONGO_OPERATION_SECONDS, timed
+
 # from config import DB_USERNAME, DB_PASSWORD, ENCRYPTION_KEY
 # from urllib.parse import quote_plus
 
+logger = logging.getLogger(__name__)
+
 class MongoDBHandler:
-    def __init__(self, uri, database_name, encryption_key):
+    def __init__(self, uri, database_name, encryption_key, max_pool_size=10, max_idle_time_ms=60000,
+                 server_selection_timeout_ms=5000):
         """
         Inicializa el manejador para conectarse a MongoDB y manejar tokens encriptados.
+        El cliente se crea en el primer uso y se reutiliza (con su pool de conexiones)
+        durante toda la vida del manejador.
         """
         self.uri = uri
         self.database_name = database_name
         self.encryption_key = encryption_key
         self.cipher = Fernet(self.encryption_key)
+        self.max_pool_size = max_pool_size
+        self.max_idle_time_ms = max_idle_time_ms
+        self.server_selection_timeout_ms = server_selection_timeout_ms
+        self.client = None
+        self.db = None
+        self._pid = None
+        self._indexes_ready = False
+        self._lock = threading.Lock()
 
-    def _open_connection(self):
+    def _get_db(self):
         """
-        Abre la conexión a la base de datos.
+        Devuelve la base de datos, creando el cliente si no existe. Si el proceso fue
+        bifurcado (fork de gunicorn) se crea un cliente nuevo, ya que MongoClient no es fork-safe.
         """
-        self.client = MongoClient(self.uri)
-        self.db = self.client[self.database_name]
+        pid = os.getpid()
+        if self.client is not None and self._pid == pid:
+            return self.db
+
+        with self._lock:
+            if self.client is None or self._pid != pid:
+                self.client = MongoClient(
+                    self.uri,
+                    maxPoolSize=self.max_pool_size,
+                    maxIdleTimeMS=self.max_idle_time_ms,
+                    serverSelectionTimeoutMS=self.server_selection_timeout_ms,
+                    connect=False
+                )
+                self.db = self.client[self.database_name]
+                self._pid = pid
+            if not self._indexes_ready:
+                self._ensure_indexes()
+        return self.db
+
+    def _ensure_indexes(self):
+        """
+        Crea los índices que usan las consultas del manejador. create_index es idempotente.
+        """
+        try:
+            self.db["user_tokens"].create_index("username", unique=True)
+            self.db["llm_completions"].create_index("key", unique=True)
+            self.db["llm_completions"].create_index("expires_at_date", expireAfterSeconds=0)
+            self.db["webhook_deliveries"].create_index("delivery_id", unique=True)
+            self.db["webhook_deliveries"].create_index("expires_at", expireAfterSeconds=0)
+            self._indexes_ready = True
+        except Exception as e:
+            logger.error("Error al crear los índices de MongoDB: %s", e)
 
-    def _close_connection(self):
+    def close(self):
         """
-        Cierra la conexión a la base de datos.
+        Cierra el cliente y su pool de conexiones.
         """
-        if hasattr(self, 'client'):
-            self.client.close()
+        with self._lock:
+            if self.client is not None and self._pid == os.getpid():
+                self.client.close()
+            self.client = None
+            self.db = None
+            self._pid = None
 
+    @timed(MONGO_OPERATION_SECONDS, operation="save_user_token")
     def save_user_token(self, username, token):
         """
         Guarda un token de usuario en la base de datos, encriptado.
         """
-        try:
-            self._open_connection()
-            encrypted_token = self.cipher.encrypt(token.encode())
-            collection = self.db["user_tokens"]
-            collection.update_one(
-                {"username": username},
-                {"$set": {"token": encrypted_token.decode()}},
-                upsert=True
-            )
-        finally:
-            self._close_connection()
+        db = self._get_db()
+        encrypted_token = self.cipher.encrypt(token.encode())
+        collection = db["user_tokens"]
+        collection.update_one(
+            {"username": username},
+            {"$set": {"token": encrypted_token.decode()}},
+            upsert=True
+        )
 
+    @timed(MONGO_OPERATION_SECONDS, operation="get_user_token")
     def get_user_token(self, username):
         """
         Recupera un token de usuario por su username, desencriptado.
         """
-        try:
-            self._open_connection()
-            collection = self.db["user_tokens"]
-            user_data = collection.find_one({"username": username})
-            if user_data and "token" in user_data:
-                user_data["token"] = self.cipher.decrypt(user_data["token"].encode()).decode()
-            return user_data
-        finally:
-            self._close_connection()
+        db = self._get_db()
+        collection = db["user_tokens"]
+        user_data = collection.find_one({"username": username})
+        if user_data and "token" in user_data:
+            user_data["token"] = self.cipher.decrypt(user_data["token"].encode()).decode()
+        return user_data
+
+    @timed(MONGO_OPERATION_SECONDS, operation="get_first_available_token")
+    def get_first_available_token(self, usernames):
+        """
+        Busca en una sola consulta los tokens de varios usuarios y devuelve el del primero
+        (según el orden de 'usernames') que tenga uno. Solo se desencripta ese token.
+        :param usernames: Lista de usernames en orden de preferencia.
+        :return: Diccionario con 'username' y 'token' desencriptado, o None.
+        """
+        if not usernames:
+            return None
+
+        db = self._get_db()
+        collection = db["user_tokens"]
+        cursor = collection.find(
+            {"username": {"$in": list(usernames)}, "token": {"$exists": True}},
+            {"_id": 0, "username": 1, "token": 1}
+        )
+        encrypted_tokens = {doc["username"]: doc["token"] for doc in cursor}
 
+        for username in usernames:
+            if username in encrypted_tokens:
+                return {
+                    "username": username,
+                    "token": self.cipher.decrypt(encrypted_tokens[username].encode()).decode()
+                }
+        return None
+
+    @timed(MONGO_OPERATION_SECONDS, operation="delete_user_token")
     def delete_user_token(self, username):
         """
         Elimina el token de un usuario por su username.
         """
+        db = self._get_db()
+        collection = db["user_tokens"]
+        collection.delete_one({"username": username})
+
+    @timed(MONGO_OPERATION_SECONDS, operation="save_installation_token")
+    def save_installation_token(self, installation_id, token, expires_at):
+        """
+        Guarda el token de una instalación, encriptado, para compartirlo entre workers.
+        """
+        db = self._get_db()
+        encrypted_token = self.cipher.encrypt(token.encode())
+        collection = db["installation_tokens"]
+        collection.update_one(
+            {"installation_id": installation_id},
+            {"$set": {"token": encrypted_token.decode(), "expires_at": expires_at}},
+            upsert=True
+        )
+
+    @timed(MONGO_OPERATION_SECONDS, operation="get_installation_token")
+    def get_installation_token(self, installation_id):
+        """
+        Recupera el token compartido de una instalación, desencriptado.
+        :return: Diccionario con 'token' y 'expires_at' o None.
+        """
+        db = self._get_db()
+        collection = db["installation_tokens"]
+        data = collection.find_one({"installation_id": installation_id})
+        if not data or "token" not in data:
+            return None
+        return {
+            "token": self.cipher.decrypt(data["token"].encode()).decode(),
+            "expires_at": data["expires_at"]
+        }
+
+    @timed(MONGO_OPERATION_SECONDS, operation="save_cached_completion")
+    def save_cached_completion(self, key, content, expires_at):
+        """
+        Guarda una respuesta del modelo. Mongo la elimina al llegar a 'expires_at' (índice TTL).
+        """
+        db = self._get_db()
+        collection = db["llm_completions"]
+        collection.update_one(
+            {"key": key},
+            {"$set": {
+                "content": content,
+                "expires_at": expires_at,
+                "expires_at_date": datetime.fromtimestamp(expires_at, tz=timezone.utc)
+            }},
+            upsert=True
+        )
+
+    @timed(MONGO_OPERATION_SECONDS, operation="get_cached_completion")
+    def get_cached_completion(self, key):
+        """
+        Recupera una respuesta del modelo guardada.
+        :return: Diccionario con 'content' y 'expires_at' o None.
+        """
+        db = self._get_db()
+        collection = db["llm_completions"]
+        return collection.find_one({"key": key}, {"_id": 0, "content": 1, "expires_at": 1})
+
+    @timed(MONGO_OPERATION_SECONDS, operation="register_delivery")
+    def register_delivery(self, delivery_id, expires_at):
+        """
+        Registra el ID de una entrega de webhook. El índice único hace la operación atómica
+        entre workers.
+        :return: True si la entrega es nueva, False si ya estaba registrada.
+        """
+        db = self._get_db()
+        collection = db["webhook_deliveries"]
         try:
-            self._open_connection()
-            collection = self.db["user_tokens"]
-            collection.delete_one({"username": username})
-        finally:
-            self._close_connection()
+            collection.insert_one({
+                "delivery_id": delivery_id,
+                "expires_at": datetime.fromtimestamp(expires_at, tz=timezone.utc)
+            })
+        except DuplicateKeyError:
+            return False
+        return True
+
+    @timed(MONGO_OPERATION_SECONDS, operation="forget_delivery")
+    def forget_delivery(self, delivery_id):
+        """
+        Elimina el registro de una entrega de webhook.
+        """
+        db = self._get_db()
+        db["webhook_deliveries"].delete_one({"delivery_id": delivery_id})
 
 
 # if __name__ == "__main__":
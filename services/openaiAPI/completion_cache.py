@@ -0,0 +1,97 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def completion_key(model, system_prompt, user_prompt, temperature, max_tokens):
+    """
+    Hash del contenido de una solicitud de completion; solicitudes idénticas comparten clave.
+    """
+    raw = json.dumps([model, system_prompt, user_prompt, temperature, max_tokens], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    def __init__(self, max_entries=512, ttl=7 * 24 * 3600, store=None):
+        """
+        Cache de respuestas del modelo indexado por el contenido de la solicitud.
+
+        :param max_entries: Entradas máximas en memoria (se expulsa la menos usada).
+        :param ttl: Segundos de validez de una respuesta.
+        :param store: Almacén persistente opcional con los métodos get_cached_completion(key)
+                      y save_cached_completion(key, content, expires_at).
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _set_memory(self, key, content, expires_at):
+        with self._lock:
+            self._entries[key] = (content, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        """
+        Devuelve el contenido guardado o None.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[0]
+                del self._entries[key]
+
+        if self.store is not None:
+            try:
+                stored = self.store.get_cached_completion(key)
+            except Exception as e:
+                logger.error("Error al leer el cache de completions: %s", e)
+                stored = None
+            if stored and stored["expires_at"] > now:
+                self._set_memory(key, stored["content"], stored["expires_at"])
+                with self._lock:
+                    self.store_hits += 1
+                return stored["content"]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, content):
+        expires_at = time.time() + self.ttl
+        self._set_memory(key, content, expires_at)
+        if self.store is not None:
+            try:
+                self.store.save_cached_completion(key, content, expires_at)
+            except Exception as e:
+                logger.error("Error al guardar en el cache de completions: %s", e)
+
+    def stats(self):
+        """
+        Aciertos por nivel, fallos y tasa de aciertos.
+        """
+        with self._lock:
+            hits = self.memory_hits + self.store_hits
+            total = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+                "entries": len(self._entries),
+            }
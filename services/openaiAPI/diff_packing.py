@@ -0,0 +1,203 @@
+import os
+
+_encoding = None
+_encoding_loaded = False
+
+# Archivos que casi nunca aportan a la revisión: se incluyen al final si sobra presupuesto
+LOCKFILES = {
+    "package-lock.json", "yarn.lock", "pnpm-lock.yaml", "poetry.lock", "Pipfile.lock",
+    "Cargo.lock", "go.sum", "composer.lock", "Gemfile.lock", "uv.lock",
+}
+GENERATED_DIRS = ("dist/", "build/", "vendor/", "node_modules/", "__generated__/", "generated/")
+GENERATED_SUFFIXES = (".min.js", ".min.css", ".map", "_pb2.py", ".pb.go", ".snap", ".svg")
+
+# Presupuesto apartado para la lista de archivos omitidos y cuántos se listan por nombre antes
+# de resumirlos como "N more files"
+OMITTED_SUMMARY_RESERVE = 100
+MAX_OMITTED_LISTED = 50
+
+
+def _get_encoding():
+    """
+    Carga el tokenizador de tiktoken en el primer uso (leer la tabla BPE es lento).
+    """
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = None
+        _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text):
+    """
+    Cuenta tokens localmente. Usa tiktoken si está instalado; si no, aproxima con
+    4 caracteres por token.
+    """
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def file_priority(file):
+    """
+    Clave de orden para un archivo del PR: primero el código fuente, luego lockfiles y
+    código generado; dentro de cada grupo, los archivos con más cambios primero.
+    """
+    filename = file.get("filename", "")
+    basename = os.path.basename(filename)
+    churn = file.get("additions", 0) + file.get("deletions", 0)
+
+    if basename in LOCKFILES:
+        group = 2
+    elif filename.endswith(GENERATED_SUFFIXES) or any(part in filename for part in GENERATED_DIRS):
+        group = 1
+    else:
+        group = 0
+    return group, -churn, filename
+
+
+def split_hunks(patch):
+    """
+    Divide un patch unificado en hunks (cada uno empieza con '@@').
+    """
+    hunks = []
+    current = []
+    for line in patch.splitlines():
+        if line.startswith("@@") and current:
+            hunks.append("\n".join(current))
+            current = []
+        current.append(line)
+    if current:
+        hunks.append("\n".join(current))
+    return hunks
+
+
+def _file_summary(file):
+    return f"{file.get('filename')} ({file.get('status', 'modified')}, +{file.get('additions', 0)} -{file.get('deletions', 0)})"
+
+
+def _truncation_note(omitted_hunks):
+    return f"\n... {omitted_hunks} hunk(s) truncated or omitted to fit the review budget"
+
+
+def _fit_hunks(hunks, available):
+    """
+    Toma hunks completos mientras quepan en 'available' tokens. El primer hunk que no cabe se
+    recorta línea por línea al presupuesto restante (si queda algo más que su línea '@@').
+    :return: Tupla (hunks incluidos, tokens usados, hunks incluidos completos).
+    """
+    included = []
+    used = 0
+    for hunk in hunks:
+        hunk_tokens = count_tokens(hunk) + 1
+        if used + hunk_tokens <= available:
+            included.append(hunk)
+            used += hunk_tokens
+            continue
+
+        lines = []
+        lines_tokens = 0
+        for line in hunk.split("\n"):
+            line_tokens = count_tokens(line) + 1
+            if used + lines_tokens + line_tokens > available:
+                break
+            lines.append(line)
+            lines_tokens += line_tokens
+        if len(lines) > 1:
+            included.append("\n".join(lines))
+            used += lines_tokens
+            return included, used, len(included) - 1
+        return included, used, len(included)
+    return included, used, len(included)
+
+
+def _omitted_summary(omitted_files, available):
+    """
+    Lista los archivos omitidos sin superar 'available' tokens. Después de MAX_OMITTED_LISTED
+    archivos, o cuando ya no caben, el resto se resume como "N more files".
+    """
+    header = "Files omitted to fit the review budget:\n"
+    lines = []
+    used = count_tokens(header)
+    for position, file in enumerate(omitted_files):
+        rest = len(omitted_files) - position
+        line = f"- {_file_summary(file)}\n"
+        line_tokens = count_tokens(line)
+        # Si no es el último, tiene que quedar lugar para la línea "N more files"
+        tail_tokens = count_tokens(f"- ... and {rest - 1} more files\n") if rest > 1 else 0
+        if position >= MAX_OMITTED_LISTED or used + line_tokens + tail_tokens > available:
+            break
+        lines.append(line)
+        used += line_tokens
+
+    rest = len(omitted_files) - len(lines)
+    if not lines:
+        summary = f"{rest} more files omitted to fit the review budget.\n"
+        return summary if count_tokens(summary) <= available else ""
+    if rest:
+        lines.append(f"- ... and {rest} more files\n")
+    return header + "".join(lines)
+
+
+def pack_diff(pr_files, token_budget):
+    """
+    Construye la sección de cambios del prompt respetando un presupuesto de tokens.
+
+    Los archivos se ordenan por relevancia y se incluyen hunk por hunk mientras quede
+    presupuesto; el primer hunk que no cabe se recorta al presupuesto restante. Los archivos
+    sin 'patch' (binarios o demasiado grandes) o que ya no caben se listan solo con sus
+    estadísticas, y esa lista también cuenta contra el presupuesto.
+
+    :param pr_files: Lista de archivos devuelta por la API de GitHub.
+    :param token_budget: Tokens máximos para la sección de cambios.
+    :return: Texto con los diffs seleccionados.
+    """
+    parts = []
+    omitted_files = []
+    reserve = min(OMITTED_SUMMARY_RESERVE, token_budget // 10)
+    remaining = token_budget - reserve
+
+    for file in sorted(pr_files, key=file_priority):
+        patch = file.get("patch")
+        header = f"File: {_file_summary(file)}\nDiff:\n"
+        header_tokens = count_tokens(header)
+
+        if not patch:
+            note = f"File: {_file_summary(file)}\n(diff not available: binary or too large)\n\n"
+            note_tokens = count_tokens(note)
+            if note_tokens <= remaining:
+                parts.append(note)
+                remaining -= note_tokens
+            else:
+                omitted_files.append(file)
+            continue
+
+        hunks = split_hunks(patch)
+        available = remaining - header_tokens - 1
+        included, used, complete = _fit_hunks(hunks, available)
+        if complete < len(hunks):
+            # Se vuelve a ajustar dejando lugar para la nota de hunks omitidos
+            note_tokens = count_tokens(_truncation_note(len(hunks)))
+            included, used, complete = _fit_hunks(hunks, available - note_tokens)
+            used += note_tokens
+
+        if not included:
+            omitted_files.append(file)
+            continue
+
+        parts.append(header)
+        parts.append("\n".join(included))
+        if complete < len(hunks):
+            parts.append(_truncation_note(len(hunks) - complete))
+        parts.append("\n\n")
+        remaining -= header_tokens + used + 1
+
+    if omitted_files:
+        parts.append(_omitted_summary(omitted_files, remaining + reserve))
+
+    return "".join(parts)
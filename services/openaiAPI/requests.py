@@ -1,28 +1,165 @@
+import logging
 import os
+from functools import partial
 
-import openai
-import json
+from config import PR_PROMPT_TOKEN_BUDGET, LLM_CACHE_SIZE, LLM_CACHE_TTL, LLM_CACHE_PERSISTENT, LLM_LABELS_MODEL, \
+    LLM_STRUCTURED_OUTPUTS, db_handler
+from services.openaiAPI.completion_cache import CompletionCache, completion_key
+from services.metrics import OPENAI_REQUEST_SECONDS, record_openai_usage, register_cache
+from services.openaiAPI.diff_packing import pack_diff
+from services.openaiAPI.response_parsing import parse_labels, parse_batch_labels, parse_pr_review
+from services.openaiAPI.review_stream import ReviewStreamParser
+from services.lazy import LazyService
 
-from openai import OpenAI
+logger = logging.getLogger(__name__)
 
-# Inicializa el cliente OpenAI
-client = OpenAI(
-    api_key=os.environ.get("OPENAI_API_KEY")  # Asegúrate de que la API Key esté configurada en las variables de entorno
+
+def create_openai_client():
+    """
+    Crea el cliente OpenAI. El paquete openai se importa aquí porque su importación es lenta.
+    """
+    from openai import OpenAI
+
+    return OpenAI(
+        api_key=os.environ.get("OPENAI_API_KEY")  # Asegúrate de que la API Key esté configurada en las variables de entorno
+    )
+
+
+# Cliente OpenAI; se crea en la primera solicitud al modelo
+client = LazyService(create_openai_client, name="openai")
+
+# Respuestas ya generadas para solicitudes idénticas (redeliveries, PRs reabiertos, issues duplicados)
+completion_cache = CompletionCache(
+    max_entries=LLM_CACHE_SIZE,
+    ttl=LLM_CACHE_TTL,
+    store=db_handler if LLM_CACHE_PERSISTENT else None
 )
+register_cache("llm_completions", completion_cache.stats)
+
+
+LABELS_MODEL = LLM_LABELS_MODEL  # Asegúrate de que tienes acceso a este modelo
+LABELS_SYSTEM_PROMPT = "Eres un asistente útil para la gestión de issues en GitHub."
+REVIEW_MODEL = "gpt-4o"
+REVIEW_SYSTEM_PROMPT = "You are an expert code reviewer and GitHub issue linker."
+REVIEW_MAX_TOKENS = 1000
+REVIEW_TEMPERATURE = 0.7
+
+# Modelos sin structured outputs (response_format json_schema); sus respuestas dependen
+# solo del parser tolerante
+LEGACY_MODELS = {"gpt-4", "gpt-4-0613", "gpt-4-0314", "gpt-4-32k", "gpt-3.5-turbo"}
+
+LABELS_SCHEMA = {
+    "name": "issue_labels",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "labels": {"type": "array", "items": {"type": "string"}}
+        },
+        "required": ["labels"],
+        "additionalProperties": False
+    }
+}
+BATCH_LABELS_SCHEMA = {
+    "name": "issue_labels_batch",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "issues": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "number": {"type": "integer"},
+                        "labels": {"type": "array", "items": {"type": "string"}}
+                    },
+                    "required": ["number", "labels"],
+                    "additionalProperties": False
+                }
+            }
+        },
+        "required": ["issues"],
+        "additionalProperties": False
+    }
+}
+# Caracteres de la descripción de cada issue que se envían en una solicitud de varios issues
+BATCH_ISSUE_BODY_CHARS = 1500
+REVIEW_SCHEMA = {
+    "name": "pull_request_review",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "related_issue": {"type": ["integer", "null"]},
+            "review_analysis": {"type": "string"}
+        },
+        "required": ["related_issue", "review_analysis"],
+        "additionalProperties": False
+    }
+}
+
+
+def response_format_for(model, schema):
+    """
+    Devuelve el response_format con JSON schema estricto para el modelo, o None si el modo
+    está desactivado o el modelo no lo soporta.
+    """
+    if not LLM_STRUCTURED_OUTPUTS or schema is None or model in LEGACY_MODELS:
+        return None
+    return {"type": "json_schema", "json_schema": schema}
 
-def get_suggested_labels(issue_title, issue_body, predefined_labels):
+
+def completion_options(model, system_prompt, prompt, max_tokens, temperature, schema=None):
     """
-    Envía los detalles de un issue al API de OpenAI para obtener sugerencias de etiquetas.
+    Argumentos de chat.completions.create comunes a los clientes síncrono y asíncrono.
+    """
+    options = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": max_tokens,
+        "temperature": temperature
+    }
+    response_format = response_format_for(model, schema)
+    if response_format:
+        options["response_format"] = response_format
+    return options
+
+
+def cached_completion(model, system_prompt, prompt, max_tokens, temperature, parse, schema=None):
+    """
+    Solicita una completion al modelo reutilizando la respuesta guardada si la misma
+    solicitud ya se hizo antes.
+    :param parse: Función que convierte el contenido en el resultado; si lanza una excepción
+                  la respuesta no se guarda en cache.
+    :param schema: JSON schema de la respuesta para los modelos con structured outputs.
+    :return: Resultado de parse(content).
+    """
+    key = completion_key(model, system_prompt, prompt, temperature, max_tokens)
+    content = completion_cache.get(key)
+    if content is not None:
+        return parse(content)
 
-    Args:
-        issue_title (str): Título del issue.
-        issue_body (str): Descripción del issue.
-        predefined_labels (list): Lista de etiquetas existentes en el repositorio.
+    with OPENAI_REQUEST_SECONDS.time(model=model):
+        response = client.chat.completions.create(
+            **completion_options(model, system_prompt, prompt, max_tokens, temperature, schema)
+        )
+    record_openai_usage(model, response.usage)
+    # Con structured outputs una negativa del modelo llega en 'refusal' y sin contenido
+    content = (response.choices[0].message.content or "").strip()
+    result = parse(content)
+    if content:
+        completion_cache.set(key, content)
+    return result
 
-    Returns:
-        list: Lista de etiquetas sugeridas por el modelo.
+
+def build_labels_prompt(issue_title, issue_body, predefined_labels):
+    """
+    Construye el prompt para sugerir etiquetas a un issue.
     """
-    # Define el prompt
     prompt = f"""
     Based on the following issue details, suggest GitHub labels that best describe the issue.
     You may choose from the predefined labels below or suggest new ones if you think they are necessary.
@@ -35,49 +172,98 @@ def get_suggested_labels(issue_title, issue_body, predefined_labels):
     If you suggest a new label, ensure it is concise, relevant, and follows common GitHub labeling practices.
     Return the labels as a JSON list.
     """
+    return prompt
+
+
+def get_suggested_labels(issue_title, issue_body, predefined_labels):
+    """
+    Envía los detalles de un issue al API de OpenAI para obtener sugerencias de etiquetas.
+
+    Args:
+        issue_title (str): Título del issue.
+        issue_body (str): Descripción del issue.
+        predefined_labels (list): Lista de etiquetas existentes en el repositorio.
+
+    Returns:
+        list: Lista de etiquetas sugeridas por el modelo.
+    """
+    prompt = build_labels_prompt(issue_title, issue_body, predefined_labels)
 
     try:
-        # Realiza la solicitud al modelo
-        response = client.chat.completions.create(
-            model="gpt-4",  # Asegúrate de que tienes acceso a este modelo
-            messages=[
-                {"role": "system", "content": "Eres un asistente útil para la gestión de issues en GitHub."},
-                {"role": "user", "content": prompt}
-            ],
+        # Realiza la solicitud al modelo (o reutiliza la respuesta de una solicitud idéntica)
+        return cached_completion(
+            model=LABELS_MODEL,
+            system_prompt=LABELS_SYSTEM_PROMPT,
+            prompt=prompt,
             max_tokens=150,
-            temperature=0.7
+            temperature=0.7,
+            parse=partial(parse_labels, existing_labels=predefined_labels),
+            schema=LABELS_SCHEMA
         )
 
-        # Extrae el contenido de la respuesta
-        content = response.choices[0].message.content.strip()
+    except Exception as e:
+        logger.error("Error al obtener las etiquetas sugeridas: %s", e)
+        return []
 
-        # Intenta convertir la respuesta a una lista de etiquetas
-        suggested_labels = json.loads(content)
 
-        if isinstance(suggested_labels, list):
-            return suggested_labels
-        else:
-            raise ValueError("La respuesta no es una lista JSON válida.")
+def build_batch_labels_prompt(issues, predefined_labels):
+    """
+    Construye el prompt para sugerir etiquetas a varios issues en una sola solicitud.
+    :param issues: Lista de issues de la API de GitHub (con 'number', 'title' y 'body').
+    """
+    issue_blocks = "\n\n".join(
+        f"Issue #{issue['number']}\nTitle: {issue['title']}\n"
+        f"Description: {(issue.get('body') or '')[:BATCH_ISSUE_BODY_CHARS]}"
+        for issue in issues
+    )
+    prompt = f"""
+    Based on the following issues, suggest GitHub labels that best describe each issue.
+    You may choose from the predefined labels below or suggest new ones if you think they are necessary.
 
-    except Exception as e:
-        print(f"Error al obtener las etiquetas sugeridas: {e}")
-        return []
+    {issue_blocks}
 
+    Predefined labels: {', '.join(predefined_labels)}
 
+    If you suggest a new label, ensure it is concise, relevant, and follows common GitHub labeling practices.
+    Return a JSON object with an "issues" list containing one {{"number": <issue_number>, "labels": [...]}} entry per issue.
+    """
+    return prompt
 
 
-def generate_pr_prompt(pr_details, pr_files, issue_titles):
-    print(f"Estos son los issues del author: {issue_titles}")
+def get_suggested_labels_batch(issues, predefined_labels):
+    """
+    Sugiere etiquetas para varios issues con una sola solicitud al modelo.
+    :param issues: Lista de issues de la API de GitHub.
+    :return: Diccionario {número de issue: [etiquetas]}; los issues que el modelo omitió no aparecen.
+    """
+    prompt = build_batch_labels_prompt(issues, predefined_labels)
+
+    try:
+        return cached_completion(
+            model=LABELS_MODEL,
+            system_prompt=LABELS_SYSTEM_PROMPT,
+            prompt=prompt,
+            max_tokens=50 + 60 * len(issues),
+            temperature=0.7,
+            parse=parse_batch_labels,
+            schema=BATCH_LABELS_SCHEMA
+        )
+
+    except Exception as e:
+        logger.error("Error al obtener las etiquetas sugeridas de %s issues: %s", len(issues), e)
+        return {}
+
+
+def generate_pr_prompt(pr_details, pr_files, issue_titles, token_budget=PR_PROMPT_TOKEN_BUDGET):
     """
     Genera un prompt para enviar a ChatGPT basado en los detalles y cambios de un Pull Request
     y los títulos de los issues abiertos del creador del PR.
+    Los diffs se empaquetan para no superar 'token_budget' tokens.
     """
+    logger.debug("Estos son los issues del author: %s", issue_titles)
     title = pr_details["title"]
     body = pr_details["body"]
-    changes = ""
-
-    for file in pr_files:
-        changes += f"File: {file['filename']}\nDiff:\n{file['patch']}\n\n"
+    changes = pack_diff(pr_files, token_budget)
 
     prompt = f"""
     A Pull Request has been created with the following details:
@@ -117,38 +303,77 @@ def get_pr_review_and_issue(prompt):
     y determinar el número del Issue relacionado.
     """
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are an expert code reviewer and GitHub issue linker."},
-                {"role": "user", "content": prompt},
-            ],
-            max_tokens=1000,
-            temperature=0.7
+        return cached_completion(
+            model=REVIEW_MODEL,
+            system_prompt=REVIEW_SYSTEM_PROMPT,
+            prompt=prompt,
+            max_tokens=REVIEW_MAX_TOKENS,
+            temperature=REVIEW_TEMPERATURE,
+            parse=parse_pr_review,
+            schema=REVIEW_SCHEMA
         )
 
-        # Procesar la respuesta de ChatGPT
-        content = response.choices[0].message.content.strip()
-        print(f"ChatGPT Response: {content}")
-
-        # Detectar y eliminar delimitadores de bloques de código Markdown si están presentes
-        if content.startswith("```json") and content.endswith("```"):
-            content = content[7:-3].strip()  # Eliminar ```json al inicio y ``` al final
-            print("Markdown delimiters detected and removed from response.")
+    except Exception as e:
+        logger.error("Unexpected error: %s", e)
+    return None, None
 
-        # Intentar cargar el JSON para extraer los datos necesarios
-        response_data = json.loads(content)
-        related_issue = response_data.get("related_issue")
-        review_analysis = response_data.get("review_analysis")
 
-        print(f"Related issue: {related_issue} isinstance(related_issue, int): {isinstance(related_issue, int)}")
-        print(f"Review analysis: {review_analysis}  isinstance(review_analysis, str): {isinstance(review_analysis, str)} ")
+def stream_pr_review_and_issue(prompt, on_related_issue=None, on_review=None):
+    """
+    Versión en streaming de get_pr_review_and_issue. La respuesta se parsea mientras llega:
+    el issue relacionado se entrega en cuanto el modelo lo emite y el análisis parcial cada
+    vez que crece, sin esperar a la completion entera.
+    Si la respuesta está en cache no se llama a los callbacks; el resultado se devuelve directo.
+    :param on_related_issue: Función on_related_issue(issue_number) que se llama una vez
+                             (issue_number puede ser None).
+    :param on_review: Función on_review(partial_text) que se llama cada vez que el análisis crece.
+    :return: Tupla (related_issue, review_analysis) o (None, None) si falla.
+    """
+    key = completion_key(REVIEW_MODEL, REVIEW_SYSTEM_PROMPT, prompt, REVIEW_TEMPERATURE, REVIEW_MAX_TOKENS)
+    content = completion_cache.get(key)
 
-        return related_issue if isinstance(related_issue, int) else None, review_analysis
+    try:
+        if content is None:
+            content = _stream_review(prompt, on_related_issue, on_review)
+            result = parse_pr_review(content)
+            if content:
+                completion_cache.set(key, content)
+            return result
+        return parse_pr_review(content)
 
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON: {e}")
-        print("Error decoding JSON from ChatGPT response.")
     except Exception as e:
-        print(f"Unexpected error: {e}")
+        logger.error("Unexpected error: %s", e)
     return None, None
+
+
+def _stream_review(prompt, on_related_issue, on_review):
+    """
+    Consume el stream de la completion alimentando el parser incremental.
+    :return: Contenido completo de la respuesta.
+    """
+    parser = ReviewStreamParser()
+    notified = False
+
+    with OPENAI_REQUEST_SECONDS.time(model=REVIEW_MODEL):
+        stream = client.chat.completions.create(
+            **completion_options(REVIEW_MODEL, REVIEW_SYSTEM_PROMPT, prompt, REVIEW_MAX_TOKENS, REVIEW_TEMPERATURE,
+                                 REVIEW_SCHEMA),
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        for chunk in stream:
+            # El último chunk trae el uso de tokens y no tiene choices
+            if chunk.usage:
+                record_openai_usage(REVIEW_MODEL, chunk.usage)
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+
+            grew = parser.feed(chunk.choices[0].delta.content)
+            if not notified and parser.related_issue_ready:
+                notified = True
+                if on_related_issue:
+                    on_related_issue(parser.related_issue)
+            if grew and on_review:
+                on_review(parser.review)
+
+    return parser.text.strip()
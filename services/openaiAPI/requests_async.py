@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import os
+from functools import partial
+
+from services.lazy import LazyService
+from services.metrics import OPENAI_REQUEST_SECONDS, record_openai_usage
+from services.openaiAPI.completion_cache import completion_key
+from services.openaiAPI.requests import completion_cache, build_labels_prompt, completion_options, LABELS_MODEL, \
+    LABELS_SYSTEM_PROMPT, LABELS_SCHEMA, REVIEW_MODEL, REVIEW_SYSTEM_PROMPT, REVIEW_MAX_TOKENS, REVIEW_TEMPERATURE, \
+    REVIEW_SCHEMA
+from services.openaiAPI.response_parsing import parse_labels, parse_pr_review
+
+logger = logging.getLogger(__name__)
+
+
+def create_async_openai_client():
+    """
+    Crea el cliente asíncrono de OpenAI para el modo ASGI.
+    """
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(
+        api_key=os.environ.get("OPENAI_API_KEY")
+    )
+
+
+# Se crea en la primera solicitud al modelo
+async_client = LazyService(create_async_openai_client, name="openai-async")
+
+
+async def cached_completion(model, system_prompt, prompt, max_tokens, temperature, parse, schema=None):
+    """
+    Versión asíncrona de requests.cached_completion; comparte el mismo cache.
+    """
+    key = completion_key(model, system_prompt, prompt, temperature, max_tokens)
+    # El nivel persistente del cache es bloqueante (Mongo), por eso se consulta en un hilo
+    content = await asyncio.to_thread(completion_cache.get, key)
+    if content is not None:
+        return parse(content)
+
+    with OPENAI_REQUEST_SECONDS.time(model=model):
+        response = await async_client.chat.completions.create(
+            **completion_options(model, system_prompt, prompt, max_tokens, temperature, schema)
+        )
+    record_openai_usage(model, response.usage)
+    content = (response.choices[0].message.content or "").strip()
+    result = parse(content)
+    if content:
+        await asyncio.to_thread(completion_cache.set, key, content)
+    return result
+
+
+async def get_suggested_labels(issue_title, issue_body, predefined_labels):
+    """
+    Versión asíncrona de requests.get_suggested_labels.
+    """
+    prompt = build_labels_prompt(issue_title, issue_body, predefined_labels)
+
+    try:
+        return await cached_completion(
+            model=LABELS_MODEL,
+            system_prompt=LABELS_SYSTEM_PROMPT,
+            prompt=prompt,
+            max_tokens=150,
+            temperature=0.7,
+            parse=partial(parse_labels, existing_labels=predefined_labels),
+            schema=LABELS_SCHEMA
+        )
+    except Exception as e:
+        logger.error("Error al obtener las etiquetas sugeridas: %s", e)
+        return []
+
+
+async def get_pr_review_and_issue(prompt):
+    """
+    Versión asíncrona de requests.get_pr_review_and_issue.
+    """
+    try:
+        return await cached_completion(
+            model=REVIEW_MODEL,
+            system_prompt=REVIEW_SYSTEM_PROMPT,
+            prompt=prompt,
+            max_tokens=REVIEW_MAX_TOKENS,
+            temperature=REVIEW_TEMPERATURE,
+            parse=parse_pr_review,
+            schema=REVIEW_SCHEMA
+        )
+    except Exception as e:
+        logger.error("Unexpected error: %s", e)
+    return None, None
@@ -0,0 +1,161 @@
+import json
+import re
+
+from services.openaiAPI.review_stream import ReviewStreamParser
+
+# Bloque de código Markdown con cualquier etiqueta de lenguaje (```json, ```JSON, ``` ...)
+_FENCE = re.compile(r"```[\w-]*\s*\n?(.*?)\n?\s*```", re.DOTALL)
+_QUOTED = re.compile(r'"((?:[^"\\]|\\.)*)"')
+_RELATED_ISSUE = re.compile(r'"?related_issue"?\s*[:=]\s*"?#?(\d+|null)', re.IGNORECASE)
+
+_decoder = json.JSONDecoder(strict=False)
+
+# Largo máximo del nombre de una etiqueta en GitHub
+MAX_LABEL_LENGTH = 50
+
+
+def extract_json(content):
+    """
+    Extrae el primer valor JSON de una respuesta del modelo: el contenido completo, el de un
+    bloque de código Markdown o el primer objeto/lista que aparezca dentro del texto.
+    :return: Valor decodificado, o None si no hay JSON válido.
+    """
+    content = content.strip()
+    candidates = [content]
+    candidates.extend(match.group(1).strip() for match in _FENCE.finditer(content))
+
+    for candidate in candidates:
+        try:
+            # strict=False admite saltos de línea sin escapar dentro de los strings
+            return json.loads(candidate, strict=False)
+        except ValueError:
+            pass
+
+    # JSON rodeado de texto: se intenta decodificar desde cada '{' o '['
+    for index, char in enumerate(content):
+        if char in "{[":
+            try:
+                value, _ = _decoder.raw_decode(content, index)
+                return value
+            except ValueError:
+                continue
+    return None
+
+
+def parse_labels(content, existing_labels=None):
+    """
+    Convierte la respuesta del modelo en una lista de etiquetas. Acepta una lista JSON, un
+    objeto {"labels": [...]} o JSON inválido con strings entre comillas.
+
+    Los strings entre comillas se recuperan de texto libre, así que solo se conservan los que
+    coinciden (sin distinguir mayúsculas) con 'existing_labels': una respuesta en prosa o un
+    rechazo del modelo nunca crea etiquetas nuevas en el repositorio.
+    :param existing_labels: Etiquetas del repositorio; sin ellas el texto libre no produce etiquetas.
+    :return: Lista de etiquetas (vacía si no se reconoce ninguna).
+    """
+    value = extract_json(content)
+    if isinstance(value, dict):
+        value = value.get("labels")
+    if isinstance(value, list):
+        return _clean_labels(value)
+
+    existing_by_name = {label.lower(): label for label in existing_labels or ()}
+    quoted = (_unescape(text).strip().lower() for text in _QUOTED.findall(content))
+    return _clean_labels(existing_by_name[name] for name in quoted if name in existing_by_name)
+
+
+def parse_batch_labels(content):
+    """
+    Convierte la respuesta a una solicitud de varios issues en {número: [etiquetas]}. Acepta
+    {"issues": [{"number": n, "labels": [...]}]}, la lista sola o un objeto {"n": [...]}.
+    Los issues que no se reconocen se omiten.
+    """
+    value = extract_json(content)
+    if isinstance(value, dict) and isinstance(value.get("issues"), list):
+        value = value["issues"]
+
+    result = {}
+    if isinstance(value, list):
+        for item in value:
+            if not isinstance(item, dict):
+                continue
+            number = _issue_number(item.get("number", item.get("issue")))
+            labels = item.get("labels")
+            if number is not None and isinstance(labels, list):
+                result[number] = _clean_labels(labels)
+    elif isinstance(value, dict):
+        for key, labels in value.items():
+            number = _issue_number(key)
+            if number is not None and isinstance(labels, list):
+                result[number] = _clean_labels(labels)
+    return result
+
+
+def _unescape(text):
+    try:
+        return json.loads(f'"{text}"', strict=False)
+    except ValueError:
+        return text
+
+
+def _clean_labels(labels):
+    """
+    Descarta valores que no son strings, están vacíos o superan el largo máximo de una etiqueta
+    de GitHub, y quita duplicados conservando el orden.
+    """
+    cleaned = []
+    for label in labels:
+        if not isinstance(label, str):
+            continue
+        label = label.strip()
+        if label and len(label) <= MAX_LABEL_LENGTH and label not in cleaned:
+            cleaned.append(label)
+    return cleaned
+
+
+def parse_pr_review(content):
+    """
+    Extrae el issue relacionado y el análisis de la respuesta del modelo. Si la respuesta no
+    es JSON válido se recuperan los campos que se puedan; si no se reconoce el análisis se usa
+    el texto completo, para no descartar la completion.
+    :return: Tupla (related_issue, review_analysis).
+    """
+    value = extract_json(content)
+    if isinstance(value, dict) and ("related_issue" in value or "review_analysis" in value):
+        related_issue = _issue_number(value.get("related_issue"))
+        review_analysis = value.get("review_analysis")
+        if isinstance(review_analysis, str) and review_analysis.strip():
+            return related_issue, _replace_lone_surrogates(review_analysis)
+        return related_issue, None
+
+    match = _RELATED_ISSUE.search(content)
+    related_issue = _issue_number(match.group(1)) if match else None
+
+    # JSON truncado o mal escapado: el parser incremental recupera el string aunque no cierre
+    parser = ReviewStreamParser()
+    parser.feed(content)
+    review_analysis = parser.review
+    if not review_analysis or not review_analysis.strip():
+        review_analysis = _FENCE.sub(lambda fence: fence.group(1), content).strip() or None
+    return related_issue, review_analysis
+
+
+def _replace_lone_surrogates(text):
+    """
+    json.loads acepta escapes \\uD800-\\uDFFF sueltos, que luego no se pueden codificar en
+    UTF-8 al publicar el comentario; se reemplazan por U+FFFD como en el parser incremental.
+    """
+    return text.encode("utf-16", "surrogatepass").decode("utf-16", "replace")
+
+
+def _issue_number(value):
+    """
+    Normaliza el issue relacionado a int: acepta enteros y strings como "12" o "#12".
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().lstrip("#").isdigit():
+        return int(value.strip().lstrip("#"))
+    return None
@@ -0,0 +1,135 @@
+import re
+
+# "related_issue" completo: el valor termina con ',' o '}' (así un número no queda cortado entre fragmentos)
+_RELATED_ISSUE = re.compile(r'"related_issue"\s*:\s*(null|-?\d+)\s*[,}]')
+_REVIEW_START = re.compile(r'"review_analysis"\s*:\s*"')
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_HEX_DIGITS = frozenset("0123456789abcdefABCDEF")
+# Segunda mitad de un par sustituto (\uDC00-\uDFFF), carácter por carácter
+_LOW_SURROGATE = ("\\", "u", "dD", "cdefCDEF", _HEX_DIGITS, _HEX_DIGITS)
+_REPLACEMENT_CHAR = "\ufffd"
+
+
+def _is_low_surrogate_escape(text):
+    """
+    True si 'text' es el escape de una segunda mitad de par sustituto, o el comienzo de uno
+    si 'text' tiene menos de 6 caracteres.
+    """
+    return all(char in allowed for char, allowed in zip(text, _LOW_SURROGATE))
+
+
+class ReviewStreamParser:
+    """
+    Parser incremental de la respuesta JSON {"related_issue": ..., "review_analysis": "..."}
+    mientras el modelo la genera. Expone el issue relacionado en cuanto se emite y el texto
+    parcial del análisis sin esperar al cierre del JSON.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self.related_issue_ready = False
+        self.related_issue = None
+        self._review_chars = []
+        self._review_pos = None
+        self.review_complete = False
+
+    @property
+    def text(self):
+        """
+        Contenido recibido hasta ahora.
+        """
+        return self._buffer
+
+    @property
+    def review(self):
+        """
+        Texto del análisis decodificado hasta ahora, o None si aún no empezó.
+        """
+        if self._review_pos is None:
+            return None
+        return "".join(self._review_chars)
+
+    def feed(self, fragment):
+        """
+        Agrega un fragmento del stream.
+        :return: True si el texto del análisis creció con este fragmento.
+        """
+        self._buffer += fragment
+
+        if not self.related_issue_ready:
+            match = _RELATED_ISSUE.search(self._buffer)
+            if match:
+                value = match.group(1)
+                self.related_issue = None if value == "null" else int(value)
+                self.related_issue_ready = True
+
+        if self._review_pos is None:
+            match = _REVIEW_START.search(self._buffer)
+            if not match:
+                return False
+            self._review_pos = match.end()
+
+        if self.review_complete:
+            return False
+        return self._decode_review()
+
+    def _decode_review(self):
+        """
+        Decodifica el string del análisis desde la última posición. Se detiene antes de un
+        escape incompleto para terminarlo con el siguiente fragmento.
+        """
+        buffer, pos, grew = self._buffer, self._review_pos, False
+        while pos < len(buffer):
+            char = buffer[pos]
+            if char == '"':
+                self.review_complete = True
+                pos += 1
+                break
+            if char != "\\":
+                self._review_chars.append(char)
+                pos += 1
+                grew = True
+                continue
+
+            if pos + 1 >= len(buffer):
+                break
+            code = buffer[pos + 1]
+            if code != "u":
+                self._review_chars.append(_ESCAPES.get(code, code))
+                pos += 2
+                grew = True
+                continue
+
+            if pos + 6 > len(buffer):
+                break
+            digits = buffer[pos + 2:pos + 6]
+            if not all(digit in _HEX_DIGITS for digit in digits):
+                # Escape inválido: se conserva como texto literal
+                self._review_chars.append("\\u")
+                pos += 2
+                grew = True
+                continue
+
+            codepoint = int(digits, 16)
+            length = 6
+            if 0xD800 <= codepoint < 0xDC00:
+                # Par sustituto: solo se combina si sigue un \uDC00-\uDFFF válido
+                following = buffer[pos + 6:pos + 12]
+                if len(following) < 6 and _is_low_surrogate_escape(following):
+                    break
+                if _is_low_surrogate_escape(following):
+                    low = int(following[2:], 16)
+                    codepoint = 0x10000 + ((codepoint - 0xD800) << 10) + (low - 0xDC00)
+                    length = 12
+                else:
+                    codepoint = None
+            elif 0xDC00 <= codepoint < 0xE000:
+                codepoint = None
+            # Una mitad de par suelta no se puede codificar en UTF-8
+            self._review_chars.append(_REPLACEMENT_CHAR if codepoint is None else chr(codepoint))
+            pos += length
+            grew = True
+
+        self._review_pos = pos
+        return grew